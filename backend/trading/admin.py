@@ -1,5 +1,10 @@
+from datetime import timedelta
 from django.contrib import admin
-from .models import TradingPair, TradingStrategy, Order, TradeHistory, UserSettings, PriceAlert
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .latency import GROUPINGS, STAGES, PERCENTILES, latency_report
+from .models import TradingPair, TradingStrategy, Order, TradeHistory, OrderLatency, UserSettings, PriceAlert
 
 
 @admin.register(TradingPair)
@@ -30,6 +35,50 @@ class TradeHistoryAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'trading_pair__symbol')
 
 
+@admin.register(OrderLatency)
+class OrderLatencyAdmin(admin.ModelAdmin):
+    list_display = ('order', 'strategy_type', 'symbol', 'due_at', 'tick_us', 'price_us', 'persisted_us', 'acked_us')
+    list_filter = ('strategy_type', 'symbol')
+    date_hierarchy = 'due_at'
+    raw_id_fields = ('order',)
+
+    def get_urls(self):
+        report = self.admin_site.admin_view(self.report_view)
+        return [path('report/', report, name='trading_orderlatency_report')] + super().get_urls()
+
+    def report_view(self, request):
+        """Per-stage latency percentiles grouped by strategy type and/or symbol"""
+        try:
+            hours = float(request.GET.get('hours', 24))
+        except ValueError:
+            hours = 24
+        by = request.GET.get('by', 'both')
+        if by not in GROUPINGS:
+            by = 'both'
+
+        queryset = OrderLatency.objects.filter(due_at__gte=timezone.now() - timedelta(hours=hours))
+        report = [
+            {
+                'label': ' / '.join(row['group'].values()),
+                'count': row['count'],
+                'cells': [row['stages'][stage][f"p{p}"] for stage, _, _ in STAGES for p in PERCENTILES],
+            }
+            for row in latency_report(queryset, group_by=GROUPINGS[by])
+        ]
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Tick-to-trade latency',
+            'hours': hours,
+            'by': by,
+            'groupings': sorted(GROUPINGS),
+            'stages': [stage for stage, _, _ in STAGES],
+            'percentiles': PERCENTILES,
+            'report': report,
+        }
+        return TemplateResponse(request, 'admin/trading/orderlatency/report.html', context)
+
+
 @admin.register(UserSettings)
 class UserSettingsAdmin(admin.ModelAdmin):
     list_display = ('user', 'auto_trading_enabled', 'use_testnet', 'created_at')
@@ -0,0 +1,288 @@
+"""
+Trade Archive Service
+Moves closed months of orders and trade history out of the hot tables into
+compressed on-disk archives that can still be queried
+"""
+import gzip
+import json
+import os
+from datetime import datetime, date, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Order, OrderLatency, TradeHistory
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Orders in these states can still change and always stay in the hot table
+OPEN_ORDER_STATUSES = ('pending', 'partially_filled')
+
+DELETE_CHUNK_SIZE = 5000
+
+# Timestamp each archive kind is filtered on
+TIME_FIELDS = {'orders': 'created_at', 'trades': 'executed_at', 'latency': 'due_at'}
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def month_start(year, month):
+    """Timezone-aware start of a calendar month"""
+    return datetime(year, month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class TradeArchiver:
+    """
+    Monthly archive scheme for Order, TradeHistory and OrderLatency.
+
+    Each archived month is written as gzip-compressed JSON lines under
+    <archive_dir>/orders/YYYY-MM.*.jsonl.gz, <archive_dir>/trades/YYYY-MM.*.jsonl.gz
+    and <archive_dir>/latency/YYYY-MM.*.jsonl.gz (all filed under the order's
+    month), then removed from the hot tables, so hot table and index size
+    depend on the retention window rather than account age.
+    """
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = Path(archive_dir or getattr(settings, 'TRADE_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+        self._newest = {}  # kind -> (part file names, newest timestamp)
+        self._indexes = {}  # part path -> its index (parts and indexes never change once written)
+
+    def archivable_months(self, retention_days):
+        """Closed (year, month) pairs entirely older than the retention window"""
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        cutoff_month = month_start(cutoff.year, cutoff.month)
+
+        oldest = (
+            Order.objects
+            .filter(created_at__lt=cutoff_month)
+            .exclude(status__in=OPEN_ORDER_STATUSES)
+            .order_by('created_at')
+            .values_list('created_at', flat=True)
+            .first()
+        )
+        if oldest is None:
+            return []
+
+        months = []
+        year, month = oldest.year, oldest.month
+        while month_start(year, month) < cutoff_month:
+            months.append((year, month))
+            year, month = next_month(year, month)
+        return months
+
+    def archive_month(self, year, month, dry_run=False):
+        """
+        Export and remove one month of closed orders and their trades.
+        Returns (orders_archived, trades_archived).
+        """
+        start = month_start(year, month)
+        end = month_start(*next_month(year, month))
+
+        orders = (
+            Order.objects
+            .filter(created_at__gte=start, created_at__lt=end)
+            .exclude(status__in=OPEN_ORDER_STATUSES)
+            .order_by('id')
+        )
+        if dry_run:
+            order_count = orders.count()
+            trade_count = TradeHistory.objects.filter(order__in=orders).count()
+            return order_count, trade_count
+
+        label = f"{year:04d}-{month:02d}"
+        order_ids = self._export(orders.values(), 'orders', label)
+        if not order_ids:
+            return 0, 0
+
+        trades = TradeHistory.objects.filter(order_id__in=orders.filter(id__in=order_ids)).order_by('id')
+        trade_ids = self._export(trades.values(), 'trades', label)
+        # Latency rows would otherwise disappear with their orders via the cascade
+        latencies = OrderLatency.objects.filter(order_id__in=order_ids).order_by('order_id')
+        latency_ids = self._export(latencies.values(), 'latency', label, key='order_id')
+
+        # Files are on disk before anything is deleted; delete exactly what was exported
+        with transaction.atomic():
+            self._delete(TradeHistory, trade_ids)
+            self._delete(OrderLatency, latency_ids, key='order_id')
+            self._delete(Order, order_ids)
+
+        logger.info(f"Archived {len(order_ids)} orders and {len(trade_ids)} trades for {label}")
+        return len(order_ids), len(trade_ids)
+
+    def _export(self, rows, kind, label, key='id'):
+        """
+        Stream rows into a new compressed part file and return their `key` values.
+        A small index next to the part records its time span and rows per user,
+        so readers can skip the part without decompressing it.
+        """
+        directory = self.archive_dir / kind
+        directory.mkdir(parents=True, exist_ok=True)
+
+        part = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+        final_path = directory / f"{label}.{part}.jsonl.gz"
+        tmp_path = final_path.with_suffix('.tmp')
+
+        time_field = TIME_FIELDS[kind]
+        ids = []
+        users = {}
+        first = last = None
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as fh:
+            for row in rows.iterator(chunk_size=DELETE_CHUNK_SIZE):
+                ids.append(row[key])
+                if 'user_id' in row:
+                    users[row['user_id']] = users.get(row['user_id'], 0) + 1
+                timestamp = row[time_field]
+                first = timestamp if first is None or timestamp < first else first
+                last = timestamp if last is None or timestamp > last else last
+                fh.write(json.dumps({k: _encode(v) for k, v in row.items()}))
+                fh.write('\n')
+
+        if not ids:
+            tmp_path.unlink()
+            return ids
+
+        index_path = self._index_path(final_path)
+        index_tmp = index_path.with_suffix('.tmp')
+        index_tmp.write_text(json.dumps({
+            'rows': len(ids),
+            'first': first.isoformat(),
+            'last': last.isoformat(),
+            'users': {str(user_id): count for user_id, count in users.items()} if users else None,
+        }))
+        # The index lands first, so a visible part always has one
+        os.replace(index_tmp, index_path)
+        os.replace(tmp_path, final_path)
+        return ids
+
+    def _delete(self, model, ids, key='id'):
+        for i in range(0, len(ids), DELETE_CHUNK_SIZE):
+            model.objects.filter(**{f'{key}__in': ids[i:i + DELETE_CHUNK_SIZE]}).delete()
+
+    def _parts(self, kind):
+        directory = self.archive_dir / kind
+        if not directory.exists():
+            return []
+        return sorted(directory.glob('*.jsonl.gz'))
+
+    @staticmethod
+    def _index_path(path):
+        return path.with_name(path.name[:-len('.jsonl.gz')] + '.index.json')
+
+    def _index(self, path):
+        """A part's index, or None for parts written before indexes existed"""
+        if path not in self._indexes:
+            try:
+                index = json.loads(self._index_path(path).read_text())
+                index['first'] = datetime.fromisoformat(index['first'])
+                index['last'] = datetime.fromisoformat(index['last'])
+            except FileNotFoundError:
+                index = None
+            self._indexes[path] = index
+        return self._indexes[path]
+
+    def newest(self, kind):
+        """
+        Latest timestamp in the archive of `kind` (None when it is empty).
+        Part files never change once written, so the scan is only repeated
+        when the set of parts does.
+        """
+        parts = tuple(path.name for path in self._parts(kind))
+        cached = self._newest.get(kind)
+        if cached is not None and cached[0] == parts:
+            return cached[1]
+
+        newest = None
+        for path in self._parts(kind):
+            index = self._index(path)
+            if index is not None:
+                timestamps = [index['last']]
+            else:
+                with gzip.open(path, 'rt', encoding='utf-8') as fh:
+                    timestamps = [datetime.fromisoformat(json.loads(line)[TIME_FIELDS[kind]]) for line in fh]
+            for timestamp in timestamps:
+                if newest is None or timestamp > newest:
+                    newest = timestamp
+        self._newest[kind] = (parts, newest)
+        return newest
+
+    def iter_archived(self, kind, start=None, end=None, user_id=None):
+        """
+        Stream archived rows as dicts. Indexed parts outside the range or
+        without rows for user_id are skipped unread, so a user's reports cost
+        their own archived rows rather than the whole archive.
+        Args:
+            kind: 'orders', 'trades' or 'latency'
+            start, end: optional datetimes bounding created_at / executed_at / due_at
+            user_id: optional user filter (orders and trades)
+        """
+        for _month, rows in self.iter_months(kind, start, end, user_id):
+            yield from rows
+
+    def iter_months(self, kind, start=None, end=None, user_id=None):
+        """
+        (month start, row iterator) per archived month in month order, with the
+        same filtering as iter_archived. Rows are filed under their order's
+        month and never time-stamped before it (latency rows excepted).
+        """
+        time_field = TIME_FIELDS[kind]
+        start_label = f"{start.year:04d}-{start.month:02d}" if start else None
+        end_label = f"{end.year:04d}-{end.month:02d}" if end else None
+
+        def rows(paths):
+            for path in paths:
+                with gzip.open(path, 'rt', encoding='utf-8') as fh:
+                    for line in fh:
+                        row = json.loads(line)
+                        if user_id is not None and row['user_id'] != user_id:
+                            continue
+                        timestamp = datetime.fromisoformat(row[time_field])
+                        if (start and timestamp < start) or (end and timestamp >= end):
+                            continue
+                        yield row
+
+        months = {}
+        for path in self._parts(kind):
+            index = self._index(path)
+            if index is not None:
+                if (start and index['last'] < start) or (end and index['first'] >= end):
+                    continue
+                if user_id is not None and index['users'] is not None and str(user_id) not in index['users']:
+                    continue
+
+            # Trades are filed under their order's month and never execute before it,
+            # so only the upper bound prunes trade files; latency rows become due
+            # before their order is placed, so neither bound prunes those
+            label = path.name[:7]
+            if kind != 'latency' and end_label and label > end_label:
+                continue
+            if kind == 'orders' and start_label and label < start_label:
+                continue
+            months.setdefault(label, []).append(path)
+
+        for label, paths in months.items():
+            yield month_start(int(label[:4]), int(label[5:7])), rows(paths)
+
+    def vacuum(self):
+        """Reclaim space after large deletes"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for model in (TradeHistory, Order):
+                    cursor.execute(f'VACUUM (ANALYZE) "{model._meta.db_table}"')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('VACUUM')
+
+
+# Singleton instance
+trade_archiver = TradeArchiver()
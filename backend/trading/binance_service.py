@@ -8,7 +8,7 @@ import hmac
 import time
 import requests
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 from django.conf import settings
 
 
@@ -25,6 +25,9 @@ class BinanceService:
         else:
             self.base_url = "https://api.binance.com/api"
 
+        # Keep-alive session so repeated calls reuse warm HTTP connections
+        self.session = requests.Session()
+
     def _generate_signature(self, params: Dict) -> str:
         """Generate HMAC SHA256 signature for API requests"""
         query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
@@ -49,11 +52,11 @@ class BinanceService:
 
         try:
             if method == 'GET':
-                response = requests.get(url, params=params, headers=headers, timeout=10)
+                response = self.session.get(url, params=params, headers=headers, timeout=10)
             elif method == 'POST':
-                response = requests.post(url, params=params, headers=headers, timeout=10)
+                response = self.session.post(url, params=params, headers=headers, timeout=10)
             elif method == 'DELETE':
-                response = requests.delete(url, params=params, headers=headers, timeout=10)
+                response = self.session.delete(url, params=params, headers=headers, timeout=10)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
 
@@ -97,7 +100,7 @@ class BinanceService:
         endpoint = "/v3/account"
         return self._make_request('GET', endpoint, signed=True)
 
-    def create_market_order(self, symbol: str, side: str, quantity: float) -> Optional[Dict]:
+    def create_market_order(self, symbol: str, side: str, quantity: Union[float, str]) -> Optional[Dict]:
         """
         Create a market order
 
@@ -118,7 +121,8 @@ class BinanceService:
         }
         return self._make_request('POST', endpoint, params, signed=True)
 
-    def create_limit_order(self, symbol: str, side: str, quantity: float, price: float) -> Optional[Dict]:
+    def create_limit_order(self, symbol: str, side: str, quantity: Union[float, str],
+                           price: Union[float, str]) -> Optional[Dict]:
         """
         Create a limit order
 
@@ -182,6 +186,10 @@ class BinanceService:
         endpoint = "/v3/exchangeInfo"
         return self._make_request('GET', endpoint)
 
+    def close(self):
+        """Release pooled HTTP connections"""
+        self.session.close()
+
 
 # Singleton instance
 binance_service = BinanceService()
@@ -0,0 +1,165 @@
+"""
+Asset Conversion Graph
+Precomputed asset -> USDT conversion paths (direct or two hops through a hub
+asset such as BTC) over the exchange's pair universe, used to value whole
+account balances from one all-symbols price snapshot
+"""
+import threading
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from .price_feed import price_feed, PriceUnavailable
+import logging
+
+logger = logging.getLogger(__name__)
+
+VALUATION_ASSET = 'USDT'
+# Preferred intermediate assets for two-hop paths, most liquid first
+HUB_ASSETS = ('BTC', 'ETH', 'BNB', 'USDC', 'FDUSD')
+EXCHANGE_INFO_PATH = '/api/v3/exchangeInfo'
+QUANTUM = Decimal('0.00000001')
+
+# One conversion step: (symbol, invert); the rate is the price, or 1/price when inverted
+Step = Tuple[str, bool]
+
+
+class ConversionGraph:
+    """
+    Shortest conversion path from every reachable asset to `target`, built
+    once per pair universe. Direct pairs win over two-hop paths; between
+    two-hop paths the hub earliest in HUB_ASSETS wins, then alphabetical
+    order, so the chosen path is stable across rebuilds.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[str, str, str]], target: str = VALUATION_ASSET):
+        self.target = target
+        self.pairs = {symbol: (base, quote) for symbol, base, quote in pairs}
+        self.paths: Dict[str, Tuple[Step, ...]] = {target: ()}
+
+        # asset -> {neighbour: step converting asset into neighbour}
+        edges = {}
+        for symbol, (base, quote) in sorted(self.pairs.items()):
+            # Prefer BASE/QUOTE (multiply) over QUOTE/BASE (divide) when both are listed
+            edges.setdefault(base, {})[quote] = (symbol, False)
+            edges.setdefault(quote, {}).setdefault(base, (symbol, True))
+
+        def hub_rank(asset):
+            return (HUB_ASSETS.index(asset) if asset in HUB_ASSETS else len(HUB_ASSETS), asset)
+
+        direct = {asset for asset, neighbours in edges.items() if target in neighbours and asset != target}
+        for asset in direct:
+            self.paths[asset] = (edges[asset][target],)
+        for asset, neighbours in edges.items():
+            if asset in self.paths:
+                continue
+            hubs = sorted((hub for hub in neighbours if hub in direct), key=hub_rank)
+            if hubs:
+                self.paths[asset] = (neighbours[hubs[0]], edges[hubs[0]][target])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def rate(self, asset: str, prices: Dict[str, Decimal]) -> Optional[Decimal]:
+        """Value of one unit of `asset` in the target asset, or None when unreachable or unpriced"""
+        path = self.paths.get(asset)
+        if path is None:
+            return None
+        rate = Decimal('1')
+        for symbol, invert in path:
+            price = prices.get(symbol)
+            if not price:
+                return None
+            rate = rate / price if invert else rate * price
+        return rate
+
+    def value_balances(self, balances: Iterable[Dict], prices: Dict[str, Decimal]) -> Dict:
+        """
+        Value exchange account balances ({'asset', 'free', 'locked'}) in one
+        pass. Assets without a path or price are listed under 'unpriced' and
+        left out of the total.
+        """
+        total = Decimal('0')
+        assets = []
+        unpriced = []
+        rates = {}
+        for balance in balances:
+            amount = Decimal(balance.get('free', '0')) + Decimal(balance.get('locked', '0'))
+            if amount == 0:
+                continue
+            asset = balance['asset']
+            if asset not in rates:
+                rates[asset] = self.rate(asset, prices)
+            rate = rates[asset]
+            if rate is None:
+                unpriced.append({'asset': asset, 'amount': amount})
+                continue
+            value = (amount * rate).quantize(QUANTUM)
+            total += value
+            assets.append({
+                'asset': asset,
+                'amount': amount,
+                'price': rate.quantize(QUANTUM),
+                'value': value,
+                'path': [symbol for symbol, _ in self.paths[asset]],
+            })
+
+        assets.sort(key=lambda item: item['value'], reverse=True)
+        return {'currency': self.target, 'total': total, 'assets': assets, 'unpriced': unpriced}
+
+
+class ConversionGraphCache:
+    """
+    Keeps the ConversionGraph for the current pair universe. The universe is
+    read off each all-symbols price snapshot, so exchangeInfo is only fetched
+    and the graph only rebuilt when symbols are listed or delisted.
+    """
+
+    def __init__(self, feed=price_feed):
+        self.feed = feed
+        self._graph = None
+        self._symbols = frozenset()
+        self._lock = threading.Lock()
+
+    def _fetch_pairs(self):
+        info = self.feed.fetch(EXCHANGE_INFO_PATH)
+        return [
+            (entry['symbol'], entry['baseAsset'], entry['quoteAsset'])
+            for entry in info.get('symbols', [])
+            if entry.get('status', 'TRADING') == 'TRADING'
+        ]
+
+    def get(self, prices: Dict[str, Decimal]) -> ConversionGraph:
+        """
+        Graph for the universe of `prices` (an all-symbols snapshot).
+        A failed rebuild keeps serving the previous graph; raises
+        PriceUnavailable only when there is none yet.
+        """
+        symbols = frozenset(prices)
+        if self._graph is not None and symbols == self._symbols:
+            return self._graph
+
+        with self._lock:
+            if self._graph is not None and symbols == self._symbols:
+                return self._graph
+            try:
+                pairs = self._fetch_pairs()
+            except PriceUnavailable as e:
+                if self._graph is None:
+                    raise
+                logger.warning(f"Could not refresh conversion graph, using previous one: {e}")
+                return self._graph
+
+            # Symbols without a price in the snapshot cannot carry a conversion
+            self._graph = ConversionGraph(pair for pair in pairs if pair[0] in symbols)
+            self._symbols = symbols
+            logger.info(f"Rebuilt conversion graph: {len(pairs)} pairs, {len(self._graph)} assets priced")
+            return self._graph
+
+    def invalidate(self):
+        """Force the next lookup to rebuild from exchangeInfo"""
+        with self._lock:
+            self._graph = None
+            self._symbols = frozenset()
+
+
+# Singleton instance
+conversion_graphs = ConversionGraphCache()
@@ -0,0 +1,209 @@
+"""
+Custom Strategy Rules
+Evaluates indicator-based buy/sell rules against indicator state shared per
+symbol and kline interval
+"""
+import threading
+import time
+from collections import deque
+import numpy as np
+from .binance_service import BinanceService
+from .indicators import create_indicator
+import logging
+
+logger = logging.getLogger(__name__)
+
+# TradingStrategy.execution_interval -> Binance kline interval
+KLINE_INTERVALS = {
+    '15min': '15m',
+    '30min': '30m',
+    '1h': '1h',
+    '4h': '4h',
+    '1d': '1d',
+}
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000,
+}
+
+HISTORY_BARS = 500
+
+OPERATORS = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+# Extra outputs some indicators expose besides .value
+INDICATOR_FIELDS = {'upper', 'lower', 'signal_value', 'histogram'}
+
+
+class IndicatorHub:
+    """
+    Bar history and indicator instances for one (symbol, interval).
+    Every strategy on the same pair and interval shares these, so each closed
+    bar costs one O(1) update per distinct indicator, not per strategy.
+    """
+
+    def __init__(self, symbol, interval):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.bars = deque(maxlen=HISTORY_BARS)  # (open_time, high, low, close, volume)
+        self.indicators = {}
+        self.last_open_time = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, name, params):
+        """Return the shared indicator for a spec, initializing it from history on first use"""
+        key = (name, tuple(params))
+        with self._lock:
+            indicator = self.indicators.get(key)
+            if indicator is None:
+                indicator = create_indicator(name, *params)
+                if self.bars:
+                    _, highs, lows, closes, volumes = np.array(self.bars, dtype=np.float64).T
+                    indicator.initialize(closes, highs, lows, volumes)
+                self.indicators[key] = indicator
+            return indicator
+
+    def refresh(self, fetch_klines, now_ms=None):
+        """Pull closed bars newer than the last one seen and stream them into every indicator"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        if self.last_open_time is not None and now_ms < self.last_open_time + 2 * self.interval_ms:
+            return 0  # No new bar has closed yet
+
+        if self.last_open_time is None:
+            limit = HISTORY_BARS + 1
+        else:
+            missing = (now_ms - self.last_open_time) // self.interval_ms
+            limit = int(min(missing + 1, HISTORY_BARS + 1))
+
+        klines = fetch_klines(self.symbol, self.interval, limit) or []
+        closed = [
+            (int(k[0]), float(k[2]), float(k[3]), float(k[4]), float(k[5]))
+            for k in klines
+            if int(k[6]) < now_ms and (self.last_open_time is None or int(k[0]) > self.last_open_time)
+        ]
+        if not closed:
+            return 0
+
+        with self._lock:
+            for bar in closed:
+                self.bars.append(bar)
+                _, high, low, close, volume = bar
+                for indicator in self.indicators.values():
+                    indicator.update(close, high, low, volume)
+            self.last_open_time = closed[-1][0]
+        return len(closed)
+
+
+class IndicatorRegistry:
+    """Process-wide IndicatorHub per (symbol, interval)"""
+
+    def __init__(self):
+        self.hubs = {}
+        self.binance = BinanceService(testnet=False)  # Public market data only
+        self._lock = threading.Lock()
+
+    def get(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            hub = self.hubs.get(key)
+            if hub is None:
+                hub = self.hubs[key] = IndicatorHub(symbol, interval)
+        return hub
+
+    def fetch_klines(self, symbol, interval, limit):
+        return self.binance.get_klines(symbol, interval=interval, limit=min(limit, 1000))
+
+
+indicator_registry = IndicatorRegistry()
+
+
+def _parse_operand(operand):
+    """'price', a number, or {'indicator': name, 'params': [...], 'field': optional}"""
+    if operand == 'price' or (isinstance(operand, (int, float)) and not isinstance(operand, bool)):
+        return operand
+    if isinstance(operand, dict) and 'indicator' in operand:
+        field = operand.get('field')
+        if field is not None and field not in INDICATOR_FIELDS:
+            raise ValueError(f"Unknown indicator field: {field}")
+        params = operand.get('params', [])
+        if not isinstance(params, list):
+            raise ValueError(f"Indicator params must be a list, got {params!r}")
+        create_indicator(operand['indicator'], *params)
+        return operand
+    raise ValueError(f"Invalid rule operand: {operand!r}")
+
+
+def validate_custom_config(config):
+    """
+    Check a custom strategy config, raising ValueError when it is malformed.
+
+    {
+        "interval": "1h",                      # optional, defaults to execution_interval
+        "buy_when": [{"left": {"indicator": "rsi", "params": [14]}, "op": "<", "right": 30}],
+        "sell_when": [{"left": "price", "op": ">", "right": {"indicator": "bollinger",
+                                                             "params": [20, 2], "field": "upper"}}]
+    }
+    Conditions within a list must all hold.
+    """
+    if not isinstance(config, dict):
+        raise ValueError('custom_config must be an object')
+    interval = config.get('interval')
+    if interval is not None and interval not in INTERVAL_MS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    for side in ('buy_when', 'sell_when'):
+        conditions = config.get(side, [])
+        if not isinstance(conditions, list):
+            raise ValueError(f"{side} must be a list of conditions")
+        for condition in conditions:
+            if not isinstance(condition, dict):
+                raise ValueError(f"Each {side} condition must be an object, got {condition!r}")
+            if condition.get('op') not in OPERATORS:
+                raise ValueError(f"Unsupported operator: {condition.get('op')}")
+            _parse_operand(condition.get('left'))
+            _parse_operand(condition.get('right'))
+
+
+def _resolve(operand, hub, price):
+    if operand == 'price':
+        return price
+    if isinstance(operand, (int, float)):
+        return float(operand)
+    indicator = hub.subscribe(operand['indicator'], operand.get('params', []))
+    return getattr(indicator, operand.get('field') or 'value')
+
+
+def _conditions_hold(conditions, hub, price):
+    if not conditions:
+        return False
+    for condition in conditions:
+        left = _resolve(condition['left'], hub, price)
+        right = _resolve(condition['right'], hub, price)
+        if left is None or right is None or not OPERATORS[condition['op']](float(left), float(right)):
+            return False
+    return True
+
+
+def evaluate_custom_strategy(strategy, price, fetch_klines=None, now_ms=None):
+    """
+    Decide 'buy', 'sell' or None for a custom strategy at the given price.
+    Indicators are read from the shared hub for the strategy's pair and interval.
+    `fetch_klines` and `now_ms` default to live klines and the wall clock.
+    """
+    config = strategy.custom_config or {}
+    interval = config.get('interval') or KLINE_INTERVALS.get(strategy.execution_interval, '1h')
+    hub = indicator_registry.get(strategy.trading_pair.symbol, interval)
+    hub.refresh(fetch_klines or indicator_registry.fetch_klines, now_ms)
+
+    price = float(price)
+    if _conditions_hold(config.get('sell_when'), hub, price):
+        return 'sell'
+    if _conditions_hold(config.get('buy_when'), hub, price):
+        return 'buy'
+    return None
@@ -0,0 +1,206 @@
+"""
+Dashboard Snapshot
+Everything the trading dashboard loads (pairs, prices, portfolio, orders,
+strategies, settings) built in one transaction against one price snapshot
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+from trading_backend.db_router import PROCESS_LOCAL_CACHES
+from .fast_serializers import build_row_plan, serialize_rows, values_queryset
+from .models import TradingPair, TradingStrategy, Order, UserSettings, PaperTradingPosition
+from .paper_trading_service import PaperTradingService
+from .portfolio_valuation import portfolio_valuator
+from .price_board import price_board
+from .serializers import TradingPairSerializer, TradingStrategySerializer, OrderSerializer, UserSettingsSerializer
+import logging
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_SECTIONS = ('pairs', 'prices', 'portfolio', 'orders', 'strategies', 'settings')
+DEFAULT_ORDERS_LIMIT = 50
+MAX_ORDERS_LIMIT = 500
+
+
+def parse_fields(value):
+    """
+    Parse ?fields=portfolio,orders.id,orders.status into {section: keys or None}.
+    A bare section name selects the whole section; dotted names keep only those
+    keys of each row (or of the section object). Empty selects everything.
+    """
+    if not value:
+        return {section: None for section in DASHBOARD_SECTIONS}
+
+    selected = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        section, _, key = item.partition('.')
+        if section not in DASHBOARD_SECTIONS:
+            raise ValueError(f"Unknown dashboard field: {section}")
+        if not key:
+            selected[section] = None
+        elif section not in selected or selected[section] is not None:
+            selected.setdefault(section, set()).add(key)
+    return selected
+
+
+def _project(data, keys):
+    if keys is None:
+        return data
+    if isinstance(data, list):
+        return [{key: row[key] for key in row if key in keys} for row in data]
+    return {key: value for key, value in data.items() if key in keys}
+
+
+def _version_key(user_id):
+    return f'dashboard:version:{user_id}'
+
+
+def _version_cache():
+    """
+    The cache holding dashboard versions, or None when it is process-local.
+    Fills from run_strategies or the risk monitor happen in other processes,
+    so only a shared cache sees their invalidations.
+    """
+    alias = getattr(settings, 'DASHBOARD_VERSION_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None or backend in PROCESS_LOCAL_CACHES:
+        return None
+    return caches[alias]
+
+
+def _version_marker(user_id):
+    """
+    One-query change marker of the user's orders, strategies, settings and
+    positions (newest update and row count of each), for caches that cannot
+    see other processes' invalidations
+    """
+    columns = {}
+    for name, model in (('orders', Order), ('strategies', TradingStrategy),
+                        ('settings', UserSettings), ('positions', PaperTradingPosition)):
+        rows = model.objects.filter(user=OuterRef('pk')).order_by().values('user')
+        columns[f'{name}_at'] = Subquery(rows.annotate(value=Max('updated_at')).values('value'))
+        columns[f'{name}_rows'] = Subquery(rows.annotate(value=Count('pk')).values('value'))
+    marker = get_user_model().objects.filter(pk=user_id).annotate(**columns).values_list(*columns).first()
+    return hash(marker)
+
+
+def dashboard_version(user_id):
+    """Changes whenever a user's cached snapshots must not be served"""
+    shared = _version_cache()
+    if shared is None:
+        return _version_marker(user_id)
+    return shared.get(_version_key(user_id), 0)
+
+
+def invalidate_dashboard(user_id):
+    """Expire a user's cached snapshots (called after their orders, strategies or settings change)"""
+    shared = _version_cache()
+    if shared is None:
+        return  # The next read's change marker sees the write
+    try:
+        shared.incr(_version_key(user_id))
+    except ValueError:
+        shared.set(_version_key(user_id), 1, None)
+
+
+class DashboardBuilder:
+    """Builds dashboard snapshots, cached per user for DASHBOARD_CACHE_SECONDS"""
+
+    def __init__(self):
+        self.paper_trading = PaperTradingService()
+        self._plans = {}
+
+    def _rows(self, serializer_class, queryset):
+        if serializer_class not in self._plans:
+            self._plans[serializer_class] = build_row_plan(serializer_class)
+        plan = self._plans[serializer_class]
+        if plan is None:
+            return serializer_class(queryset, many=True).data
+        return serialize_rows(plan, values_queryset(plan, queryset))
+
+    def get_snapshot(self, user, selected, orders_limit=DEFAULT_ORDERS_LIMIT):
+        ttl = getattr(settings, 'DASHBOARD_CACHE_SECONDS', 2)
+        if ttl <= 0:
+            return self.build(user, selected, orders_limit)
+
+        version = dashboard_version(user.pk)
+        fields = ','.join(
+            section if keys is None else ','.join(f"{section}.{key}" for key in sorted(keys))
+            for section, keys in sorted(selected.items())
+        )
+        key = f'dashboard:{user.pk}:{version}:{orders_limit}:{fields}'
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = self.build(user, selected, orders_limit)
+            cache.set(key, snapshot, ttl)
+        return snapshot
+
+    def snapshot_prices(self, pairs):
+        """One price per pair: fresh price-board values, the rest from a single ticker call"""
+        prices = {}
+        missing = []
+        for pair_id, symbol in pairs:
+            price = price_board.get_price(pair_id)
+            if price is None:
+                missing.append(symbol)
+            else:
+                prices[symbol] = price
+        if missing:
+            prices.update(self.paper_trading.get_all_prices(missing))
+        return prices
+
+    def build(self, user, selected, orders_limit=DEFAULT_ORDERS_LIMIT):
+        pairs = TradingPair.objects.filter(is_active=True).order_by('id')
+        prices = {}
+        if 'prices' in selected or 'portfolio' in selected:
+            # Upstream price calls happen before the transaction opens
+            prices = self.snapshot_prices(pairs.values_list('id', 'symbol'))
+
+        # Inside a caller's transaction atomic() is only a savepoint and the level can no longer change
+        repeatable_read = connection.vendor == 'postgresql' and not connection.in_atomic_block
+        with transaction.atomic():
+            if repeatable_read:
+                # Every query below sees the same database snapshot
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            return self._build(user, selected, orders_limit, pairs, prices)
+
+    def _build(self, user, selected, orders_limit, pairs, prices):
+        snapshot = {'generated_at': timezone.now()}
+
+        if 'pairs' in selected:
+            snapshot['pairs'] = _project(self._rows(TradingPairSerializer, pairs), selected['pairs'])
+
+        if 'prices' in selected:
+            keys = selected['prices']
+            snapshot['prices'] = {
+                symbol: str(price) for symbol, price in prices.items() if keys is None or symbol in keys
+            }
+
+        if 'portfolio' in selected:
+            # Mark this copy to the snapshot so the portfolio agrees with 'prices'
+            portfolio = portfolio_valuator.get_portfolio(
+                user, price_source=self.paper_trading.get_symbol_price, prices=prices
+            )
+            snapshot['portfolio'] = _project(portfolio, selected['portfolio'])
+
+        if 'orders' in selected:
+            orders = Order.objects.filter(user=user).order_by('-created_at')[:orders_limit]
+            snapshot['orders'] = _project(self._rows(OrderSerializer, orders), selected['orders'])
+
+        if 'strategies' in selected:
+            strategies = TradingStrategy.objects.filter(user=user).order_by('id')
+            snapshot['strategies'] = _project(self._rows(TradingStrategySerializer, strategies), selected['strategies'])
+
+        if 'settings' in selected:
+            user_settings, _ = UserSettings.objects.get_or_create(user=user)
+            snapshot['settings'] = _project(UserSettingsSerializer(user_settings).data, selected['settings'])
+
+        return snapshot
+
+
+# Singleton instance
+dashboard_builder = DashboardBuilder()
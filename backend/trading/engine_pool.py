@@ -0,0 +1,111 @@
+"""
+Trading Engine Pool
+Keeps warm TradingEngine/BinanceService instances per user and credential set
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .models import UserSettings
+from .trading_engine import TradingEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def credentials_fingerprint(user_settings: UserSettings) -> str:
+    """Stable fingerprint of the exchange credentials an engine was built with"""
+    raw = f"{user_settings.binance_api_key}:{user_settings.binance_api_secret}:{user_settings.use_testnet}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TradingEnginePool:
+    """LRU pool of TradingEngine instances keyed by user and credentials"""
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._engines = OrderedDict()  # user_id -> (fingerprint, engine)
+        self._lock = threading.Lock()
+
+    def get_engine(self, user, user_settings: UserSettings = None) -> TradingEngine:
+        """
+        Return a warm engine for the user, building one on a cache miss.
+        Hits skip the UserSettings lookup and reuse the engine's HTTP session.
+        Callers that already loaded the settings pass them in: a pooled engine
+        built with other credentials (saved by another process, which the
+        post_save hook cannot reach) is rebuilt, otherwise the fresh row is
+        swapped in.
+        """
+        fingerprint = credentials_fingerprint(user_settings) if user_settings is not None else None
+        with self._lock:
+            entry = self._engines.get(user.pk)
+            if entry is not None and fingerprint in (None, entry[0]):
+                self._engines.move_to_end(user.pk)
+                if user_settings is not None:
+                    entry[1].user_settings = user_settings
+                return entry[1]
+
+        engine = TradingEngine(user, user_settings)
+        fingerprint = credentials_fingerprint(engine.user_settings)
+
+        with self._lock:
+            # Another thread may have built one meanwhile; keep the first
+            entry = self._engines.get(user.pk)
+            if entry is not None and entry[0] == fingerprint:
+                self._engines.move_to_end(user.pk)
+                engine.binance.close()
+                return entry[1]
+
+            self._store(user.pk, fingerprint, engine)
+        return engine
+
+    def _store(self, user_id, fingerprint, engine):
+        """Insert an engine and evict the least recently used beyond max_size"""
+        previous = self._engines.pop(user_id, None)
+        if previous is not None:
+            previous[1].binance.close()
+
+        self._engines[user_id] = (fingerprint, engine)
+        while len(self._engines) > self.max_size:
+            _, (_, evicted) = self._engines.popitem(last=False)
+            evicted.binance.close()
+
+    def refresh_settings(self, user_settings: UserSettings):
+        """
+        Apply a saved UserSettings row to the pooled engine.
+        Credential or testnet changes drop the engine; other fields are swapped in place.
+        """
+        with self._lock:
+            entry = self._engines.get(user_settings.user_id)
+            if entry is None:
+                return
+
+            fingerprint, engine = entry
+            if fingerprint != credentials_fingerprint(user_settings):
+                del self._engines[user_settings.user_id]
+                engine.binance.close()
+                logger.info(f"Invalidated pooled trading engine for user {user_settings.user_id}")
+            else:
+                engine.user_settings = user_settings
+
+    def invalidate(self, user_id):
+        """Drop the pooled engine for a user"""
+        with self._lock:
+            entry = self._engines.pop(user_id, None)
+        if entry is not None:
+            entry[1].binance.close()
+
+    def clear(self):
+        """Drop every pooled engine"""
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines.clear()
+        for _, engine in entries:
+            engine.binance.close()
+
+    def __len__(self):
+        return len(self._engines)
+
+
+# Singleton instance
+engine_pool = TradingEnginePool(max_size=getattr(settings, 'TRADING_ENGINE_POOL_SIZE', 256))
@@ -0,0 +1,423 @@
+"""
+Equity Curve
+Retroactive portfolio value over time: cash and positions rebuilt from
+TradeHistory, marked to market against cached historical candle closes
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from .archive_service import trade_archiver
+from .custom_strategy import INTERVAL_MS
+from .models import TradeHistory, TradingPair, UserSettings
+from .price_feed import price_feed, PriceUnavailable
+import logging
+
+logger = logging.getLogger(__name__)
+
+CANDLE_DTYPE = np.dtype([('open_time', '<i8'), ('close', '<f8')])
+KLINES_PATH = '/api/v3/klines'
+KLINES_PAGE = 1000
+FETCH_RETRY_SECONDS = 60
+
+
+class FetchBudget:
+    """Upper bound on kline pages fetched while serving one request (None = unbounded)"""
+
+    def __init__(self, pages=None):
+        self.pages = pages
+
+    def take(self):
+        if self.pages is None:
+            return True
+        if self.pages <= 0:
+            return False
+        self.pages -= 1
+        return True
+
+
+class CandleCache:
+    """
+    Closed-candle closes per (symbol, interval), kept in memory and persisted
+    as .npy files under CANDLE_CACHE_DIR. Only bars missing at either end of
+    the cached range are fetched, through the hedged price feed, and at most
+    as many pages as the caller's FetchBudget allows. The covered range grows
+    page by page, so an interrupted or budget-limited fetch keeps its progress.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or getattr(settings, 'CANDLE_CACHE_DIR', None)
+        self._candles = {}
+        self._covered = {}  # (symbol, interval) -> (start, end) open times known to be complete
+        self._failed_at = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.directory, f"{symbol}-{interval}.npy")
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self._candles:
+            candles = np.empty(0, dtype=CANDLE_DTYPE)
+            if self.directory and os.path.exists(self._path(symbol, interval)):
+                try:
+                    candles = np.load(self._path(symbol, interval))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable candle cache for {symbol} {interval}: {e}")
+            self._candles[key] = candles
+            if candles.size:
+                self._covered[key] = (int(candles['open_time'][0]), int(candles['open_time'][-1]))
+        return self._candles[key]
+
+    def _save(self, symbol, interval, candles):
+        self._candles[(symbol, interval)] = candles
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol, interval)
+        with open(f"{path}.tmp", 'wb') as f:
+            np.save(f, candles)
+        os.replace(f"{path}.tmp", path)
+
+    def _pages_forward(self, symbol, interval, start_ms, end_ms, budget):
+        """Yield (rows, complete through) for start_ms..end_ms, oldest page first"""
+        while start_ms <= end_ms and budget.take():
+            klines = price_feed.fetch(KLINES_PATH, {
+                'symbol': symbol, 'interval': interval,
+                'startTime': start_ms, 'endTime': end_ms, 'limit': KLINES_PAGE,
+            })
+            rows = [(int(k[0]), float(k[4])) for k in klines]
+            if len(klines) < KLINES_PAGE:
+                yield rows, end_ms
+                return
+            yield rows, rows[-1][0]
+            start_ms = rows[-1][0] + INTERVAL_MS[interval]
+
+    def _pages_backward(self, symbol, interval, start_ms, end_ms, budget):
+        """Yield (rows, complete from) for start_ms..end_ms, newest page first"""
+        while start_ms <= end_ms and budget.take():
+            # Without startTime Binance returns the newest `limit` bars up to endTime
+            klines = price_feed.fetch(KLINES_PATH, {
+                'symbol': symbol, 'interval': interval, 'endTime': end_ms, 'limit': KLINES_PAGE,
+            })
+            rows = [(int(k[0]), float(k[4])) for k in klines if int(k[0]) >= start_ms]
+            if len(klines) < KLINES_PAGE or int(klines[0][0]) <= start_ms:
+                yield rows, start_ms
+                return
+            yield rows, rows[0][0]
+            end_ms = rows[0][0] - INTERVAL_MS[interval]
+
+    def get(self, symbol, interval, start_ms, end_ms, budget=None):
+        """
+        Candles (structured open_time/close array) covering open times
+        start_ms..end_ms as far as they exist upstream and the budget allows.
+        Returns whatever is cached when the upstream fetch fails; see
+        complete_through() for how far the result can be trusted.
+        """
+        key = (symbol, interval)
+        step = INTERVAL_MS[interval]
+        budget = budget or FetchBudget()
+        with self._key_lock(key):
+            candles = self._load(symbol, interval)
+            covered = self._covered.get(key)
+            if covered and covered[0] <= start_ms and covered[1] >= end_ms:
+                return candles
+            if time.monotonic() - self._failed_at.get(key, -FETCH_RETRY_SECONDS) < FETCH_RETRY_SECONDS:
+                return candles
+
+            # Bars missing upstream (before listing, halts) count as covered once asked for
+            low, high = covered if covered else (start_ms, start_ms - step)
+            rows = []
+            try:
+                if covered and start_ms < low:
+                    for page, low in self._pages_backward(symbol, interval, start_ms, low - step, budget):
+                        rows.extend(page)
+                if end_ms > high:
+                    for page, high in self._pages_forward(symbol, interval, high + step, end_ms, budget):
+                        rows.extend(page)
+            except PriceUnavailable as e:
+                logger.warning(f"Could not fetch {symbol} {interval} candles: {e}")
+                self._failed_at[key] = time.monotonic()
+
+            if high >= low:
+                self._covered[key] = (low, high)
+            if rows:
+                merged = np.concatenate([candles, np.array(rows, dtype=CANDLE_DTYPE)])
+                candles = merged[np.unique(merged['open_time'], return_index=True)[1]]
+                self._save(symbol, interval, candles)
+            return candles
+
+    def complete_through(self, symbol, interval, start_ms):
+        """Last open time from start_ms on whose candle is known, or start_ms - step when none is"""
+        covered = self._covered.get((symbol, interval))
+        if not covered or covered[0] > start_ms:
+            return start_ms - INTERVAL_MS[interval]
+        return covered[1]
+
+
+# Singleton instance
+candle_cache = CandleCache()
+
+
+def _datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def _forward_fill(prices, initial):
+    """Carry the last known price along each row; `initial` seeds the first column"""
+    prices = np.concatenate([initial[:, None], prices], axis=1)
+    known = ~np.isnan(prices)
+    index = np.where(known, np.arange(prices.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = prices[np.arange(prices.shape[0])[:, None], index]
+    return filled[:, 1:]
+
+
+class EquityCurveBuilder:
+    """
+    Computes equity per closed bar as cash + sum(position x close), with the
+    position path taken as the cumulative sum of fills per bar. Results are
+    cached per (user, interval) together with the end-of-curve state, so a
+    later call only computes bars (and fills) newer than the cached ones.
+    A backdated or deleted fill in the cached range triggers a full rebuild;
+    archiving counts as a delete, and the rebuild reads the archived fills.
+
+    Only bars whose candles are known for every symbol are cached. Bars after
+    that (an upstream outage, or a cold cache beyond the per-request fetch
+    budget) are computed on a copy of the state with forward-filled prices,
+    reported via complete_until, and recomputed by later calls.
+    """
+
+    def _cache_key(self, user_id, interval):
+        return f'equity-curve:{user_id}:{interval}'
+
+    def _archived_trades(self, user, start_ms=None, end_ms=None):
+        """Archived fills in [start_ms, end_ms) as (executed_at, id, symbol, side, amount, price, total, fee)"""
+        newest = trade_archiver.newest('trades')
+        if newest is None or (start_ms is not None and newest < _datetime(start_ms)):
+            return []
+        rows = list(trade_archiver.iter_archived(
+            'trades',
+            start=_datetime(start_ms) if start_ms is not None else None,
+            end=_datetime(end_ms) if end_ms is not None else None,
+            user_id=user.pk,
+        ))
+        if not rows:
+            return []
+        symbols = dict(TradingPair.objects.filter(
+            id__in={row['trading_pair_id'] for row in rows}
+        ).values_list('id', 'symbol'))
+        return [
+            (
+                datetime.fromisoformat(row['executed_at']), row['id'], symbols.get(row['trading_pair_id']),
+                row['side'], Decimal(row['amount']), Decimal(row['price']), Decimal(row['total']),
+                Decimal(row['fee'] or '0'),
+            )
+            for row in rows
+        ]
+
+    def _trades(self, user, start_ms=None, end_ms=None):
+        """
+        (times ms, symbols, signed quantities, cash flows, prices) for fills in
+        [start_ms, end_ms), including fills moved to the trade archive
+        """
+        queryset = TradeHistory.objects.filter(user=user)
+        if start_ms is not None:
+            queryset = queryset.filter(executed_at__gte=_datetime(start_ms))
+        if end_ms is not None:
+            queryset = queryset.filter(executed_at__lt=_datetime(end_ms))
+        rows = list(queryset.order_by('executed_at', 'id').values_list(
+            'executed_at', 'id', 'trading_pair__symbol', 'side', 'amount', 'price', 'total', 'fee'
+        ))
+        archived = self._archived_trades(user, start_ms, end_ms)
+        if archived:
+            rows = sorted(archived + rows, key=lambda row: (row[0], row[1]))
+        if not rows:
+            return None
+
+        executed_at, _, symbols, sides, amounts, prices, totals, fees = zip(*rows)
+        sign = np.where(np.array(sides) == 'buy', 1.0, -1.0)
+        fees = np.array(fees, dtype=float)
+        return {
+            'times': np.array([int(dt.timestamp() * 1000) for dt in executed_at], dtype=np.int64),
+            'symbols': symbols,
+            'quantities': sign * np.array(amounts, dtype=float),
+            # Fees are assumed to be charged in the quote asset
+            'flows': -sign * np.array(totals, dtype=float) - fees,
+            'prices': np.array(prices, dtype=float),
+        }
+
+    @staticmethod
+    def _slice_trades(trades, start_ms=None, end_ms=None):
+        """Fills of an already loaded batch with start_ms <= time < end_ms, or None"""
+        if trades is None:
+            return None
+        keep = np.ones(len(trades['times']), dtype=bool)
+        if start_ms is not None:
+            keep &= trades['times'] >= start_ms
+        if end_ms is not None:
+            keep &= trades['times'] < end_ms
+        if not keep.any():
+            return None
+        return {
+            'times': trades['times'][keep],
+            'symbols': tuple(symbol for symbol, kept in zip(trades['symbols'], keep) if kept),
+            'quantities': trades['quantities'][keep],
+            'flows': trades['flows'][keep],
+            'prices': trades['prices'][keep],
+        }
+
+    def _segment(self, state, interval, bar_times, trades, budget):
+        """Extend `state` (symbols, positions, cash, last prices) over bar_times"""
+        step = INTERVAL_MS[interval]
+        if trades is not None:
+            for symbol in dict.fromkeys(trades['symbols']):
+                if symbol not in state['symbols']:
+                    state['symbols'].append(symbol)
+                    state['positions'] = np.append(state['positions'], 0.0)
+                    state['last_prices'] = np.append(state['last_prices'], np.nan)
+
+        n_symbols, n_bars = len(state['symbols']), len(bar_times)
+        deltas = np.zeros((n_symbols, n_bars))
+        flows = np.zeros(n_bars)
+        trade_prices = np.full((n_symbols, n_bars), np.nan)
+        if trades is not None:
+            index = {symbol: i for i, symbol in enumerate(state['symbols'])}
+            rows = np.array([index[symbol] for symbol in trades['symbols']], dtype=np.intp)
+            bars = ((trades['times'] - bar_times[0]) // step).astype(np.intp)
+            np.add.at(deltas, (rows, bars), trades['quantities'])
+            np.add.at(flows, bars, trades['flows'])
+            # Last fill price per (symbol, bar) marks bars that have no candle
+            cells = rows * n_bars + bars
+            last = len(cells) - 1 - np.unique(cells[::-1], return_index=True)[1]
+            trade_prices.flat[cells[last]] = trades['prices'][last]
+
+        closes = np.full((n_symbols, n_bars), np.nan)
+        for row, symbol in enumerate(state['symbols']):
+            candles = candle_cache.get(symbol, interval, int(bar_times[0]), int(bar_times[-1]), budget)
+            if candles.size:
+                position = np.searchsorted(candles['open_time'], bar_times)
+                position = np.minimum(position, candles.size - 1)
+                found = candles['open_time'][position] == bar_times
+                closes[row, found] = candles['close'][position[found]]
+        closes = np.where(np.isnan(closes), trade_prices, closes)
+        closes = _forward_fill(closes, state['last_prices'])
+
+        positions = state['positions'][:, None] + np.cumsum(deltas, axis=1)
+        cash = state['cash'] + np.cumsum(flows)
+        positions_value = np.nansum(positions * closes, axis=0)
+
+        state['positions'] = positions[:, -1].copy()
+        state['cash'] = float(cash[-1])
+        state['last_prices'] = closes[:, -1].copy()
+        return cash, positions_value
+
+    def _initial_state(self, user, interval):
+        """Empty curve starting at the bar of the user's first fill, or None without fills"""
+        trades = self._trades(user)
+        if trades is None:
+            return None
+        # Cash before the first fill, chosen so cash after every fill equals the current paper balance
+        balance = UserSettings.objects.filter(user=user).values_list('paper_balance_usdt', flat=True).first()
+        step = INTERVAL_MS[interval]
+        return {
+            'symbols': [],
+            'positions': np.zeros(0),
+            'last_prices': np.zeros(0),
+            'cash': float(balance if balance is not None else 0) - float(trades['flows'].sum()),
+            'next_bar': int(trades['times'][0]) // step * step,
+            'bar_times': np.zeros(0, dtype=np.int64),
+            'cash_curve': np.zeros(0),
+            'positions_value': np.zeros(0),
+            'trade_count': 0,
+            'max_trade_id': None,
+        }
+
+    def _fingerprint(self, user, end_ms):
+        stats = TradeHistory.objects.filter(user=user, executed_at__lt=_datetime(end_ms)).aggregate(
+            count=Count('id'), max_id=Max('id')
+        )
+        return stats['count'], stats['max_id']
+
+    def get_curve(self, user, interval='1h', now_ms=None, fetch_pages=None):
+        """
+        Equity curve up to the last closed bar as a dict of parallel arrays:
+        bar_times (open time, ms), cash, positions_value and equity, plus
+        complete_until (open time of the last bar priced from real candles).
+        None when the user has no fills. fetch_pages bounds the kline pages
+        fetched by this call (default EQUITY_CURVE_FETCH_PAGES; 0 = none).
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        step = INTERVAL_MS[interval]
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        last_bar = now_ms // step * step - step
+        if fetch_pages is None:
+            fetch_pages = getattr(settings, 'EQUITY_CURVE_FETCH_PAGES', 10)
+        budget = FetchBudget(fetch_pages)
+
+        key = self._cache_key(user.pk, interval)
+        state = cache.get(key)
+        if state is not None and self._fingerprint(user, state['next_bar']) != (
+                state['trade_count'], state['max_trade_id']):
+            state = None  # A fill inside the cached range changed
+        if state is None:
+            state = self._initial_state(user, interval)
+            if state is None:
+                return None
+
+        start = state['next_bar']
+        trades = self._trades(user, start_ms=start, end_ms=last_bar + step) if last_bar >= start else None
+        tail = None
+        if last_bar >= start:
+            symbols = list(dict.fromkeys([*state['symbols'], *(trades['symbols'] if trades else ())]))
+            complete = last_bar
+            for symbol in symbols:
+                candle_cache.get(symbol, interval, start, last_bar, budget)
+                complete = min(complete, candle_cache.complete_through(symbol, interval, start))
+
+            if complete >= start:
+                bar_times = np.arange(start, complete + step, step, dtype=np.int64)
+                cash, positions_value = self._segment(
+                    state, interval, bar_times, self._slice_trades(trades, end_ms=complete + step), budget
+                )
+                state['bar_times'] = np.concatenate([state['bar_times'], bar_times])
+                state['cash_curve'] = np.concatenate([state['cash_curve'], cash])
+                state['positions_value'] = np.concatenate([state['positions_value'], positions_value])
+                state['next_bar'] = complete + step
+                state['trade_count'], state['max_trade_id'] = self._fingerprint(user, state['next_bar'])
+                cache.set(key, state, None)
+
+            if complete < last_bar:
+                bar_times = np.arange(state['next_bar'], last_bar + step, step, dtype=np.int64)
+                # _segment rebinds the arrays it changes, so a shallow copy keeps the cached state intact
+                tail_state = {**state, 'symbols': list(state['symbols'])}
+                tail = (bar_times, *self._segment(
+                    tail_state, interval, bar_times, self._slice_trades(trades, start_ms=state['next_bar']), budget
+                ))
+
+        curve = {
+            'bar_times': state['bar_times'],
+            'cash': state['cash_curve'],
+            'positions_value': state['positions_value'],
+            'complete_until': state['next_bar'] - step if state['bar_times'].size else None,
+        }
+        if tail is not None:
+            for name, values in zip(('bar_times', 'cash', 'positions_value'), tail):
+                curve[name] = np.concatenate([curve[name], values])
+        curve['equity'] = curve['cash'] + curve['positions_value']
+        return curve
+
+
+# Singleton instance
+equity_curves = EquityCurveBuilder()
@@ -0,0 +1,286 @@
+"""
+Export Service
+Streams orders and trade history (hot tables and archived months) as CSV,
+Parquet or Arrow with bounded memory
+"""
+import csv
+import heapq
+import io
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.utils import timezone
+from .archive_service import trade_archiver
+from .models import Order, TradeHistory, TradingPair
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency for columnar exports
+    pa = None
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# (column name, ORM lookup, arrow type name)
+EXPORT_COLUMNS = {
+    'orders': [
+        ('id', 'id', 'int64'),
+        ('user_id', 'user_id', 'int64'),
+        ('strategy_id', 'strategy_id', 'int64'),
+        ('trading_pair_symbol', 'trading_pair__symbol', 'string'),
+        ('order_type', 'order_type', 'string'),
+        ('order_side', 'order_side', 'string'),
+        ('status', 'status', 'string'),
+        ('price', 'price', 'decimal'),
+        ('amount', 'amount', 'decimal'),
+        ('filled_amount', 'filled_amount', 'decimal'),
+        ('filled_price', 'filled_price', 'decimal'),
+        ('is_paper_trade', 'is_paper_trade', 'bool'),
+        ('exchange_order_id', 'exchange_order_id', 'string'),
+        ('created_at', 'created_at', 'timestamp'),
+        ('filled_at', 'filled_at', 'timestamp'),
+    ],
+    'trades': [
+        ('id', 'id', 'int64'),
+        ('user_id', 'user_id', 'int64'),
+        ('order_id', 'order_id', 'int64'),
+        ('trading_pair_symbol', 'trading_pair__symbol', 'string'),
+        ('side', 'side', 'string'),
+        ('price', 'price', 'decimal'),
+        ('amount', 'amount', 'decimal'),
+        ('total', 'total', 'decimal'),
+        ('fee', 'fee', 'decimal'),
+        ('profit_loss', 'profit_loss', 'decimal'),
+        ('exchange_trade_id', 'exchange_trade_id', 'string'),
+        ('executed_at', 'executed_at', 'timestamp'),
+    ],
+}
+
+
+def _parse_date(value):
+    dt = datetime.strptime(value, '%Y-%m-%d')
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def export_queryset(kind, filters):
+    """
+    Build the filtered queryset for an export.
+    Supported filters: from_date / to_date (YYYY-MM-DD, inclusive), symbol,
+    side, status (orders only) and user_id. Raises ValueError on bad input.
+    """
+    if kind == 'orders':
+        queryset = Order.objects.all()
+        time_field, side_field = 'created_at', 'order_side'
+    elif kind == 'trades':
+        queryset = TradeHistory.objects.all()
+        time_field, side_field = 'executed_at', 'side'
+    else:
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    start, end = _date_range(filters)
+    if start is not None:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+
+    if filters.get('symbol'):
+        queryset = queryset.filter(trading_pair__symbol=filters['symbol'])
+    if filters.get('side'):
+        queryset = queryset.filter(**{side_field: filters['side']})
+    if filters.get('status') and kind == 'orders':
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('user_id'):
+        try:
+            queryset = queryset.filter(user_id=int(filters['user_id']))
+        except ValueError:
+            raise ValueError('user_id must be an integer')
+
+    lookups = [lookup for _, lookup, _ in EXPORT_COLUMNS[kind]]
+    return queryset.order_by(time_field, 'id').values_list(*lookups)
+
+
+def _date_range(filters):
+    """[start, end) datetimes for the from_date / to_date filters"""
+    try:
+        start = _parse_date(filters['from_date']) if filters.get('from_date') else None
+        end = _parse_date(filters['to_date']) + timedelta(days=1) if filters.get('to_date') else None
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+    return start, end
+
+
+def _archived_value(row, lookup, type_name, symbols):
+    if lookup == 'trading_pair__symbol':
+        return symbols.get(row['trading_pair_id'])
+    value = row.get(lookup)
+    if value is None:
+        return None
+    if type_name == 'decimal':
+        return Decimal(value)
+    if type_name == 'timestamp':
+        return datetime.fromisoformat(value)
+    return value
+
+
+def archived_rows(kind, filters):
+    """
+    Archived rows matching the export filters, as tuples in (time, id) order.
+    One archived month is held in memory at a time: rows are never stamped
+    before the month they are filed under, so everything earlier than the
+    next month's start can be released before that month is loaded.
+    """
+    start, end = _date_range(filters)
+    newest = trade_archiver.newest(kind)
+    if newest is None or (start is not None and newest < start):
+        return
+
+    user_id = int(filters['user_id']) if filters.get('user_id') else None
+    time_field = 'created_at' if kind == 'orders' else 'executed_at'
+    side_field = 'order_side' if kind == 'orders' else 'side'
+    columns = EXPORT_COLUMNS[kind]
+    time_index = [lookup for _, lookup, _ in columns].index(time_field)
+    symbols = dict(TradingPair.objects.values_list('id', 'symbol'))
+
+    def keep(row):
+        if filters.get('symbol') and symbols.get(row['trading_pair_id']) != filters['symbol']:
+            return False
+        if filters.get('side') and row[side_field] != filters['side']:
+            return False
+        return not (filters.get('status') and kind == 'orders' and row['status'] != filters['status'])
+
+    pending = []  # heap of ((time, id), row tuple)
+    for month, rows in trade_archiver.iter_months(kind, start, end, user_id):
+        while pending and pending[0][0][0] < month:
+            yield heapq.heappop(pending)[1]
+        for row in rows:
+            if keep(row):
+                values = tuple(_archived_value(row, lookup, type_name, symbols) for _, lookup, type_name in columns)
+                heapq.heappush(pending, ((values[time_index], values[0]), values))
+    while pending:
+        yield heapq.heappop(pending)[1]
+
+
+def export_rows(kind, filters, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Hot and archived rows for an export, merged in (time, id) order"""
+    queryset = export_queryset(kind, filters)
+    time_field = 'created_at' if kind == 'orders' else 'executed_at'
+    time_index = [lookup for _, lookup, _ in EXPORT_COLUMNS[kind]].index(time_field)
+    return heapq.merge(
+        queryset.iterator(chunk_size=chunk_size),
+        archived_rows(kind, filters),
+        key=lambda row: (row[time_index], row[0]),
+    )
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(kind, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield CSV bytes, one block per database chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([name for name, _, _ in EXPORT_COLUMNS[kind]])
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainBuffer(io.RawIOBase):
+    """Write-only sink whose contents are handed out and discarded as the stream progresses"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(kind):
+    types = {
+        'int64': pa.int64(),
+        'string': pa.string(),
+        'decimal': pa.decimal128(20, 8),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(name, types[type_name]) for name, _, type_name in EXPORT_COLUMNS[kind]])
+
+
+def iter_columnar(kind, rows, export_format='parquet', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield Parquet (one row group per chunk) or Arrow IPC stream bytes"""
+    if pa is None:
+        raise ValueError('Columnar exports require pyarrow (pip install pyarrow)')
+
+    schema = _arrow_schema(kind)
+    sink = _DrainBuffer()
+    if export_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa_ipc.new_stream(sink, schema)
+
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            columns = list(zip(*chunk))
+            batch = pa.record_batch(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(kind, filters, export_format='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate an export request and return its byte iterator"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"export_format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if export_format != 'csv' and pa is None:
+        raise ValueError('Columnar exports require pyarrow (pip install pyarrow)')
+
+    rows = export_rows(kind, filters, chunk_size)
+    if export_format == 'csv':
+        return iter_csv(kind, rows, chunk_size)
+    return iter_columnar(kind, rows, export_format, chunk_size)
+
+
+def export_filename(kind, export_format):
+    extension = {'csv': 'csv', 'parquet': 'parquet', 'arrow': 'arrows'}[export_format]
+    return f"{kind}-{timezone.now():%Y%m%d-%H%M%S}.{extension}"
@@ -0,0 +1,212 @@
+"""
+Fast List Serialization
+Read-only rows built straight from QuerySet.values() with per-field converters
+taken from the ModelSerializer, producing byte-identical JSON far faster
+"""
+import decimal
+from rest_framework import ISO_8601, fields as drf_fields, relations
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+import logging
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used without it
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Fields whose to_representation() is the identity for what .values() returns
+_IDENTITY_FIELDS = (
+    drf_fields.CharField,
+    drf_fields.IntegerField,
+    drf_fields.BooleanField,
+    drf_fields.ReadOnlyField,
+    relations.PrimaryKeyRelatedField,
+)
+# Fields whose to_representation() is safe to call on a raw .values() value
+_CONVERTED_FIELDS = (
+    drf_fields.DecimalField,
+    drf_fields.DateTimeField,
+    drf_fields.DateField,
+    drf_fields.FloatField,
+    drf_fields.ChoiceField,
+    drf_fields.JSONField,
+)
+
+
+class FastRows(list):
+    """Rows produced by serialize_rows; FastJSONRenderer may encode them with orjson"""
+
+    orjson_safe = True
+
+
+def _identity(value):
+    return value
+
+
+def _decimal_converter(field):
+    """DecimalField.to_representation with the quantize context built once per call"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field):
+    """DateTimeField.to_representation with format and timezone resolved once per call"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.tzinfo is None:
+            return field.to_representation(value)
+        text = value.astimezone(field_timezone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def _converter_factory(field):
+    """
+    Zero-argument callable returning the field's value converter, or None when
+    the fast path can't reproduce the field. Factories run once per request so
+    settings, timezone and decimal context are read at request time.
+    """
+    if isinstance(field, drf_fields.JSONField):
+        return (lambda: _identity) if not field.binary else (lambda: field.to_representation)
+    if isinstance(field, drf_fields.ChoiceField):
+        if all(isinstance(key, str) for key in field.choice_strings_to_values.values()):
+            return lambda: _identity
+        return lambda: field.to_representation
+    if isinstance(field, drf_fields.DecimalField):
+        return lambda: _decimal_converter(field)
+    if isinstance(field, drf_fields.DateTimeField):
+        return lambda: _datetime_converter(field)
+    if isinstance(field, _CONVERTED_FIELDS):
+        return lambda: field.to_representation
+    if isinstance(field, _IDENTITY_FIELDS):
+        return lambda: _identity
+    return None
+
+
+def build_row_plan(serializer_class):
+    """
+    [(output name, values() lookup, converter factory, is JSON field)] for a
+    serializer, in its output order, or None if any readable field is
+    unsupported (method fields, nested serializers, custom fields).
+    """
+    serializer = serializer_class()
+    plan = []
+    for field in serializer._readable_fields:
+        if field.source == '*':
+            return None
+        factory = _converter_factory(field)
+        if factory is None:
+            return None
+        lookup = field.source.replace('.', '__')
+        plan.append((field.field_name, lookup, factory, isinstance(field, drf_fields.JSONField)))
+    return plan
+
+
+def _has_unsafe_float(value):
+    """Floats that orjson would format differently from json.dumps (exponents, inf/nan)"""
+    if isinstance(value, float):
+        text = repr(value)
+        return 'e' in text or 'n' in text
+    if isinstance(value, dict):
+        return any(_has_unsafe_float(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_unsafe_float(item) for item in value)
+    return False
+
+
+def values_queryset(plan, queryset):
+    """values_list() of the plan's lookups, in plan order"""
+    return queryset.values_list(*[lookup for _, lookup, _, _ in plan])
+
+
+def serialize_rows(plan, values):
+    """
+    Convert values_queryset() tuples into the dicts serializer(many=True).data
+    would produce for the same rows
+    """
+    columns = [(name, index, factory()) for index, (name, _, factory, _) in enumerate(plan)]
+    json_indexes = [index for index, (_, _, _, is_json) in enumerate(plan) if is_json]
+
+    rows = FastRows()
+    append = rows.append
+    for row in values:
+        append({
+            name: None if row[index] is None else converter(row[index])
+            for name, index, converter in columns
+        })
+        if json_indexes and rows.orjson_safe:
+            rows.orjson_safe = not any(_has_unsafe_float(row[index]) for index in json_indexes)
+    return rows
+
+
+class FastListMixin:
+    """
+    ViewSet mixin serving JSON list requests through serialize_rows.
+    Falls back to the regular serializer for other renderers or serializers
+    the fast path can't reproduce.
+    """
+
+    _row_plans = {}
+
+    def get_row_plan(self):
+        serializer_class = self.get_serializer_class()
+        if serializer_class not in self._row_plans:
+            self._row_plans[serializer_class] = build_row_plan(serializer_class)
+        return self._row_plans[serializer_class]
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_row_plan()
+        if plan is None or getattr(request.accepted_renderer, 'format', None) != 'json':
+            return super().list(request, *args, **kwargs)
+
+        values = values_queryset(plan, self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(serialize_rows(plan, page))
+        return Response(serialize_rows(plan, values))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes FastRows with orjson when it is installed and
+    the output would be byte-identical (compact, non-ASCII-escaped, no exotic floats)
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or not isinstance(data, FastRows)
+            or not data.orjson_safe
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data)
+        except (orjson.JSONEncodeError, TypeError) as e:
+            logger.debug(f"orjson fallback: {e}")
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict-javascript escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,377 @@
+"""
+Streaming Technical Indicators
+O(1) per-bar updates with vectorized NumPy initialization from history
+"""
+from collections import deque
+import numpy as np
+
+# Block length for the vectorized EMA recurrence; keeps (1 - alpha) ** -k within float range
+_EMA_BLOCK = 256
+
+
+def ema_series(values, alpha, seed=None):
+    """
+    Vectorized exponential moving average of a 1-D array.
+    Solves ema[t] = alpha * x[t] + (1 - alpha) * ema[t - 1] in closed form, block by block.
+    seed is the EMA value before the first element (default: the first element itself).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(values)
+    if values.size == 0:
+        return out
+
+    if alpha >= 1.0:
+        return values.copy()  # No smoothing; the closed form below would divide by 0 ** k
+
+    decay = 1.0 - alpha
+    previous = values[0] if seed is None else seed
+    for start in range(0, values.size, _EMA_BLOCK):
+        block = values[start:start + _EMA_BLOCK]
+        powers = decay ** np.arange(1, block.size + 1)
+        out[start:start + block.size] = powers * (previous + np.cumsum(alpha * block / powers))
+        previous = out[start + block.size - 1]
+    return out
+
+
+def _period(value, name='period'):
+    """Validate a window length; a period below 2 has nothing to average"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 2:
+        raise ValueError(f"{name} must be an integer of at least 2, got {value!r}")
+    return value
+
+
+class Indicator:
+    """Base class: update() consumes one bar in O(1); initialize() consumes history vectorized"""
+
+    name = ''
+
+    def __init__(self):
+        self.value = None
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, close, high=None, low=None, volume=None):
+        raise NotImplementedError
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        raise NotImplementedError
+
+
+class SMA(Indicator):
+    name = 'sma'
+
+    def __init__(self, period=20):
+        super().__init__()
+        self.period = _period(period)
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+
+    def update(self, close, high=None, low=None, volume=None):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(close)
+        self.total += close
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        tail = closes[-self.period:]
+        self.window = deque(tail.tolist(), maxlen=self.period)
+        self.total = float(tail.sum())
+        self.value = self.total / self.period if tail.size == self.period else None
+        return self.value
+
+
+class EMA(Indicator):
+    name = 'ema'
+
+    def __init__(self, period=20):
+        super().__init__()
+        self.period = _period(period)
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self.seed_total = 0.0
+
+    def update(self, close, high=None, low=None, volume=None):
+        self.count += 1
+        if self.count < self.period:
+            self.seed_total += close
+        elif self.count == self.period:
+            self.value = (self.seed_total + close) / self.period
+        else:
+            self.value += self.alpha * (close - self.value)
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        self.count = int(closes.size)
+        if closes.size < self.period:
+            self.seed_total = float(closes.sum())
+            self.value = None
+            return None
+        seed = float(closes[:self.period].mean())
+        rest = closes[self.period:]
+        self.value = float(ema_series(rest, self.alpha, seed)[-1]) if rest.size else seed
+        return self.value
+
+
+class RSI(Indicator):
+    """Wilder's relative strength index"""
+
+    name = 'rsi'
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = _period(period)
+        self.previous_close = None
+        self.avg_gain = self.avg_loss = None
+        self.count = 0
+        self.gain_total = self.loss_total = 0.0
+
+    def _compute(self):
+        if self.avg_loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+    def update(self, close, high=None, low=None, volume=None):
+        if self.previous_close is None:
+            self.previous_close = close
+            return None
+        change = close - self.previous_close
+        self.previous_close = close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+
+        self.count += 1
+        if self.avg_gain is None:
+            self.gain_total += gain
+            self.loss_total += loss
+            if self.count == self.period:
+                self.avg_gain = self.gain_total / self.period
+                self.avg_loss = self.loss_total / self.period
+                self._compute()
+        else:
+            self.avg_gain += (gain - self.avg_gain) / self.period
+            self.avg_loss += (loss - self.avg_loss) / self.period
+            self._compute()
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        if closes.size == 0:
+            return None
+        self.previous_close = float(closes[-1])
+        changes = np.diff(closes)
+        self.count = int(changes.size)
+        gains, losses = np.clip(changes, 0, None), np.clip(-changes, 0, None)
+        if changes.size < self.period:
+            self.gain_total, self.loss_total = float(gains.sum()), float(losses.sum())
+            self.avg_gain = self.avg_loss = self.value = None
+            return None
+
+        alpha = 1.0 / self.period
+        seed_gain, seed_loss = gains[:self.period].mean(), losses[:self.period].mean()
+        rest = slice(self.period, None)
+        self.avg_gain = float(ema_series(gains[rest], alpha, seed_gain)[-1]) if changes.size > self.period else float(seed_gain)
+        self.avg_loss = float(ema_series(losses[rest], alpha, seed_loss)[-1]) if changes.size > self.period else float(seed_loss)
+        self._compute()
+        return self.value
+
+
+class MACD(Indicator):
+    """MACD line, signal line and histogram"""
+
+    name = 'macd'
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        super().__init__()
+        if _period(fast, 'fast') >= _period(slow, 'slow'):
+            raise ValueError('fast period must be shorter than slow period')
+        self.fast, self.slow = EMA(fast), EMA(slow)
+        self.signal = EMA(signal)
+        self.macd = self.signal_value = self.histogram = None
+
+    def _set(self):
+        self.signal_value = self.signal.value
+        if self.signal_value is not None:
+            self.histogram = self.macd - self.signal_value
+            self.value = self.macd
+
+    def update(self, close, high=None, low=None, volume=None):
+        fast, slow = self.fast.update(close), self.slow.update(close)
+        if fast is not None and slow is not None:
+            self.macd = fast - slow
+            self.signal.update(self.macd)
+            self._set()
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        self.fast.initialize(closes)
+        self.slow.initialize(closes)
+        if closes.size < self.slow.period:
+            return None
+
+        # MACD series over the span where both EMAs exist, then its signal EMA
+        start = self.slow.period - 1
+        fast_seed = closes[:self.fast.period].mean()
+        fast_series = ema_series(closes[self.fast.period:], self.fast.alpha, fast_seed)
+        fast_series = np.concatenate(([fast_seed], fast_series))[start - self.fast.period + 1:]
+        slow_seed = closes[:self.slow.period].mean()
+        slow_series = np.concatenate(([slow_seed], ema_series(closes[self.slow.period:], self.slow.alpha, slow_seed)))
+        macd_series = fast_series - slow_series
+
+        self.macd = float(macd_series[-1])
+        self.signal.initialize(macd_series)
+        self._set()
+        return self.value
+
+
+class BollingerBands(Indicator):
+    """Middle/upper/lower bands from a rolling mean and population standard deviation"""
+
+    name = 'bollinger'
+
+    def __init__(self, period=20, width=2.0):
+        super().__init__()
+        self.period = _period(period)
+        if isinstance(width, bool) or not isinstance(width, (int, float)) or width <= 0:
+            raise ValueError(f"width must be a positive number, got {width!r}")
+        self.width = width
+        self.window = deque(maxlen=period)
+        self.total = self.total_sq = 0.0
+        self.upper = self.lower = None
+
+    def _compute(self):
+        mean = self.total / self.period
+        variance = max(self.total_sq / self.period - mean * mean, 0.0)
+        deviation = variance ** 0.5
+        self.value = mean
+        self.upper = mean + self.width * deviation
+        self.lower = mean - self.width * deviation
+
+    def update(self, close, high=None, low=None, volume=None):
+        if len(self.window) == self.period:
+            old = self.window[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.window.append(close)
+        self.total += close
+        self.total_sq += close * close
+        if len(self.window) == self.period:
+            self._compute()
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        tail = np.asarray(closes, dtype=np.float64)[-self.period:]
+        self.window = deque(tail.tolist(), maxlen=self.period)
+        self.total = float(tail.sum())
+        self.total_sq = float((tail * tail).sum())
+        if tail.size == self.period:
+            self._compute()
+        return self.value
+
+
+class ATR(Indicator):
+    """Wilder's average true range"""
+
+    name = 'atr'
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = _period(period)
+        self.previous_close = None
+        self.count = 0
+        self.tr_total = 0.0
+
+    def update(self, close, high=None, low=None, volume=None):
+        high = close if high is None else high
+        low = close if low is None else low
+        if self.previous_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.previous_close), abs(low - self.previous_close))
+        self.previous_close = close
+
+        self.count += 1
+        if self.value is None:
+            self.tr_total += true_range
+            if self.count == self.period:
+                self.value = self.tr_total / self.period
+        else:
+            self.value += (true_range - self.value) / self.period
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        highs = closes if highs is None else np.asarray(highs, dtype=np.float64)
+        lows = closes if lows is None else np.asarray(lows, dtype=np.float64)
+        if closes.size == 0:
+            return None
+
+        previous = np.concatenate(([np.nan], closes[:-1]))
+        true_range = np.nanmax(np.vstack((highs - lows, np.abs(highs - previous), np.abs(lows - previous))), axis=0)
+        self.previous_close = float(closes[-1])
+        self.count = int(closes.size)
+        if closes.size < self.period:
+            self.tr_total = float(true_range.sum())
+            self.value = None
+            return None
+
+        seed = float(true_range[:self.period].mean())
+        rest = true_range[self.period:]
+        self.value = float(ema_series(rest, 1.0 / self.period, seed)[-1]) if rest.size else seed
+        return self.value
+
+
+class VWAP(Indicator):
+    """Volume-weighted average price over the bars seen since the last reset"""
+
+    name = 'vwap'
+
+    def __init__(self):
+        super().__init__()
+        self.pv_total = self.volume_total = 0.0
+
+    def update(self, close, high=None, low=None, volume=None):
+        high = close if high is None else high
+        low = close if low is None else low
+        volume = volume or 0.0
+        self.pv_total += (high + low + close) / 3.0 * volume
+        self.volume_total += volume
+        if self.volume_total > 0:
+            self.value = self.pv_total / self.volume_total
+        return self.value
+
+    def initialize(self, closes, highs=None, lows=None, volumes=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        highs = closes if highs is None else np.asarray(highs, dtype=np.float64)
+        lows = closes if lows is None else np.asarray(lows, dtype=np.float64)
+        volumes = np.zeros_like(closes) if volumes is None else np.asarray(volumes, dtype=np.float64)
+        self.pv_total = float(((highs + lows + closes) / 3.0 * volumes).sum())
+        self.volume_total = float(volumes.sum())
+        self.value = self.pv_total / self.volume_total if self.volume_total > 0 else None
+        return self.value
+
+    def reset(self):
+        self.pv_total = self.volume_total = 0.0
+        self.value = None
+
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, RSI, MACD, BollingerBands, ATR, VWAP)}
+
+
+def create_indicator(name, *params):
+    """Build an indicator from its registry name and constructor parameters"""
+    try:
+        indicator_class = INDICATORS[name]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown indicator: {name!r}")
+    try:
+        return indicator_class(*params)
+    except TypeError:
+        raise ValueError(f"Wrong number of parameters for {name}: {list(params)}")
@@ -0,0 +1,143 @@
+"""
+Tick-to-Trade Latency
+Captures when a strategy became due, when its price was observed, when its
+order was persisted and when the fill was acknowledged, and reports percentiles
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .models import OrderLatency
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reported stages: (name, start field, end field); None means due_at
+STAGES = (
+    ('schedule', None, 'tick_us'),
+    ('price', 'tick_us', 'price_us'),
+    ('persist', 'price_us', 'persisted_us'),
+    ('ack', 'persisted_us', 'acked_us'),
+    ('total', None, 'acked_us'),
+)
+PERCENTILES = (50, 95, 99)
+GROUPINGS = {
+    'both': ('strategy_type', 'symbol'),
+    'strategy_type': ('strategy_type',),
+    'symbol': ('symbol',),
+}
+
+_current_trace = ContextVar('latency_trace', default=None)
+
+
+class LatencyTrace:
+    """Timestamps (epoch seconds) for one strategy execution and the orders it placed"""
+
+    def __init__(self, strategy_type, symbol, due_at, tick_at=None, price_at=None):
+        self.strategy_type = strategy_type
+        self.symbol = symbol
+        self.due_at = due_at
+        self.tick_at = tick_at if tick_at is not None else time.time()
+        self.price_at = price_at
+        self.orders = {}  # order id -> [persisted_at, acked_at]
+
+    def _offset(self, at):
+        return None if at is None else round((at - self.due_at.timestamp()) * 1_000_000)
+
+    def save(self):
+        if not self.orders:
+            return
+        OrderLatency.objects.bulk_create([
+            OrderLatency(
+                order_id=order_id,
+                strategy_type=self.strategy_type,
+                symbol=self.symbol,
+                due_at=self.due_at,
+                tick_us=self._offset(self.tick_at),
+                price_us=self._offset(self.price_at),
+                persisted_us=self._offset(persisted_at),
+                acked_us=self._offset(acked_at),
+            )
+            for order_id, (persisted_at, acked_at) in self.orders.items()
+        ], ignore_conflicts=True)
+
+
+@contextmanager
+def trace_strategy(strategy, due_at=None, tick_at=None, price_at=None):
+    """
+    Record latency rows for orders placed by `strategy` inside the block.
+    due_at defaults to the strategy's next_execution_at (or now when unscheduled).
+    Nothing is written if the block raises, since its orders may be rolled back.
+    """
+    if not getattr(settings, 'LATENCY_TRACKING_ENABLED', True):
+        yield None
+        return
+
+    if due_at is None:
+        due_at = strategy.next_execution_at or timezone.now()
+    trace = LatencyTrace(strategy.strategy_type, strategy.trading_pair.symbol, due_at, tick_at, price_at)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+    try:
+        trace.save()
+    except Exception as e:
+        logger.error(f"Could not record latency for strategy {strategy.id}: {e}")
+
+
+def price_observed():
+    """Mark the price observation time on the active trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.price_at = time.time()
+
+
+def order_persisted(order):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.orders[order.id] = [time.time(), None]
+
+
+def order_acked(order):
+    trace = _current_trace.get()
+    if trace is not None and order.id in trace.orders:
+        trace.orders[order.id][1] = time.time()
+
+
+def latency_report(queryset=None, group_by=('strategy_type', 'symbol'), percentiles=PERCENTILES):
+    """
+    Percentiles of every stage, in milliseconds, per group.
+    Returns a list of {'group': {...}, 'count': n, 'stages': {stage: {'p50': ms, ...}}}.
+    """
+    queryset = OrderLatency.objects.all() if queryset is None else queryset
+    fields = ['tick_us', 'price_us', 'persisted_us', 'acked_us']
+    rows = list(queryset.order_by(*group_by).values_list(*group_by, *fields))
+    if not rows:
+        return []
+
+    keys = [row[:len(group_by)] for row in rows]
+    # NaN marks stages that were not captured (e.g. orders that never got an ack)
+    values = np.array([row[len(group_by):] for row in rows], dtype=float)
+    columns = {'due': np.zeros(len(rows)), **{field: values[:, i] for i, field in enumerate(fields)}}
+
+    boundaries = [0] + [i for i in range(1, len(keys)) if keys[i] != keys[i - 1]] + [len(keys)]
+    report = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        stages = {}
+        for name, begin, finish in STAGES:
+            durations = (columns[finish][start:end] - columns[begin or 'due'][start:end]) / 1000
+            durations = durations[~np.isnan(durations)]
+            stages[name] = {
+                f"p{p}": round(float(np.percentile(durations, p)), 3) if len(durations) else None
+                for p in percentiles
+            }
+        report.append({
+            'group': dict(zip(group_by, keys[start])),
+            'count': end - start,
+            'stages': stages,
+        })
+    return report
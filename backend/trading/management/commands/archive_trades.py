@@ -0,0 +1,59 @@
+"""
+Management command to archive old orders and trade history
+Moves closed months older than the retention window into compressed files
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from trading.archive_service import TradeArchiver
+
+
+class Command(BaseCommand):
+    help = 'Archive closed months of orders and trade history to compressed files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=getattr(settings, 'TRADE_ARCHIVE_RETENTION_DAYS', 365),
+            help='Keep this many days of history in the hot tables (default: TRADE_ARCHIVE_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help='Directory for archive files (default: TRADE_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be archived',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Reclaim space after archiving (VACUUM)',
+        )
+
+    def handle(self, *args, **options):
+        archiver = TradeArchiver(options['archive_dir'])
+        dry_run = options['dry_run']
+
+        months = archiver.archivable_months(options['retention_days'])
+        if not months:
+            self.stdout.write(self.style.SUCCESS('Nothing to archive'))
+            return
+
+        total_orders = total_trades = 0
+        for year, month in months:
+            orders, trades = archiver.archive_month(year, month, dry_run=dry_run)
+            total_orders += orders
+            total_trades += trades
+            if orders:
+                verb = 'Would archive' if dry_run else 'Archived'
+                self.stdout.write(f'{verb} {year:04d}-{month:02d}: {orders} orders, {trades} trades')
+
+        if options['vacuum'] and not dry_run and total_orders:
+            archiver.vacuum()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Done: {total_orders} orders, {total_trades} trades from {len(months)} months')
+        )
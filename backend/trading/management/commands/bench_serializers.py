@@ -0,0 +1,121 @@
+"""
+Management command to benchmark list serialization
+Compares DRF's ModelSerializer + JSONRenderer with the fast values() path
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from trading.fast_serializers import FastJSONRenderer, build_row_plan, serialize_rows, values_queryset, orjson
+from trading.models import TradingPair, TradingStrategy, Order, TradeHistory
+from trading.serializers import OrderSerializer, TradeHistorySerializer, TradingStrategySerializer
+
+TARGETS = (
+    ('orders', Order, OrderSerializer),
+    ('trades', TradeHistory, TradeHistorySerializer),
+    ('strategies', TradingStrategy, TradingStrategySerializer),
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rows/second of the fast list serialization path against DRF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per model (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs (default: 3)')
+
+    def handle(self, *args, **options):
+        # Seed inside a transaction that is always rolled back
+        with transaction.atomic():
+            self.seed(options['rows'])
+            for name, model, serializer_class in TARGETS:
+                self.bench(name, model, serializer_class, options['repeat'])
+            transaction.set_rollback(True)
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson not installed; fast path rendered with the stdlib encoder'))
+
+    def seed(self, rows):
+        User = get_user_model()
+        user = User.objects.create_user('bench-serializers', 'bench@test.com', 'bench')
+        pairs = TradingPair.objects.bulk_create([
+            TradingPair(symbol=f"BENCH{index}USDT", base_asset=f"BENCH{index}", quote_asset='USDT')
+            for index in range(20)
+        ])
+        now = timezone.now()
+        strategies = TradingStrategy.objects.bulk_create([
+            TradingStrategy(
+                user=user,
+                name=f"Bench {index}",
+                strategy_type='custom' if index % 2 else 'dca',
+                trading_pair=pairs[index % len(pairs)],
+                amount=Decimal('0.015'),
+                custom_config={'buy_when': [{'indicator': 'rsi', 'period': 14, 'op': '<', 'value': 30.5}]},
+                next_execution_at=now,
+            )
+            for index in range(rows)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(
+                user=user,
+                strategy=strategies[index],
+                trading_pair=pairs[index % len(pairs)],
+                order_type='market',
+                order_side='buy' if index % 2 else 'sell',
+                status='filled',
+                amount=Decimal('0.015'),
+                filled_amount=Decimal('0.015'),
+                filled_price=Decimal('43123.45') + index,
+                created_at=now - timedelta(seconds=index),
+                filled_at=now,
+            )
+            for index in range(rows)
+        ])
+        TradeHistory.objects.bulk_create([
+            TradeHistory(
+                user=user,
+                order=order,
+                trading_pair=order.trading_pair,
+                side=order.order_side,
+                price=order.filled_price,
+                amount=order.amount,
+                total=order.amount * order.filled_price,
+                executed_at=order.created_at,
+            )
+            for order in orders
+        ])
+
+    def bench(self, name, model, serializer_class, repeat):
+        queryset = model.objects.select_related('trading_pair').order_by('pk')
+        plan = build_row_plan(serializer_class)
+        if plan is None:
+            raise CommandError(f"{serializer_class.__name__} is not supported by the fast path")
+
+        def drf():
+            return JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+
+        def fast():
+            return FastJSONRenderer().render(serialize_rows(plan, values_queryset(plan, queryset.all())))
+
+        timings = {}
+        outputs = {}
+        for label, func in (('drf', drf), ('fast', fast)):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                outputs[label] = func()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+
+        rows = queryset.count()
+        identical = outputs['drf'] == outputs['fast']
+        style = self.style.SUCCESS if identical else self.style.ERROR
+        self.stdout.write(style(
+            f"{name}: {rows} rows, DRF {rows / timings['drf']:,.0f} rows/s, "
+            f"fast {rows / timings['fast']:,.0f} rows/s ({timings['drf'] / timings['fast']:.1f}x), "
+            f"byte-identical={identical}"
+        ))
@@ -0,0 +1,55 @@
+"""
+Management command to export orders or trade history offline
+Uses the same streaming writers as the /orders/export/ and /history/export/ endpoints
+"""
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from trading.export_service import EXPORT_FORMATS, DEFAULT_CHUNK_SIZE, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream orders or trade history to CSV, Parquet or Arrow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['orders', 'trades'], help='What to export')
+        parser.add_argument('--format', dest='export_format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help='Output file (default: stdout)')
+        parser.add_argument('--from-date', help='Start date (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--to-date', help='End date (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--symbol', help='Trading pair symbol, e.g. BTCUSDT')
+        parser.add_argument('--side', choices=['buy', 'sell'])
+        parser.add_argument('--status', help='Order status (orders only)')
+        parser.add_argument('--user-id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        filters = {
+            'from_date': options['from_date'],
+            'to_date': options['to_date'],
+            'symbol': options['symbol'],
+            'side': options['side'],
+            'status': options['status'],
+            'user_id': options['user_id'],
+        }
+
+        try:
+            chunks = iter_export(options['kind'], filters, options['export_format'], options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        written = 0
+        out = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written} bytes to {options['output']} in {time.monotonic() - started:.2f}s"
+            ))
@@ -0,0 +1,49 @@
+"""
+Management command to bulk import historical Binance trades
+Accepts spot trade-history CSV exports and /v3/myTrades JSON
+"""
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from trading.trade_import import TradeImporter, iter_trades, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Bulk import historical fills from Binance exports and rebuild positions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV export, JSON lines or JSON array file')
+        parser.add_argument('--user', required=True, help='Username to import trades for')
+        parser.add_argument('--format', dest='file_format', choices=['auto', 'csv', 'json'], default='auto')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Skip recomputing paper positions after the import',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        started = time.monotonic()
+        importer = TradeImporter(user, batch_size=options['batch_size'])
+        try:
+            stats = importer.run(
+                iter_trades(options['path'], options['file_format']),
+                rebuild_positions=not options['no_rebuild'],
+            )
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Import failed: {e}")
+
+        if importer.unknown_symbols:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped unknown symbols: {', '.join(sorted(importer.unknown_symbols))}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} trades ({stats['duplicates']} duplicates, "
+            f"{stats['unknown_symbol']} unknown symbol) in {time.monotonic() - started:.1f}s"
+        ))
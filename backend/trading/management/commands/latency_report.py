@@ -0,0 +1,47 @@
+"""
+Management command to report tick-to-trade latency percentiles
+Groups recorded OrderLatency rows by strategy type and/or symbol
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from trading.latency import GROUPINGS, STAGES, PERCENTILES, latency_report
+from trading.models import OrderLatency
+
+
+class Command(BaseCommand):
+    help = 'Report per-stage tick-to-trade latency percentiles for automated orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Only include orders that became due in the last N hours (default: 24)',
+        )
+        parser.add_argument('--by', choices=sorted(GROUPINGS), default='both', help='Grouping (default: both)')
+        parser.add_argument('--strategy-type', help='Only this strategy type')
+        parser.add_argument('--symbol', help='Only this symbol')
+
+    def handle(self, *args, **options):
+        queryset = OrderLatency.objects.filter(due_at__gte=timezone.now() - timedelta(hours=options['hours']))
+        if options['strategy_type']:
+            queryset = queryset.filter(strategy_type=options['strategy_type'])
+        if options['symbol']:
+            queryset = queryset.filter(symbol=options['symbol'])
+
+        report = latency_report(queryset, group_by=GROUPINGS[options['by']])
+        if not report:
+            self.stdout.write(self.style.WARNING('No latency records in range'))
+            return
+
+        header = ['group', 'orders'] + [f"{stage} p{p}" for stage, _, _ in STAGES for p in PERCENTILES]
+        self.stdout.write('\t'.join(header))
+        for row in report:
+            cells = ['/'.join(row['group'].values()), str(row['count'])]
+            for stage, _, _ in STAGES:
+                for p in PERCENTILES:
+                    value = row['stages'][stage][f"p{p}"]
+                    cells.append('-' if value is None else f"{value:.1f}")
+            self.stdout.write('\t'.join(cells))
+        self.stdout.write(self.style.SUCCESS(f"{len(report)} groups (milliseconds)"))
@@ -0,0 +1,82 @@
+"""
+Management command to optimize a DCA strategy's parameters
+Walk-forward grid or random search over historical klines on a process pool
+"""
+from django.core.management.base import BaseCommand, CommandError
+from trading.models import TradingStrategy
+from trading.optimizer import SEARCH_METHODS, strategy_optimizer
+
+
+def _values(text, cast=float):
+    return [cast(value) for value in text.split(',') if value.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Walk-forward parameter search for a DCA strategy (memoized, multi-process)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('strategy_id', type=int, help='TradingStrategy id')
+        parser.add_argument('--method', choices=SEARCH_METHODS, default='grid', help='Search method (default: grid)')
+        parser.add_argument('--samples', type=int, default=50, help='Random search points (default: 50)')
+        parser.add_argument('--days', type=int, default=180, help='Days of history (default: 180)')
+        parser.add_argument('--folds', type=int, default=4, help='Walk-forward folds (default: 4)')
+        parser.add_argument('--train-blocks', type=int, default=3, help='Training window in test-window lengths (default: 3)')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: OPTIMIZER_WORKERS or CPU count)')
+        parser.add_argument('--seed', type=int, help='Random search seed')
+        parser.add_argument('--stop-loss', help='Comma-separated stop loss percentages')
+        parser.add_argument('--take-profit', help='Comma-separated take profit percentages')
+        parser.add_argument('--amount', help='Comma-separated order amounts')
+        parser.add_argument('--intervals', help='Comma-separated execution intervals (e.g. 1h,4h)')
+        parser.add_argument('--apply', action='store_true', help='Save the recommended parameters on the strategy')
+
+    def handle(self, *args, **options):
+        try:
+            strategy = TradingStrategy.objects.select_related('trading_pair').get(pk=options['strategy_id'])
+        except TradingStrategy.DoesNotExist:
+            raise CommandError(f"Strategy {options['strategy_id']} does not exist")
+
+        space = {}
+        try:
+            for option, name, cast in (
+                ('stop_loss', 'stop_loss_percentage', float),
+                ('take_profit', 'take_profit_percentage', float),
+                ('amount', 'amount', float),
+                ('intervals', 'execution_interval', str.strip),
+            ):
+                if options[option]:
+                    space[name] = _values(options[option], cast)
+
+            result = strategy_optimizer.optimize(
+                strategy,
+                method=options['method'],
+                space=space,
+                samples=options['samples'],
+                days=options['days'],
+                folds=options['folds'],
+                train_blocks=options['train_blocks'],
+                workers=options['workers'],
+                seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{result['symbol']} {result['base_interval']}: {result['bars']} bars, {result['points']} points, "
+            f"{result['simulated']} simulated, {result['memoized']} memoized, "
+            f"{result['workers']} workers, {result['seconds']:.2f}s"
+        )
+        for i, fold in enumerate(result['folds'], 1):
+            params = fold['params']
+            self.stdout.write(
+                f"Fold {i} test {fold['test']['start'][:10]}..{fold['test']['end'][:10]}: "
+                f"SL {params['stop_loss_percentage']}% TP {params['take_profit_percentage']}% "
+                f"amount {params['amount']} every {params['execution_interval']} -> "
+                f"train {fold['train_metrics']['return_pct']:.2f}% / test {fold['test_metrics']['return_pct']:.2f}%"
+            )
+        self.stdout.write(f"Walk-forward return: {result['walk_forward_return_pct']:.2f}%")
+
+        if options['apply']:
+            strategy_optimizer.apply(strategy, result['recommended'])
+            self.stdout.write(self.style.SUCCESS(f"Applied {result['recommended']} to strategy {strategy.id}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Recommended: {result['recommended']}"))
@@ -0,0 +1,67 @@
+"""
+Management command to run the shared-memory price board writer
+Run exactly one per host; web workers and run_strategies read from it
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from trading.models import TradingPair
+from trading.paper_trading_service import PaperTradingService
+from trading.price_board import PriceBoard
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Publish live prices for all active pairs into shared memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Refresh interval in seconds (default: 1)',
+        )
+        parser.add_argument(
+            '--pairs-refresh',
+            type=float,
+            default=60.0,
+            help='How often the active pair list is reloaded in seconds (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        name = getattr(settings, 'PRICE_BOARD_NAME', 'tradepro_price_board')
+        capacity = getattr(settings, 'PRICE_BOARD_CAPACITY', 4096)
+
+        board = PriceBoard.create(name, capacity)
+        paper_trading = PaperTradingService()
+        self.stdout.write(self.style.SUCCESS(
+            f'Price board {name} created ({capacity} slots, interval={interval}s)'
+        ))
+
+        pairs = {}
+        pairs_loaded_at = None
+        try:
+            while True:
+                started = time.monotonic()
+                if pairs_loaded_at is None or started - pairs_loaded_at > options['pairs_refresh']:
+                    pairs = dict(TradingPair.objects.filter(is_active=True).values_list('symbol', 'id'))
+                    too_high = [symbol for symbol, pair_id in pairs.items() if pair_id >= capacity]
+                    if too_high:
+                        logger.warning(f"Pair ids exceed PRICE_BOARD_CAPACITY, not published: {too_high}")
+                    pairs_loaded_at = started
+
+                try:
+                    prices = paper_trading.get_all_prices(pairs.keys())
+                    board.write_many({pairs[symbol]: price for symbol, price in prices.items()})
+                except Exception as e:
+                    logger.error(f"Price board refresh failed: {e}")
+                    board.heartbeat()  # Still alive; readers keep this segment
+
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nStopping price board...'))
+        finally:
+            board.close()
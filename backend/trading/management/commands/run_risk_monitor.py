@@ -0,0 +1,65 @@
+"""
+Management command to run the stop loss / take profit risk monitor
+Runs independently of strategy execution intervals
+"""
+from django.core.management.base import BaseCommand
+from trading.risk_monitor import risk_monitor
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Continuously enforce stop loss and take profit on open strategy positions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single check and exit',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Check interval in seconds (default: 1)',
+        )
+        parser.add_argument(
+            '--reload-interval',
+            type=float,
+            default=10.0,
+            help='How often thresholds are rebuilt from the database in seconds (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        run_once = options['once']
+        interval = options['interval']
+        risk_monitor.reload_interval = options['reload_interval']
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting risk monitor (run_once={run_once}, interval={interval}s)')
+        )
+
+        if run_once:
+            count = risk_monitor.run_once()
+            self.stdout.write(self.style.SUCCESS(f'Exited {count} positions'))
+            return
+
+        self.stdout.write(
+            self.style.WARNING('Running in continuous mode. Press Ctrl+C to stop.')
+        )
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    count = risk_monitor.run_once()
+                    if count > 0:
+                        self.stdout.write(self.style.SUCCESS(f'Exited {count} positions'))
+                except Exception as e:
+                    logger.error(f"Risk monitor tick failed: {e}")
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write(
+                self.style.WARNING('\nStopping risk monitor...')
+            )
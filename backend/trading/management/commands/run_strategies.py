@@ -1,9 +1,13 @@
 """
 Management command to run trading strategies
-Can be run as a background process or cron job
+Can be run as a background process or cron job, record its decisions to a
+tape, or replay a tape on a virtual clock
 """
-from django.core.management.base import BaseCommand
-from trading.strategy_executor import strategy_executor
+import json
+from django.core.management.base import BaseCommand, CommandError
+from trading.replay import TapePlayer, TapeRecorder, scratch_database
+from trading.strategy_executor import StrategyExecutor, strategy_executor
+from trading_backend.profiling import PROFILE_MODES, new_profiler
 import time
 import logging
 
@@ -25,18 +29,118 @@ class Command(BaseCommand):
             default=60,
             help='Check interval in seconds (default: 60)',
         )
+        parser.add_argument(
+            '--profile',
+            nargs='?',
+            const='default',
+            choices=('default',) + PROFILE_MODES,
+            help='Profile every tick and dump it to PROFILING_DIR (mode defaults to PROFILING_MODE)',
+        )
+        parser.add_argument(
+            '--record',
+            metavar='TAPE',
+            help='Record every price observation and scheduling decision to a gzip tape file',
+        )
+        parser.add_argument(
+            '--replay',
+            metavar='TAPE',
+            help='Replay a recorded tape on a virtual clock as fast as possible, then exit',
+        )
+        parser.add_argument(
+            '--orders-out',
+            metavar='FILE',
+            help='With --replay: write the replayed orders as JSON lines for diffing',
+        )
+        parser.add_argument(
+            '--scratch-db',
+            metavar='URL_OR_PATH',
+            help='With --replay (required): database URL or SQLite file to replay into; never the live database',
+        )
+        parser.add_argument(
+            '--commit',
+            action='store_true',
+            help='With --replay: keep the replayed orders in the scratch database instead of rolling them back',
+        )
+
+    def run_tick(self, tick):
+        """Execute due strategies once, profiled when --profile is set"""
+        if not self.profile:
+            return self.executor.execute_pending_strategies()
+
+        profiler = new_profiler(None if self.profile == 'default' else self.profile)
+        with profiler:
+            count = self.executor.execute_pending_strategies()
+        path = profiler.dump('run_strategies', {'command': 'run_strategies', 'tick': tick, 'executed': count})
+        self.stdout.write(f'Tick {tick} took {profiler.duration * 1000:.0f}ms, profile: {path}')
+        return count
+
+    def replay(self, path, scratch_db, orders_out=None, commit=False):
+        try:
+            with scratch_database(scratch_db):
+                result = TapePlayer(path).play(commit=commit)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not replay {path}: {e}')
+
+        if orders_out:
+            with open(orders_out, 'w') as f:
+                for order in result['orders']:
+                    f.write(json.dumps(order, sort_keys=True) + '\n')
+
+        self.stdout.write(
+            f"Replayed {result['ticks']} ticks in {result['seconds']:.2f}s: "
+            f"{result['executions']} executions, {len(result['orders'])} orders"
+            f"{' (committed)' if commit else ''}"
+        )
+        if result['mismatches'] or result['misses']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(result['mismatches'])} scheduling mismatches, {result['misses']} observations not on the tape"
+            ))
+        if result['divergences']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(result['divergences'])} balances or positions changed outside the executor "
+                f"(risk monitor exits, live or manual orders); replayed from the recorded values"
+            ))
+        if result['live_skipped']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['live_skipped']} live executions skipped; exchange fills are not on the tape"
+            ))
+        if not (result['mismatches'] or result['misses'] or result['divergences']):
+            self.stdout.write(self.style.SUCCESS('Replay matched the recorded schedule'))
 
     def handle(self, *args, **options):
         run_once = options['once']
         interval = options['interval']
+        self.profile = options['profile']
+
+        if options['replay']:
+            if options['record']:
+                raise CommandError('--record and --replay cannot be combined')
+            if not options['scratch_db']:
+                raise CommandError('--replay rewrites strategies, balances and positions; pass --scratch-db')
+            return self.replay(options['replay'], options['scratch_db'], options['orders_out'], options['commit'])
+
+        recorder = None
+        self.executor = strategy_executor
+        if options['record']:
+            recorder = TapeRecorder(options['record'])
+            self.executor = StrategyExecutor(tape=recorder)
+            self.stdout.write(f"Recording to {options['record']}")
+
+        try:
+            self.run(run_once, interval)
+        finally:
+            if recorder is not None:
+                recorder.close()
+                self.stdout.write(f'Recorded {recorder.ticks} ticks to {recorder.path}')
 
+    def run(self, run_once, interval):
         self.stdout.write(
             self.style.SUCCESS(f'Starting strategy executor (run_once={run_once}, interval={interval}s)')
         )
 
         if run_once:
             # Run once and exit
-            count = strategy_executor.execute_pending_strategies()
+            count = self.run_tick(1)
             self.stdout.write(
                 self.style.SUCCESS(f'Executed {count} strategies')
             )
@@ -45,9 +149,11 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.WARNING('Running in continuous mode. Press Ctrl+C to stop.')
             )
+            tick = 0
             try:
                 while True:
-                    count = strategy_executor.execute_pending_strategies()
+                    tick += 1
+                    count = self.run_tick(tick)
                     if count > 0:
                         self.stdout.write(
                             self.style.SUCCESS(f'Executed {count} strategies')
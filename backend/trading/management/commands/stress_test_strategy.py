@@ -0,0 +1,73 @@
+"""
+Management command to Monte Carlo stress test a DCA strategy
+Reports drawdown, P&L and stop-out distributions over synthetic price paths
+"""
+from django.core.management.base import BaseCommand, CommandError
+from trading.models import TradingStrategy
+from trading.stress_test import PATH_METHODS, stress_tester
+
+
+class Command(BaseCommand):
+    help = 'Monte Carlo drawdown / P&L / stop-out distribution for a DCA strategy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('strategy_id', type=int, help='TradingStrategy id')
+        parser.add_argument('--method', choices=PATH_METHODS, default='gbm', help='Path generator (default: gbm)')
+        parser.add_argument('--paths', type=int, default=10000, help='Number of paths (default: 10000)')
+        parser.add_argument('--days', type=int, default=365, help='Simulated horizon in days (default: 365)')
+        parser.add_argument('--step', default='1h', help='Simulation step interval (default: 1h)')
+        parser.add_argument('--history-days', type=int, default=365, help='History used for estimates / bootstrap (default: 365)')
+        parser.add_argument('--drift', type=float, help='Annualized GBM drift (default: estimated)')
+        parser.add_argument('--volatility', type=float, help='Annualized GBM volatility (default: estimated)')
+        parser.add_argument('--block-length', type=int, default=24, help='Bootstrap block length in steps (default: 24)')
+        parser.add_argument('--stop-loss', type=float, help='Override stop_loss_percentage')
+        parser.add_argument('--take-profit', type=float, help='Override take_profit_percentage')
+        parser.add_argument('--amount', type=float, help='Override amount')
+        parser.add_argument('--interval', help='Override execution_interval')
+        parser.add_argument('--seed', type=int, help='Random seed')
+
+    def handle(self, *args, **options):
+        try:
+            strategy = TradingStrategy.objects.select_related('trading_pair').get(pk=options['strategy_id'])
+        except TradingStrategy.DoesNotExist:
+            raise CommandError(f"Strategy {options['strategy_id']} does not exist")
+
+        params = {
+            name: options[option]
+            for option, name in (
+                ('stop_loss', 'stop_loss_percentage'),
+                ('take_profit', 'take_profit_percentage'),
+                ('amount', 'amount'),
+                ('interval', 'execution_interval'),
+            )
+            if options[option] is not None
+        }
+        try:
+            result = stress_tester.run(
+                strategy,
+                method=options['method'],
+                paths=options['paths'],
+                days=options['days'],
+                step_interval=options['step'],
+                history_days=options['history_days'],
+                drift=options['drift'],
+                volatility=options['volatility'],
+                block_length=options['block_length'],
+                params=params,
+                seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{result['symbol']} {result['method']}: {result['paths']} paths x {result['steps']} "
+            f"{result['step_interval']} steps from {result['start_price']} in {result['seconds']:.2f}s"
+        )
+        self.stdout.write(f"Params: {result['params']}")
+        for label, key in (('Max drawdown %', 'max_drawdown_pct'), ('Return %', 'return_pct'),
+                           ('Stop-outs/path', 'stop_outs_per_path')):
+            self.stdout.write(f"{label:<16}" + '  '.join(f"{p}={v:g}" for p, v in result[key].items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stop-out rate {result['stop_out_rate']:.1%}, take-profit rate {result['take_profit_rate']:.1%}, "
+            f"loss probability {result['loss_probability']:.1%}"
+        ))
@@ -0,0 +1,128 @@
+"""
+Management command to sync the trading universe with Binance exchangeInfo
+Replaces the hardcoded add_cryptocurrencies.py / keep_3_coins.py scripts
+"""
+import json
+import time
+from decimal import Decimal
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from trading.models import TradingPair
+
+EXCHANGE_INFO_URL = 'https://api.binance.com/api/v3/exchangeInfo'
+TICKER_24H_URL = 'https://api.binance.com/api/v3/ticker/24hr'
+
+SYMBOL_MAX_LENGTH = TradingPair._meta.get_field('symbol').max_length
+ASSET_MAX_LENGTH = TradingPair._meta.get_field('base_asset').max_length
+
+
+def load_json(path, url):
+    """Read a local JSON file, or GET the url once"""
+    if path:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+class Command(BaseCommand):
+    help = 'Upsert TradingPair rows from exchangeInfo and deactivate delisted pairs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Read exchangeInfo from a local JSON file instead of the API')
+        parser.add_argument(
+            '--quote',
+            action='append',
+            dest='quotes',
+            help='Quote asset to include (repeatable, default: USDT)',
+        )
+        parser.add_argument(
+            '--status',
+            action='append',
+            dest='statuses',
+            help='Symbol status to include (repeatable, default: TRADING)',
+        )
+        parser.add_argument(
+            '--min-quote-volume',
+            type=Decimal,
+            default=None,
+            help='Only include symbols with at least this 24h quote volume',
+        )
+        parser.add_argument('--tickers-file', help='Read 24h tickers from a local JSON file instead of the API')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without writing')
+
+    def handle(self, *args, **options):
+        quotes = set(options['quotes'] or ['USDT'])
+        statuses = set(options['statuses'] or ['TRADING'])
+
+        try:
+            exchange_info = load_json(options['file'], EXCHANGE_INFO_URL)
+            volumes = None
+            if options['min_quote_volume'] is not None:
+                tickers = load_json(options['tickers_file'], TICKER_24H_URL)
+                volumes = {t['symbol']: Decimal(str(t['quoteVolume'])) for t in tickers}
+        except (OSError, ValueError, requests.RequestException) as e:
+            raise CommandError(f"Could not load exchange data: {e}")
+
+        now = timezone.now()
+        pairs = {}
+        for info in exchange_info.get('symbols', []):
+            symbol = info['symbol']
+            if info.get('quoteAsset') not in quotes or info.get('status') not in statuses:
+                continue
+            if volumes is not None and volumes.get(symbol, Decimal('0')) < options['min_quote_volume']:
+                continue
+            if len(symbol) > SYMBOL_MAX_LENGTH or len(info['baseAsset']) > ASSET_MAX_LENGTH:
+                self.stdout.write(self.style.WARNING(f"Skipping {symbol}: name too long for TradingPair"))
+                continue
+            pairs[symbol] = TradingPair(
+                symbol=symbol,
+                base_asset=info['baseAsset'],
+                quote_asset=info['quoteAsset'],
+                is_active=True,
+                updated_at=now,
+            )
+
+        # Only pairs quoted in the synced assets can be delisted, so commodities
+        # and other manually added pairs are left alone
+        stale = TradingPair.objects.filter(quote_asset__in=quotes, is_active=True).exclude(symbol__in=pairs)
+
+        # Unchanged rows are not rewritten: cached pair lists are versioned on updated_at
+        existing = {
+            symbol: (base_asset, quote_asset, is_active)
+            for symbol, base_asset, quote_asset, is_active in TradingPair.objects.filter(symbol__in=pairs).values_list(
+                'symbol', 'base_asset', 'quote_asset', 'is_active'
+            )
+        }
+        changed = [
+            pair for symbol, pair in pairs.items()
+            if existing.get(symbol) != (pair.base_asset, pair.quote_asset, pair.is_active)
+        ]
+        added = sum(1 for pair in changed if pair.symbol not in existing)
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"Would add {added}, update {len(changed) - added}, deactivate {stale.count()} pairs "
+                f"({len(pairs) - len(changed)} unchanged)"
+            )
+            return
+
+        started = time.monotonic()
+        with transaction.atomic():
+            TradingPair.objects.bulk_create(
+                changed,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['symbol'],
+                update_fields=['base_asset', 'quote_asset', 'is_active', 'updated_at'],
+            )
+            # Queryset updates skip auto_now; cached pair lists are versioned on updated_at
+            deactivated = stale.update(is_active=False, updated_at=now)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {len(pairs)} pairs: added {added}, updated {len(changed) - added}, deactivated {deactivated} "
+            f"in {(time.monotonic() - started) * 1000:.0f}ms"
+        ))
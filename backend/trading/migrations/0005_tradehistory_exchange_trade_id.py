@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:34
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0004_order_tradehistory_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradehistory',
+            name='exchange_trade_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='tradehistory',
+            name='executed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='tradehistory',
+            constraint=models.UniqueConstraint(fields=('user', 'exchange_trade_id'), name='unique_user_exchange_trade'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0005_tradehistory_exchange_trade_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradingstrategy',
+            name='custom_config',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0006_tradingstrategy_custom_config'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLatency',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latency', serialize=False, to='trading.order')),
+                ('strategy_type', models.CharField(max_length=20)),
+                ('symbol', models.CharField(max_length=20)),
+                ('due_at', models.DateTimeField()),
+                ('tick_us', models.BigIntegerField(null=True)),
+                ('price_us', models.BigIntegerField(null=True)),
+                ('persisted_us', models.BigIntegerField(null=True)),
+                ('acked_us', models.BigIntegerField(null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Order latencies',
+                'indexes': [models.Index(fields=['due_at'], name='trading_ord_due_at_3c6e1f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0008_simulationresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradingpair',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
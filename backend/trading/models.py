@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -9,6 +10,7 @@ class TradingPair(models.Model):
     quote_asset = models.CharField(max_length=10)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.symbol
@@ -49,6 +51,9 @@ class TradingStrategy(models.Model):
     stop_loss = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
     take_profit = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
 
+    # Indicator rules for 'custom' strategies (see trading.custom_strategy)
+    custom_config = models.JSONField(default=dict, blank=True)
+
     # Automated execution
     execution_interval = models.CharField(max_length=10, choices=INTERVAL_CHOICES, default='1h')
     last_executed_at = models.DateTimeField(null=True, blank=True)
@@ -103,10 +108,18 @@ class Order(models.Model):
     is_paper_trade = models.BooleanField(default=True)  # True for paper trading
     exchange_order_id = models.CharField(max_length=100, blank=True, null=True)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Defaulted rather than auto_now_add so historical imports can keep their real timestamps
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
     filled_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Hot-table range scans by month for archiving and P&L filters
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
     def __str__(self):
         return f"{'[PAPER] ' if self.is_paper_trade else ''}{self.order_side.upper()} {self.amount} {self.trading_pair.symbol} @ {self.price or 'MARKET'}"
 
@@ -125,15 +138,63 @@ class TradeHistory(models.Model):
 
     profit_loss = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
 
-    executed_at = models.DateTimeField(auto_now_add=True)
+    # Exchange trade ID for imported fills, used to deduplicate re-imports
+    exchange_trade_id = models.CharField(max_length=100, blank=True, null=True)
+
+    executed_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         verbose_name_plural = 'Trade histories'
+        indexes = [
+            models.Index(fields=['user', 'executed_at']),
+            models.Index(fields=['executed_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'exchange_trade_id'], name='unique_user_exchange_trade'),
+        ]
 
     def __str__(self):
         return f"{self.side.upper()} {self.amount} {self.trading_pair.symbol}"
 
 
+class OrderLatency(models.Model):
+    """
+    Tick-to-trade timings for an automated order (see trading.latency).
+    Stages are stored as microsecond offsets from due_at to keep rows small.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='latency')
+    strategy_type = models.CharField(max_length=20)
+    symbol = models.CharField(max_length=20)
+
+    due_at = models.DateTimeField()  # When the strategy became due
+    tick_us = models.BigIntegerField(null=True)  # Executor picked it up
+    price_us = models.BigIntegerField(null=True)  # Price observed
+    persisted_us = models.BigIntegerField(null=True)  # Order row written
+    acked_us = models.BigIntegerField(null=True)  # Exchange (or paper fill) acknowledged
+
+    class Meta:
+        verbose_name_plural = 'Order latencies'
+        indexes = [
+            models.Index(fields=['due_at']),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} latency"
+
+
+class SimulationResult(models.Model):
+    """
+    Memoized backtest metrics for one parameter set on one closed price range
+    (see trading.optimizer). The key hashes everything the result depends on.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    metrics = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Simulation {self.key[:12]}"
+
+
 class UserSettings(models.Model):
     """User trading settings and API keys"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='trading_settings')
@@ -0,0 +1,298 @@
+"""
+Strategy Optimizer
+Walk-forward grid / random search over DCA strategy parameters, simulated on
+historical klines across a process pool that reads prices from shared memory
+"""
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from multiprocessing import shared_memory
+import numpy as np
+from django.conf import settings
+from .custom_strategy import INTERVAL_MS, KLINE_INTERVALS
+from .equity_curve import candle_cache
+from .models import SimulationResult
+from .simulation import init_worker, run_tasks
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARAMETERS = ('stop_loss_percentage', 'take_profit_percentage', 'amount', 'execution_interval')
+SEARCH_METHODS = ('grid', 'random')
+# Bump when simulate_dca changes so memoized results are not reused
+SIMULATION_VERSION = 1
+INITIAL_CASH = 10000.0
+MIN_BARS_PER_BLOCK = 50
+
+
+def default_space(strategy):
+    """Search space around a strategy's current settings"""
+    amount = float(strategy.amount)
+    return {
+        'stop_loss_percentage': [0.5, 1.0, 2.0, 3.0, 5.0],
+        'take_profit_percentage': [1.0, 2.0, 3.0, 5.0, 8.0],
+        'amount': [amount * 0.5, amount, amount * 2],
+        'execution_interval': list(KLINE_INTERVALS),
+    }
+
+
+def parse_space(strategy, overrides=None):
+    """Default space with `overrides` ({parameter: [values]}) applied, validated"""
+    space = default_space(strategy)
+    for name, values in (overrides or {}).items():
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter: {name}")
+        if not isinstance(values, (list, tuple)) or not values:
+            raise ValueError(f"{name} needs a non-empty list of values")
+        if name == 'execution_interval':
+            unknown = [value for value in values if value not in KLINE_INTERVALS]
+            if unknown:
+                raise ValueError(f"Unsupported execution_interval: {unknown}")
+            space[name] = list(values)
+        else:
+            try:
+                values = [float(value) for value in values]
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} values must be numbers")
+            if any(value <= 0 for value in values):
+                raise ValueError(f"{name} values must be positive")
+            space[name] = values
+    return space
+
+
+def grid_points(space):
+    return [dict(zip(PARAMETERS, values)) for values in itertools.product(*(space[name] for name in PARAMETERS))]
+
+
+def random_points(space, samples, seed=None):
+    """Numeric parameters are drawn uniformly between their listed min and max"""
+    rng = random.Random(seed)
+    points = set()
+    for _ in range(samples * 10):
+        if len(points) >= samples:
+            break
+        points.add((
+            round(rng.uniform(min(space['stop_loss_percentage']), max(space['stop_loss_percentage'])), 2),
+            round(rng.uniform(min(space['take_profit_percentage']), max(space['take_profit_percentage'])), 2),
+            round(rng.uniform(min(space['amount']), max(space['amount'])), 8),
+            rng.choice(space['execution_interval']),
+        ))
+    return [dict(zip(PARAMETERS, point)) for point in sorted(points, key=str)]
+
+
+def walk_forward_splits(n_bars, folds, train_blocks):
+    """
+    Rolling ((train start, end), (test start, end)) bar ranges: the history is
+    cut into folds + train_blocks equal blocks and each fold trains on
+    train_blocks consecutive blocks and tests on the block right after them
+    """
+    block = n_bars // (folds + train_blocks)
+    if block < MIN_BARS_PER_BLOCK:
+        raise ValueError(f"Not enough price history for {folds} folds ({n_bars} bars)")
+    return [
+        ((fold * block, (fold + train_blocks) * block), ((fold + train_blocks) * block, (fold + train_blocks + 1) * block))
+        for fold in range(folds)
+    ]
+
+
+def simulated_bars(n_points, n_bars, folds, train_blocks):
+    """Bars a walk-forward search simulates: every point on every training window, one winner per test window"""
+    block = n_bars // (folds + train_blocks)
+    return n_points * folds * train_blocks * block + folds * block
+
+
+def _rank(metrics):
+    return metrics['return_pct'], -metrics['max_drawdown_pct']
+
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc).isoformat()
+
+
+class StrategyOptimizer:
+    """
+    Every (parameter set, bar range) simulation is memoized in
+    SimulationResult under a hash of the symbol, closed bar range, parameters,
+    starting cash and SIMULATION_VERSION, so a rerun only simulates new points.
+    """
+
+    def load_prices(self, symbol, interval, days, now_ms=None):
+        """(open times, closes) of the last `days` of closed bars"""
+        step = INTERVAL_MS[interval]
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        end_ms = now_ms // step * step - step
+        start_ms = end_ms - days * 86_400_000 + step
+        candles = candle_cache.get(symbol, interval, start_ms, end_ms)
+        candles = candles[(candles['open_time'] >= start_ms) & (candles['open_time'] <= end_ms)]
+        return candles['open_time'].copy(), candles['close'].copy()
+
+    def _key(self, symbol, base_interval, open_times, start, end, point, cash):
+        payload = [
+            SIMULATION_VERSION, symbol, base_interval, int(open_times[start]), int(open_times[end - 1]), end - start,
+            float(point['stop_loss_percentage']), float(point['take_profit_percentage']), float(point['amount']),
+            point['execution_interval'], float(cash),
+        ]
+        return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+    @contextmanager
+    def _runner(self, closes, workers):
+        """
+        Yield run(tasks) -> metrics. With workers > 1 the closes are copied once
+        into shared memory and a spawned process pool is started on first use,
+        so fully memoized reruns never pay for it.
+        """
+        with ExitStack() as stack:
+            pool = None
+
+            def run(tasks):
+                nonlocal pool
+                if workers <= 1 or len(tasks) < 2:
+                    return run_tasks(tasks, closes)
+                if pool is None:
+                    shm = shared_memory.SharedMemory(create=True, size=closes.nbytes)
+                    stack.callback(shm.unlink)
+                    stack.callback(shm.close)
+                    np.ndarray(closes.shape, dtype=np.float64, buffer=shm.buf)[:] = closes
+                    pool = stack.enter_context(ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=init_worker,
+                        initargs=(shm.name, len(closes)),
+                    ))
+                # A few chunks per worker keeps them evenly loaded with little IPC
+                size = max(1, len(tasks) // (workers * 4))
+                chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+                return [metrics for chunk in pool.map(run_tasks, chunks) for metrics in chunk]
+
+            yield run
+
+    def _evaluate(self, run, entries, counts):
+        """{key: metrics} for (key, task) entries, simulating only keys not memoized yet"""
+        keys = list(dict.fromkeys(key for key, _ in entries))
+        results = {}
+        for i in range(0, len(keys), 500):
+            results.update(SimulationResult.objects.filter(key__in=keys[i:i + 500]).values_list('key', 'metrics'))
+
+        pending = {key: task for key, task in entries if key not in results}
+        if pending:
+            computed = dict(zip(pending, run(list(pending.values()))))
+            SimulationResult.objects.bulk_create(
+                [SimulationResult(key=key, metrics=metrics) for key, metrics in computed.items()],
+                ignore_conflicts=True, batch_size=500,
+            )
+            results.update(computed)
+        counts['simulated'] += len(pending)
+        counts['memoized'] += len(keys) - len(pending)
+        return results
+
+    def optimize(self, strategy, method='grid', space=None, samples=50, days=180, folds=4, train_blocks=3,
+                 workers=None, seed=None, initial_cash=INITIAL_CASH, max_bars=None):
+        """
+        Walk-forward search for a DCA strategy. For each fold the best
+        parameters on the training window are scored on the following test
+        window; the last fold's winner is the recommendation. `max_bars`
+        bounds the bars simulated (see simulated_bars), checked before any
+        history is fetched.
+        """
+        if strategy.strategy_type != 'dca':
+            raise ValueError("Only DCA strategies can be optimized")
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method: {method}")
+        if days <= 0 or folds <= 0 or train_blocks <= 0 or samples <= 0:
+            raise ValueError("days, folds, train_blocks and samples must be positive")
+
+        space = parse_space(strategy, space)
+        n_points = math.prod(len(values) for values in space.values()) if method == 'grid' else samples
+        if max_bars is not None:
+            finest = min((KLINE_INTERVALS[value] for value in space['execution_interval']), key=INTERVAL_MS.get)
+            work = simulated_bars(n_points, days * 86_400_000 // INTERVAL_MS[finest], folds, train_blocks)
+            if work > max_bars:
+                raise ValueError(
+                    f"Search would simulate about {work:,} bars ({n_points} points over {days} days), "
+                    f"over the limit of {max_bars:,}; narrow the space or days, or run manage.py optimize_strategy"
+                )
+
+        points = grid_points(space) if method == 'grid' else random_points(space, samples, seed)
+        if workers is None:
+            workers = getattr(settings, 'OPTIMIZER_WORKERS', 0) or os.cpu_count() or 1
+
+        # Simulate on the finest candidate interval; coarser intervals buy every `step` bars
+        kline_intervals = {KLINE_INTERVALS[point['execution_interval']] for point in points}
+        base_interval = min(kline_intervals, key=INTERVAL_MS.get)
+        symbol = strategy.trading_pair.symbol
+        open_times, closes = self.load_prices(symbol, base_interval, days)
+        splits = walk_forward_splits(len(closes), folds, train_blocks)
+
+        def entry(start, end, point):
+            step = INTERVAL_MS[KLINE_INTERVALS[point['execution_interval']]] // INTERVAL_MS[base_interval]
+            task = (start, end, step, point['amount'], point['stop_loss_percentage'],
+                    point['take_profit_percentage'], initial_cash)
+            return self._key(symbol, base_interval, open_times, start, end, point, initial_cash), task
+
+        counts = {'simulated': 0, 'memoized': 0}
+        started = time.monotonic()
+        with self._runner(closes, min(workers, len(points) * len(splits))) as run:
+            train_entries = [[entry(*train, point) for point in points] for train, _ in splits]
+            train_results = self._evaluate(run, [e for fold in train_entries for e in fold], counts)
+            winners = [
+                max(range(len(points)), key=lambda i: _rank(train_results[fold[i][0]]))
+                for fold in train_entries
+            ]
+            test_entries = [entry(*test, points[i]) for (_, test), i in zip(splits, winners)]
+            test_results = self._evaluate(run, test_entries, counts)
+
+        report = []
+        growth = 1.0
+        for (train, test), fold, winner, (test_key, _) in zip(splits, train_entries, winners, test_entries):
+            test_metrics = test_results[test_key]
+            growth *= 1 + test_metrics['return_pct'] / 100
+            report.append({
+                'train': {'start': _iso(open_times[train[0]]), 'end': _iso(open_times[train[1] - 1])},
+                'test': {'start': _iso(open_times[test[0]]), 'end': _iso(open_times[test[1] - 1])},
+                'params': points[winner],
+                'train_metrics': train_results[fold[winner][0]],
+                'test_metrics': test_metrics,
+            })
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Optimized strategy {strategy.id}: {len(points)} points x {len(splits)} folds, "
+            f"{counts['simulated']} simulated, {counts['memoized']} memoized, {workers} workers, {elapsed:.1f}s"
+        )
+        return {
+            'strategy_id': strategy.id,
+            'symbol': symbol,
+            'method': method,
+            'base_interval': base_interval,
+            'bars': len(closes),
+            'points': len(points),
+            **counts,
+            'workers': workers,
+            'seconds': round(elapsed, 3),
+            'folds': report,
+            'walk_forward_return_pct': round((growth - 1) * 100, 6),
+            'recommended': report[-1]['params'],
+        }
+
+    def apply(self, strategy, params):
+        """Save optimized parameters on the strategy"""
+        strategy.stop_loss_percentage = Decimal(str(params['stop_loss_percentage'])).quantize(Decimal('0.01'))
+        strategy.take_profit_percentage = Decimal(str(params['take_profit_percentage'])).quantize(Decimal('0.01'))
+        strategy.amount = Decimal(str(params['amount'])).quantize(Decimal('0.00000001'))
+        strategy.execution_interval = params['execution_interval']
+        strategy.save(update_fields=[
+            'stop_loss_percentage', 'take_profit_percentage', 'amount', 'execution_interval', 'updated_at'
+        ])
+
+
+# Singleton instance
+strategy_optimizer = StrategyOptimizer()
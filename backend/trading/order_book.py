@@ -0,0 +1,292 @@
+"""
+Local Order Books
+Per-symbol books kept current from a depth snapshot plus incremental diff
+updates, used to price paper market orders by walking the levels
+"""
+import json
+import random
+import threading
+import time
+from bisect import bisect_left
+from decimal import Decimal
+from django.conf import settings
+import requests
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class OrderBookOutOfSync(Exception):
+    """A diff update did not follow the previous one; the book needs a new snapshot"""
+
+
+class _BookSide:
+    """
+    Price levels in a sorted array with a parallel quantity array.
+    Keys are prices for asks and negated prices for bids, so index 0 is always
+    the best level and walking the book is a forward scan.
+    """
+
+    __slots__ = ('sign', 'keys', 'quantities')
+
+    def __init__(self, sign):
+        self.sign = sign
+        self.keys = []
+        self.quantities = []
+
+    def load(self, levels):
+        pairs = sorted((self.sign * float(price), float(quantity)) for price, quantity in levels if float(quantity) > 0)
+        self.keys = [key for key, _ in pairs]
+        self.quantities = [quantity for _, quantity in pairs]
+
+    def set(self, price, quantity):
+        """Apply one level update; quantity 0 removes the level"""
+        key = self.sign * float(price)
+        quantity = float(quantity)
+        index = bisect_left(self.keys, key)
+        exists = index < len(self.keys) and self.keys[index] == key
+        if quantity == 0:
+            if exists:
+                del self.keys[index]
+                del self.quantities[index]
+        elif exists:
+            self.quantities[index] = quantity
+        else:
+            self.keys.insert(index, key)
+            self.quantities.insert(index, quantity)
+
+    def best(self):
+        return (self.sign * self.keys[0], self.quantities[0]) if self.keys else None
+
+    def walk(self, quantity):
+        """Consume up to quantity from the best level outward; returns (cost, filled, worst price)"""
+        remaining = quantity
+        cost = 0.0
+        worst = None
+        for key, available in zip(self.keys, self.quantities):
+            take = available if available < remaining else remaining
+            cost += take * self.sign * key
+            worst = self.sign * key
+            remaining -= take
+            if remaining <= 0:
+                break
+        return cost, quantity - remaining, worst
+
+
+class LocalOrderBook:
+    """Order book for one symbol maintained with Binance's snapshot + diff protocol"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = _BookSide(-1)
+        self.asks = _BookSide(1)
+        self.last_update_id = None
+        self.synced = False
+        self._lock = threading.Lock()
+
+    def apply_snapshot(self, snapshot):
+        """Load a /v3/depth snapshot ({'lastUpdateId', 'bids', 'asks'})"""
+        with self._lock:
+            self.bids.load(snapshot['bids'])
+            self.asks.load(snapshot['asks'])
+            self.last_update_id = int(snapshot['lastUpdateId'])
+            self.synced = False  # Until the first diff bridging the snapshot arrives
+
+    def apply_diff(self, event):
+        """
+        Apply a depth diff event ({'U': first id, 'u': last id, 'b': bids, 'a': asks}).
+        Returns False for events already covered by the snapshot; raises
+        OrderBookOutOfSync when an update was missed.
+        """
+        first_id, final_id = int(event['U']), int(event['u'])
+        with self._lock:
+            if self.last_update_id is None:
+                raise OrderBookOutOfSync(f"{self.symbol}: diff before snapshot")
+            if final_id <= self.last_update_id:
+                return False
+            expected = self.last_update_id + 1
+            if self.synced and first_id != expected or not self.synced and not first_id <= expected <= final_id:
+                self.synced = False
+                raise OrderBookOutOfSync(f"{self.symbol}: expected update {expected}, got {first_id}-{final_id}")
+
+            for price, quantity in event.get('b', []):
+                self.bids.set(price, quantity)
+            for price, quantity in event.get('a', []):
+                self.asks.set(price, quantity)
+            self.last_update_id = final_id
+            self.synced = True
+            return True
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def vwap(self, side, quantity, shortfall_penalty=0.0):
+        """
+        Volume-weighted fill price for a market order of the given size.
+        Buys walk the asks, sells walk the bids; cost is O(levels consumed).
+        When depth runs out, the unfilled remainder is priced at the worst
+        level consumed moved a further `shortfall_penalty` (fraction) against
+        the order, so an order bigger than the book never fills better than
+        the book itself. Returns (price, filled_from_book).
+        """
+        quantity = float(quantity)
+        with self._lock:
+            book_side = self.asks if side == 'buy' else self.bids
+            cost, filled, worst = book_side.walk(quantity)
+        if filled <= 0:
+            return None, 0.0
+        if filled < quantity:
+            direction = 1 if side == 'buy' else -1
+            cost += (quantity - filled) * worst * (1 + direction * shortfall_penalty)
+        return cost / quantity, filled
+
+
+class ReplayDepthSource:
+    """
+    Replays recorded depth data from a JSON-lines file for tests and backtests.
+    Each line is {"type": "snapshot", "symbol", "lastUpdateId", "bids", "asks"}
+    or {"type": "diff", "symbol", "U", "u", "b", "a"}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class BinanceDepthSource:
+    """
+    Live depth: a REST snapshot per symbol followed by the diff-depth WebSocket stream.
+    Requires the optional websocket-client package.
+    """
+
+    REST_URL = 'https://api.binance.com/api/v3/depth'
+    STREAM_URL = 'wss://stream.binance.com:9443/stream?streams='
+
+    def __init__(self, symbols, depth_limit=1000):
+        self.symbols = list(symbols)
+        self.depth_limit = depth_limit
+        self.session = requests.Session()
+
+    def snapshot(self, symbol):
+        response = self.session.get(self.REST_URL, params={'symbol': symbol, 'limit': self.depth_limit}, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        data.update({'type': 'snapshot', 'symbol': symbol})
+        return data
+
+    def __iter__(self):
+        import websocket  # Optional dependency: pip install websocket-client
+
+        streams = '/'.join(f"{symbol.lower()}@depth@100ms" for symbol in self.symbols)
+        ws = websocket.create_connection(self.STREAM_URL + streams, timeout=30)
+        try:
+            # Snapshots are taken after subscribing so buffered diffs can bridge them
+            pending = set(self.symbols)
+            while True:
+                message = json.loads(ws.recv())
+                event = message.get('data', message)
+                symbol = event.get('s')
+                if symbol in pending:
+                    pending.discard(symbol)
+                    yield self.snapshot(symbol)
+                yield {'type': 'diff', 'symbol': symbol, 'U': event['U'], 'u': event['u'], 'b': event['b'], 'a': event['a']}
+        finally:
+            ws.close()
+
+
+class OrderBookManager:
+    """Process-wide registry of local order books"""
+
+    def __init__(self):
+        self.books = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get(self, symbol):
+        """The synced book for a symbol, or None"""
+        book = self.books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    def consume(self, source):
+        """Apply every snapshot/diff event from a source (replay or live)"""
+        resync = getattr(source, 'snapshot', None)
+        for event in source:
+            symbol = event['symbol']
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = LocalOrderBook(symbol)
+
+            if event['type'] == 'snapshot':
+                book.apply_snapshot(event)
+                continue
+            try:
+                book.apply_diff(event)
+            except OrderBookOutOfSync as e:
+                logger.warning(f"{e}; resnapshotting")
+                if resync is not None:
+                    book.apply_snapshot(resync(symbol))
+
+    def ensure_started(self):
+        """Start the live depth thread once per process when PAPER_ORDER_BOOK_SYMBOLS is set"""
+        symbols = getattr(settings, 'PAPER_ORDER_BOOK_SYMBOLS', [])
+        if not symbols or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run_live, args=(symbols,), daemon=True, name='order-books')
+            self._thread.start()
+
+    def _run_live(self, symbols):
+        """
+        Consume the live stream forever. Reconnects wait a random time up to a
+        delay that doubles per failed connection (capped), and the delay starts
+        over once a connection has synced a book.
+        """
+        base = getattr(settings, 'PAPER_ORDER_BOOK_RECONNECT_SECONDS', 1.0)
+        cap = getattr(settings, 'PAPER_ORDER_BOOK_RECONNECT_MAX_SECONDS', 60.0)
+        delay = base
+        while True:
+            try:
+                self.consume(BinanceDepthSource(symbols))
+                logger.warning('Order book stream ended, reconnecting')
+            except ImportError:
+                logger.error('PAPER_ORDER_BOOK_SYMBOLS requires websocket-client; order books disabled')
+                return
+            except Exception as e:
+                logger.error(f"Order book stream failed, reconnecting: {e}")
+            if any(book.synced for book in self.books.values()):
+                delay = base
+            for book in self.books.values():
+                book.synced = False
+            time.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, cap)
+
+    def fill_price(self, symbol, side, quantity):
+        """
+        VWAP fill price as Decimal from the local book, or None without a synced
+        book. Quantity beyond the book's depth pays PAPER_DEPTH_SHORTFALL_BPS past
+        the worst level.
+        """
+        book = self.get(symbol)
+        if book is None:
+            return None
+        penalty = getattr(settings, 'PAPER_DEPTH_SHORTFALL_BPS', 50) / 10_000
+        price, filled = book.vwap(side, quantity, penalty)
+        if price is None:
+            return None
+        if filled < float(quantity):
+            logger.info(f"{symbol} {side} {quantity} exceeds local book depth ({filled}); remainder priced past the worst level")
+        return Decimal(str(price))
+
+
+# Singleton instance
+order_books = OrderBookManager()
@@ -6,58 +6,104 @@ from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction
 from .models import Order, TradeHistory, UserSettings, PaperTradingPosition
-import requests
+from .portfolio_valuation import portfolio_valuator
+from .price_board import price_board
+from .order_book import order_books
+from .latency import order_persisted, order_acked
+from .price_feed import price_feed, PriceUnavailable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Commodities priced from fixed approximations with random jitter, not a market feed
+SIMULATED_SYMBOLS = frozenset({'XAUUSD', 'XAGUSD', 'XTIUSD'})
 
 
 class PaperTradingService:
     """Handles all paper trading operations"""
 
+    def __init__(self, clock=None, tape=None):
+        # clock() -> aware datetime stamped on fills; tape records or replays
+        # order book fills (see trading.replay)
+        self.clock = clock or timezone.now
+        self.tape = tape
+
     def get_current_price(self, symbol):
         """
         Fetch real-time price from appropriate API
         Args:
             symbol: Trading pair symbol (e.g., 'BTCUSDT', 'XAUUSD')
         Returns:
-            Decimal: Current price
+            Decimal: Current price (possibly stale, see PRICE_STALE_MAX_AGE_SECONDS)
+        Raises:
+            PriceUnavailable: upstream failed and no acceptable stale price exists
         """
-        try:
-            # For commodities (Gold, Silver, Crude Oil)
-            if symbol in ['XAUUSD', 'XAGUSD', 'XTIUSD']:
-                return self._get_commodity_price(symbol)
-
-            # For cryptocurrencies - use Binance
-            url = f'https://api.binance.com/api/v3/ticker/price?symbol={symbol}'
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return Decimal(str(data['price']))
-        except Exception as e:
-            print(f"Error fetching price for {symbol}: {e}")
-            # Return simulated price if API fails (for paper trading demo)
-            return self._get_simulated_crypto_price(symbol)
-
-    def _get_simulated_crypto_price(self, symbol):
+        # For commodities (Gold, Silver, Crude Oil)
+        if symbol in SIMULATED_SYMBOLS:
+            return self._get_commodity_price(symbol)
+
+        # For cryptocurrencies - hedged Binance request within the latency budget
+        return price_feed.get_price(symbol)
+
+    def get_pair_price(self, trading_pair):
+        """Current price for a TradingPair (see get_symbol_price)"""
+        return self.get_symbol_price(trading_pair.symbol, trading_pair.id)
+
+    def get_symbol_price(self, symbol, pair_id=None):
         """
-        Return simulated crypto prices for demo/paper trading when API fails
+        Current price read from the shared-memory price board when it holds a
+        fresh value for pair_id, otherwise fetched like get_current_price
         """
-        import random
+        if pair_id is not None:
+            price = price_board.get_price(pair_id)
+            if price is not None:
+                return Decimal(str(price))
+        return self.get_current_price(symbol)
 
-        # Base prices (approximate market prices)
-        base_prices = {
-            'BTCUSDT': Decimal('89000.00'),
-            'ETHUSDT': Decimal('3200.00'),
-            'SOLUSDT': Decimal('210.00'),
-            'BNBUSDT': Decimal('620.00'),
-            'ADAUSDT': Decimal('0.95'),
-        }
+    def get_fill_price(self, trading_pair, side, amount, price=None):
+        """
+        Fill price for a paper market order. Walks the local order book for the
+        pair when one is synced, so large orders pay realistic slippage; falls
+        back to the price snapshot (or a fresh price) otherwise.
+        """
+        if self.tape is not None:
+            fill_price = self.tape.observe(
+                'fill', f"{trading_pair.symbol}:{side}:{amount}",
+                lambda: self._book_fill_price(trading_pair.symbol, side, amount),
+            )
+        else:
+            fill_price = self._book_fill_price(trading_pair.symbol, side, amount)
+        if fill_price is not None:
+            return fill_price
+        return price if price is not None else self.get_pair_price(trading_pair)
 
-        base_price = base_prices.get(symbol, Decimal('100.00'))
-        # Add small random variation (±1%)
-        variation = float(base_price) * random.uniform(-0.01, 0.01)
-        simulated_price = base_price + Decimal(str(variation))
+    def _book_fill_price(self, symbol, side, amount):
+        order_books.ensure_started()
+        return order_books.fill_price(symbol, side, amount)
 
-        print(f"Using simulated price for {symbol}: {simulated_price}")
-        return simulated_price
+    def get_all_prices(self, symbols=None):
+        """
+        Fetch real prices for many symbols with a single ticker request
+        Unlike get_current_price this never substitutes stale prices;
+        symbols that could not be priced are simply missing from the result.
+        Args:
+            symbols: Optional iterable of symbols to keep (default: all)
+        Returns:
+            dict: symbol -> Decimal price
+        """
+        wanted = set(symbols) if symbols is not None else None
+        prices = {}
+
+        try:
+            prices = price_feed.get_prices(wanted)
+        except PriceUnavailable as e:
+            logger.warning(f"Error fetching ticker prices: {e}")
+
+        for symbol in (wanted or ()):
+            if symbol in SIMULATED_SYMBOLS:
+                prices[symbol] = self._get_commodity_price(symbol)
+
+        return prices
 
     def _get_commodity_price(self, symbol):
         """
@@ -88,9 +134,14 @@ class PaperTradingService:
         )
         return settings.paper_balance_usdt
 
-    def get_user_position(self, user, trading_pair):
-        """Get user's position for a trading pair"""
-        position, created = PaperTradingPosition.objects.get_or_create(
+    def get_user_position(self, user, trading_pair, lock=False):
+        """
+        Get user's position for a trading pair
+        With lock=True the row is locked until the surrounding transaction ends,
+        so concurrent fills (executor, risk monitor, API) apply one at a time.
+        """
+        positions = PaperTradingPosition.objects.select_for_update() if lock else PaperTradingPosition.objects
+        position, created = positions.get_or_create(
             user=user,
             trading_pair=trading_pair,
             defaults={
@@ -102,18 +153,19 @@ class PaperTradingService:
         return position
 
     @transaction.atomic
-    def execute_market_buy(self, user, trading_pair, amount):
+    def execute_market_buy(self, user, trading_pair, amount, price=None):
         """
         Execute a market buy order (paper trading)
         Args:
             user: User object
             trading_pair: TradingPair object
             amount: Amount to buy (in base currency, e.g., BTC)
+            price: Optional price snapshot used when no local order book is synced
         Returns:
             Order object
         """
-        # Get current market price
-        current_price = self.get_current_price(trading_pair.symbol)
+        # Fill price from the local order book, else the market price
+        current_price = self.get_fill_price(trading_pair, 'buy', amount, price)
         if current_price == 0:
             raise ValueError(f"Could not fetch price for {trading_pair.symbol}")
 
@@ -132,6 +184,7 @@ class PaperTradingService:
             )
 
         # Create order
+        now = self.clock()
         order = Order.objects.create(
             user=user,
             trading_pair=trading_pair,
@@ -143,15 +196,17 @@ class PaperTradingService:
             filled_amount=Decimal(str(amount)),
             status='filled',
             is_paper_trade=True,
-            filled_at=timezone.now()
+            filled_at=now,
+            created_at=now,
         )
+        order_persisted(order)
 
         # Deduct from balance
         settings.paper_balance_usdt -= total_cost
         settings.save()
 
         # Update or create position
-        position = self.get_user_position(user, trading_pair)
+        position = self.get_user_position(user, trading_pair, lock=True)
         old_total = position.amount * position.average_buy_price
         new_total = old_total + total_cost
         position.amount += Decimal(str(amount))
@@ -168,29 +223,33 @@ class PaperTradingService:
             price=current_price,
             amount=Decimal(str(amount)),
             total=total_cost,
-            fee=Decimal('0')  # No fees for paper trading
+            fee=Decimal('0'),  # No fees for paper trading
+            executed_at=now,
         )
 
+        order_acked(order)
         return order
 
     @transaction.atomic
-    def execute_market_sell(self, user, trading_pair, amount):
+    def execute_market_sell(self, user, trading_pair, amount, price=None):
         """
         Execute a market sell order (paper trading)
         Args:
             user: User object
             trading_pair: TradingPair object
             amount: Amount to sell (in base currency, e.g., BTC)
+            price: Optional price snapshot used when no local order book is synced
         Returns:
             Order object
         """
-        # Get current market price
-        current_price = self.get_current_price(trading_pair.symbol)
+        # Fill price from the local order book, else the market price
+        current_price = self.get_fill_price(trading_pair, 'sell', amount, price)
         if current_price == 0:
             raise ValueError(f"Could not fetch price for {trading_pair.symbol}")
 
-        # Check if user has enough position
-        position = self.get_user_position(user, trading_pair)
+        # Check if user has enough position; the lock makes a concurrent exit of
+        # the same position wait and then fail this check instead of selling twice
+        position = self.get_user_position(user, trading_pair, lock=True)
         if position.amount < Decimal(str(amount)):
             raise ValueError(
                 f"Insufficient position. Trying to sell: {amount} {trading_pair.base_asset}, "
@@ -201,6 +260,7 @@ class PaperTradingService:
         total_proceeds = Decimal(str(amount)) * current_price
 
         # Create order
+        now = self.clock()
         order = Order.objects.create(
             user=user,
             trading_pair=trading_pair,
@@ -212,8 +272,10 @@ class PaperTradingService:
             filled_amount=Decimal(str(amount)),
             status='filled',
             is_paper_trade=True,
-            filled_at=timezone.now()
+            filled_at=now,
+            created_at=now,
         )
+        order_persisted(order)
 
         # Add to balance
         settings, created = UserSettings.objects.select_for_update().get_or_create(
@@ -244,47 +306,19 @@ class PaperTradingService:
             amount=Decimal(str(amount)),
             total=total_proceeds,
             fee=Decimal('0'),
-            profit_loss=profit_loss
+            profit_loss=profit_loss,
+            executed_at=now,
         )
 
+        order_acked(order)
         return order
 
     def get_portfolio_value(self, user):
         """
         Calculate total portfolio value (cash + holdings)
+        Served from the incrementally maintained valuation state; only stale
+        symbol prices are re-fetched.
         Returns:
             dict with balance, positions value, and total
         """
-        settings = self.get_user_balance(user)
-        balance = settings
-
-        positions = PaperTradingPosition.objects.filter(user=user, amount__gt=0)
-        positions_value = Decimal('0')
-        positions_list = []
-
-        for position in positions:
-            current_price = self.get_current_price(position.trading_pair.symbol)
-            position_value = position.amount * current_price
-            profit_loss = position_value - position.total_invested
-            profit_loss_pct = (profit_loss / position.total_invested * 100) if position.total_invested > 0 else 0
-
-            positions_value += position_value
-            positions_list.append({
-                'symbol': position.trading_pair.symbol,
-                'base_asset': position.trading_pair.base_asset,
-                'amount': float(position.amount),
-                'average_buy_price': float(position.average_buy_price),
-                'current_price': float(current_price),
-                'value': float(position_value),
-                'profit_loss': float(profit_loss),
-                'profit_loss_pct': float(profit_loss_pct)
-            })
-
-        total_value = balance + positions_value
-
-        return {
-            'cash_balance': float(balance),
-            'positions_value': float(positions_value),
-            'total_value': float(total_value),
-            'positions': positions_list
-        }
+        return portfolio_valuator.get_portfolio(user, price_source=self.get_symbol_price)
@@ -0,0 +1,242 @@
+"""
+Portfolio Valuation Service
+Incrementally maintained mark-to-market state for paper trading portfolios
+"""
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count, Max, Sum
+from .models import UserSettings, PaperTradingPosition
+from .price_feed import PriceUnavailable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Position:
+    """In-memory view of one paper position"""
+
+    __slots__ = ('pair_id', 'symbol', 'base_asset', 'amount', 'average_buy_price', 'total_invested', 'price', 'value')
+
+    def __init__(self, pair_id, symbol, base_asset, amount, average_buy_price, total_invested):
+        self.pair_id = pair_id
+        self.symbol = symbol
+        self.base_asset = base_asset
+        self.amount = amount
+        self.average_buy_price = average_buy_price
+        self.total_invested = total_invested
+        self.price = None
+        self.value = Decimal('0')
+
+
+class _UserPortfolio:
+    """Cash, positions and running positions value for one user"""
+
+    __slots__ = ('cash', 'positions', 'positions_value', 'marker', 'snapshot')
+
+    def __init__(self, cash, marker=None):
+        self.cash = cash
+        self.positions = {}  # symbol -> _Position
+        self.positions_value = Decimal('0')
+        self.marker = marker
+        self.snapshot = None
+
+
+class PortfolioValuator:
+    """
+    Keeps per-user portfolio values current from price ticks.
+
+    A price tick only touches users holding that symbol (via the symbol -> holders
+    index), so reads do not revalue every position. Prices older than price_ttl
+    are re-fetched once per symbol, not once per user. Each read compares a
+    one-query change marker of the user's cash and positions in the database
+    with the one the state was loaded at, so fills from any process are seen on
+    the next read. At most max_users states are kept, least recently read
+    evicted first.
+    """
+
+    def __init__(self, price_ttl: float = 5, max_users: int = 1024):
+        self.price_ttl = price_ttl
+        self.max_users = max_users
+        self._states = OrderedDict()  # user_id -> _UserPortfolio, least recently read first
+        self._holders = {}  # symbol -> set of user_ids
+        self._prices = {}   # symbol -> (price, observed_at)
+        self._lock = threading.RLock()
+
+    def get_portfolio(self, user, price_source, prices=None):
+        """
+        Return a copy of the user's portfolio in the get_portfolio_value format.
+        price_source(symbol, pair_id) is only called for symbols whose price is stale.
+        prices ({symbol: price}) marks only the returned copy, leaving the shared
+        state and its price cache as they are.
+        """
+        marker = self._marker(user.pk)
+        with self._lock:
+            state = self._states.get(user.pk)
+            if state is None or state.marker != marker:
+                state = self._load(user, marker)
+            else:
+                self._states.move_to_end(user.pk)
+
+        self._refresh_prices(state, price_source, skip=prices or ())
+
+        with self._lock:
+            if prices:
+                return self._build_snapshot(state, prices)
+            if state.snapshot is None:
+                state.snapshot = self._build_snapshot(state)
+            snapshot = state.snapshot
+        # Callers may annotate the result; the cached snapshot stays untouched
+        return {
+            **snapshot,
+            'positions': [dict(position) for position in snapshot['positions']],
+            'unpriced_positions': [dict(position) for position in snapshot['unpriced_positions']],
+        }
+
+    def on_price(self, symbol, price):
+        """Apply a price tick to every user holding the symbol"""
+        price = Decimal(str(price))
+        with self._lock:
+            self._prices[symbol] = (price, time.monotonic())
+            for user_id in self._holders.get(symbol, ()):
+                state = self._states[user_id]
+                self._mark(state, state.positions[symbol], price)
+
+    def invalidate(self, user_id):
+        """Forget a user's state so the next read reloads it"""
+        with self._lock:
+            state = self._states.pop(user_id, None)
+            if state is not None:
+                for symbol in state.positions:
+                    self._remove_holder(symbol, user_id)
+
+    def _marker(self, user_id):
+        """
+        Fingerprint of the user's cash and positions rows: every fill moves the
+        cash balance and a position's amount and updated_at, and inserts and
+        deletes move the row count
+        """
+        return tuple(User.objects.filter(pk=user_id).aggregate(
+            cash=Max('trading_settings__paper_balance_usdt'),
+            settings_at=Max('trading_settings__updated_at'),
+            rows=Count('paper_positions'),
+            modified=Max('paper_positions__updated_at'),
+            amount=Sum('paper_positions__amount'),
+        ).values())
+
+    def _load(self, user, marker):
+        """Rebuild a user's state from the database"""
+        self.invalidate(user.pk)
+
+        user_settings, created = UserSettings.objects.get_or_create(
+            user=user,
+            defaults={'paper_balance_usdt': Decimal('10000.00000000')}
+        )
+        state = _UserPortfolio(user_settings.paper_balance_usdt, marker)
+
+        positions = (
+            PaperTradingPosition.objects
+            .filter(user=user, amount__gt=0)
+            .select_related('trading_pair')
+            .order_by('id')
+        )
+        for position in positions:
+            symbol = position.trading_pair.symbol
+            state.positions[symbol] = _Position(
+                position.trading_pair_id, symbol, position.trading_pair.base_asset, position.amount,
+                position.average_buy_price, position.total_invested
+            )
+            self._holders.setdefault(symbol, set()).add(user.pk)
+            price = self._prices.get(symbol)
+            if price:
+                self._mark(state, state.positions[symbol], price[0])
+
+        self._states[user.pk] = state
+        while len(self._states) > self.max_users:
+            self.invalidate(next(iter(self._states)))
+        return state
+
+    def _refresh_prices(self, state, price_source, skip=()):
+        """Fetch prices for the user's symbols that have gone stale, except those in skip"""
+        now = time.monotonic()
+        stale = [
+            (symbol, position.pair_id) for symbol, position in list(state.positions.items())
+            if symbol not in skip and (symbol not in self._prices or now - self._prices[symbol][1] > self.price_ttl)
+        ]
+        for symbol, pair_id in stale:
+            try:
+                self.on_price(symbol, price_source(symbol, pair_id))
+            except PriceUnavailable as e:
+                # Keep the last mark rather than failing the whole portfolio
+                logger.warning(f"Portfolio price refresh failed: {e}")
+
+    def _mark(self, state, position, price):
+        if price is None:
+            return
+        value = position.amount * price
+        state.positions_value += value - position.value
+        position.value = value
+        position.price = price
+        state.snapshot = None
+
+    def _remove_holder(self, symbol, user_id):
+        holders = self._holders.get(symbol)
+        if holders is not None:
+            holders.discard(user_id)
+            if not holders:
+                del self._holders[symbol]
+
+    def _build_snapshot(self, state, prices=None):
+        """
+        Snapshot of the state, with positions in `prices` marked at those prices
+        instead. Positions never priced are listed under unpriced_positions and
+        left out of the values rather than counted at zero.
+        """
+        positions_list = []
+        unpriced = []
+        positions_value = Decimal('0')
+        for position in state.positions.values():
+            price, value = position.price, position.value
+            if prices and position.symbol in prices:
+                price = Decimal(str(prices[position.symbol]))
+                value = position.amount * price
+            if price is None:
+                unpriced.append({
+                    'symbol': position.symbol,
+                    'base_asset': position.base_asset,
+                    'amount': float(position.amount),
+                    'average_buy_price': float(position.average_buy_price),
+                    'total_invested': float(position.total_invested),
+                })
+                continue
+            positions_value += value
+            profit_loss = value - position.total_invested
+            profit_loss_pct = (profit_loss / position.total_invested * 100) if position.total_invested > 0 else 0
+            positions_list.append({
+                'symbol': position.symbol,
+                'base_asset': position.base_asset,
+                'amount': float(position.amount),
+                'average_buy_price': float(position.average_buy_price),
+                'current_price': float(price),
+                'value': float(value),
+                'profit_loss': float(profit_loss),
+                'profit_loss_pct': float(profit_loss_pct)
+            })
+
+        return {
+            'cash_balance': float(state.cash),
+            'positions_value': float(positions_value),
+            'total_value': float(state.cash + positions_value),
+            'positions': positions_list,
+            'unpriced_positions': unpriced,
+        }
+
+
+# Singleton instance
+portfolio_valuator = PortfolioValuator(
+    price_ttl=getattr(settings, 'PORTFOLIO_PRICE_TTL_SECONDS', 5),
+    max_users=getattr(settings, 'PORTFOLIO_MAX_USERS', 1024),
+)
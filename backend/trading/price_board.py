@@ -0,0 +1,218 @@
+"""
+Shared-Memory Price Board
+One writer process publishes last prices into shared memory; every web worker
+and background process reads them zero-copy without network calls
+"""
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x5052494345424F31  # "PRICEBO1"
+HEADER_SIZE = 64
+
+# One slot per TradingPair.id; seq is a seqlock counter (odd while a write is in progress)
+SLOT_DTYPE = np.dtype([('seq', '<u8'), ('price', '<f8'), ('timestamp', '<f8')])
+
+READ_RETRIES = 100
+
+# Segments created by this process stay registered with its resource tracker
+_created_here = set()
+
+
+def _retire(shm):
+    """Clear a segment's magic so readers still mapping it re-attach"""
+    header = np.ndarray((1,), dtype='<u8', buffer=shm.buf)
+    if header[0] == MAGIC:
+        header[0] = 0
+    del header
+
+
+def _attach(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created_here:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class PriceBoard:
+    """
+    Fixed-layout price table indexed by TradingPair.id.
+
+    The header holds magic, capacity, a generation stamped when the segment
+    is created and the writer's heartbeat (epoch ms). A replaced or closed
+    segment has its magic cleared, so readers still mapping it can tell.
+
+    Writes follow the seqlock protocol: bump seq to odd, store price and timestamp,
+    bump seq to even. Readers retry until they see the same even seq before and
+    after copying the slot, so a read never mixes two writes.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((4,), dtype='<u8', buffer=shm.buf)
+        if owner:
+            self.header[0] = MAGIC
+        elif self.header[0] != MAGIC:
+            raise ValueError(f"Shared memory segment {shm.name} is not a price board")
+        self.capacity = int(self.header[1])
+        self.generation = int(self.header[2])
+        self.slots = np.ndarray((self.capacity,), dtype=SLOT_DTYPE, buffer=shm.buf, offset=HEADER_SIZE)
+
+    @classmethod
+    def create(cls, name, capacity):
+        """Create (or replace) the board; only the writer process does this"""
+        try:
+            stale = _attach(name)
+            _retire(stale)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity * SLOT_DTYPE.itemsize)
+        _created_here.add(name)
+        header = np.ndarray((4,), dtype='<u8', buffer=shm.buf)
+        header[1] = capacity
+        header[2] = time.time_ns()
+        del header
+        board = cls(shm, owner=True)
+        board.slots[:] = 0
+        board.heartbeat()
+        return board
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name))
+
+    def heartbeat(self, timestamp=None):
+        """Record that the writer is alive (single writer only)"""
+        self.header[3] = int((timestamp if timestamp is not None else time.time()) * 1000)
+
+    def is_current(self, max_silence):
+        """False once the segment was replaced or closed, or the writer has been silent too long"""
+        return self.header[0] == MAGIC and time.time() * 1000 - int(self.header[3]) <= max_silence * 1000
+
+    def write(self, pair_id, price, timestamp=None):
+        """Publish one price (single writer only)"""
+        if not 0 <= pair_id < self.capacity:
+            return False
+        slot = self.slots[pair_id:pair_id + 1]
+        seq = int(slot['seq'][0])
+        slot['seq'] = seq + 1
+        slot['price'] = float(price)
+        slot['timestamp'] = timestamp if timestamp is not None else time.time()
+        slot['seq'] = seq + 2
+        return True
+
+    def write_many(self, prices, timestamp=None):
+        """Publish a {pair_id: price} snapshot with one shared timestamp"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        written = 0
+        for pair_id, price in prices.items():
+            written += self.write(pair_id, price, timestamp)
+        self.heartbeat(timestamp)
+        return written
+
+    def read(self, pair_id):
+        """
+        Return (price, timestamp, seq) for a pair, or None if never written.
+        Lock-free: retries while a write is in progress.
+        """
+        slots = self.slots
+        if slots is None or not 0 <= pair_id < self.capacity:
+            return None  # Closed (e.g. by a re-attach on another thread) or out of range
+        slot = slots[pair_id:pair_id + 1]
+        for _ in range(READ_RETRIES):
+            before = int(slot['seq'][0])
+            if before & 1:
+                continue
+            price = float(slot['price'][0])
+            timestamp = float(slot['timestamp'][0])
+            if int(slot['seq'][0]) == before:
+                return (price, timestamp, before) if before else None
+        return None
+
+    def close(self):
+        # A writer replaced by a newer one must not unlink its successor's segment
+        unlink = self.owner and self.header[0] == MAGIC
+        if unlink:
+            self.header[0] = 0
+        self.slots = self.header = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A concurrent read still holds a view; the mapping goes with it
+        if unlink:
+            self.shm.unlink()
+        if self.owner:
+            _created_here.discard(self.shm.name)
+
+
+class PriceBoardReader:
+    """
+    Lazily attached per-process handle used by request and executor code.
+    When the attached segment is retired or its writer's heartbeat goes quiet,
+    the name is re-opened so a restarted writer's new segment is picked up.
+    """
+
+    RETRY_ATTACH_SECONDS = 5
+    HEARTBEAT_TIMEOUT_SECONDS = 5
+
+    def __init__(self, name, max_age):
+        self.name = name
+        self.max_age = max_age
+        self._board = None
+        self._next_attach = 0.0
+
+    def _get_board(self):
+        board = self._board
+        if board is not None and board.is_current(self.HEARTBEAT_TIMEOUT_SECONDS):
+            return board
+        if time.monotonic() < self._next_attach:
+            return board
+
+        try:
+            fresh = PriceBoard.attach(self.name)
+        except (FileNotFoundError, ValueError):
+            fresh = None
+        if fresh is None or board is not None and fresh.generation == board.generation:
+            # No writer, or the same segment with a quiet writer: look again later
+            self._next_attach = time.monotonic() + self.RETRY_ATTACH_SECONDS
+            if fresh is not None:
+                fresh.close()
+                return board
+        if board is not None:
+            logger.info(f"Price board {self.name} was replaced or retired; re-attaching")
+            board.close()
+        self._board = fresh
+        return fresh
+
+    def get_price(self, pair_id, max_age=None):
+        """Latest price for a pair if the board has a fresh one, else None"""
+        board = self._get_board()
+        if board is None:
+            return None
+        entry = board.read(pair_id)
+        if entry is None:
+            return None
+        price, timestamp, _ = entry
+        if time.time() - timestamp > (max_age if max_age is not None else self.max_age):
+            return None
+        return price
+
+
+# Singleton instance
+price_board = PriceBoardReader(
+    name=getattr(settings, 'PRICE_BOARD_NAME', 'tradepro_price_board'),
+    max_age=getattr(settings, 'PRICE_BOARD_MAX_AGE_SECONDS', 5),
+)
@@ -0,0 +1,242 @@
+"""
+Price Feed
+Public ticker prices fetched with a per-call latency budget, hedged across the
+Binance API hosts, guarded by per-host circuit breakers, with an explicit
+stale-price policy instead of made-up prices when every host fails
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from decimal import Decimal
+from django.conf import settings
+import requests
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOSTS = (
+    'https://api.binance.com',
+    'https://api1.binance.com',
+    'https://api2.binance.com',
+    'https://api3.binance.com',
+)
+TICKER_PATH = '/api/v3/ticker/price'
+
+
+class PriceUnavailable(ValueError):
+    """No fresh price within the latency budget and no acceptable stale one"""
+
+
+class _Rejected(Exception):
+    """Upstream answered but refused the request (e.g. unknown symbol); not worth hedging"""
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` consecutive failures, then open (calls
+    refused) for `reset_seconds`. After that one probe is let through
+    (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 15):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class PriceFeed:
+    """
+    Hedged GETs: the first healthy host is asked immediately and, if it has not
+    answered within `hedge_delay` (or failed), the next healthy host is asked
+    too. The first good answer wins; the whole call never exceeds `budget`.
+    Hosts whose breaker is open are skipped, so a dead upstream costs nothing.
+    """
+
+    def __init__(self, hosts=DEFAULT_HOSTS, budget: float = 2.0, hedge_delay: float = 0.25,
+                 stale_max_age: float = 10, failure_threshold: int = 5, reset_seconds: float = 15):
+        self.hosts = tuple(host.rstrip('/') for host in hosts)
+        self.budget = budget
+        self.hedge_delay = hedge_delay
+        self.stale_max_age = stale_max_age
+        self.breakers = {host: CircuitBreaker(failure_threshold, reset_seconds) for host in self.hosts}
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.hosts), thread_name_prefix='price-feed')
+        self._local = threading.local()
+        self._last = {}  # symbol -> (Decimal price, epoch seconds fetched)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            hosts=getattr(settings, 'PRICE_FEED_HOSTS', None) or DEFAULT_HOSTS,
+            budget=getattr(settings, 'PRICE_FETCH_BUDGET_MS', 2000) / 1000,
+            hedge_delay=getattr(settings, 'PRICE_HEDGE_DELAY_MS', 250) / 1000,
+            stale_max_age=getattr(settings, 'PRICE_STALE_MAX_AGE_SECONDS', 10),
+            failure_threshold=getattr(settings, 'PRICE_BREAKER_FAILURES', 5),
+            reset_seconds=getattr(settings, 'PRICE_BREAKER_RESET_SECONDS', 15),
+        )
+
+    def _session(self):
+        # requests.Session is not thread-safe; keep one warm session per pool thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _get(self, host, path, params, deadline):
+        breaker = self.breakers[host]
+        timeout = max(0.05, deadline - time.monotonic())
+        try:
+            response = self._session().get(f"{host}{path}", params=params, timeout=timeout)
+        except Exception:
+            breaker.record_failure()
+            raise
+        if 400 <= response.status_code < 500 and response.status_code not in (418, 429):
+            breaker.record_success()
+            raise _Rejected(f"{response.status_code} {response.text[:200]}")
+        try:
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return data
+
+    def _next_host(self, candidates):
+        """
+        Pop candidates until one's breaker admits a call. allow() is only asked
+        for a host about to be launched, since for a half-open host it claims
+        the single probe slot, which only the probe's outcome releases.
+        """
+        while candidates:
+            host = candidates.pop(0)
+            if self.breakers[host].allow():
+                return host
+        return None
+
+    def fetch(self, path, params=None):
+        """Hedged GET returning the decoded JSON of the first successful host"""
+        started = time.monotonic()
+        deadline = started + self.budget
+        candidates = list(self.hosts)
+        host = self._next_host(candidates)
+        if host is None:
+            raise PriceUnavailable("Circuit open for every price host")
+
+        pending = {}
+        errors = []
+        next_launch = started
+        while True:
+            now = time.monotonic()
+            if host is None and candidates and (now >= next_launch or not pending):
+                host = self._next_host(candidates)
+            if host is not None and (now >= next_launch or not pending):
+                pending[self._executor.submit(self._get, host, path, params, deadline)] = host
+                next_launch = now + self.hedge_delay
+                if len(pending) > 1:
+                    logger.debug(f"Hedging {path} to {host}")
+                host = None
+
+            remaining = deadline - now
+            if remaining <= 0 or not pending:
+                break
+            timeout = min(remaining, max(0, next_launch - now)) if candidates else remaining
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished = pending.pop(future)
+                try:
+                    return future.result()
+                except _Rejected as e:
+                    raise PriceUnavailable(f"{finished}{path} rejected: {e}")
+                except Exception as e:
+                    errors.append(f"{finished}: {e}")
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        if pending:
+            errors.extend(f"{pending_host}: no answer" for pending_host in pending.values())
+        if not errors:
+            errors.append('circuit open for every remaining host')
+        raise PriceUnavailable(f"No price host answered {path} within {elapsed_ms:.0f}ms ({'; '.join(errors)})")
+
+    def _remember(self, prices):
+        fetched_at = time.time()
+        for symbol, price in prices.items():
+            self._last[symbol] = (price, fetched_at)
+
+    def stale_price(self, symbol):
+        """Last fetched price if it is still within the stale-price policy, else None"""
+        last = self._last.get(symbol)
+        if last is None or time.time() - last[1] > self.stale_max_age:
+            return None
+        return last[0]
+
+    def get_price(self, symbol):
+        """
+        Fresh price for one symbol, or the last fetched one when upstream is
+        failing and it is at most stale_max_age old. Raises PriceUnavailable.
+        """
+        try:
+            data = self.fetch(TICKER_PATH, {'symbol': symbol})
+            price = Decimal(str(data['price']))
+        except PriceUnavailable as e:
+            price = self.stale_price(symbol)
+            if price is None:
+                raise PriceUnavailable(f"No price for {symbol}: {e}")
+            logger.warning(f"Serving stale price for {symbol} ({e})")
+            return price
+        self._remember({symbol: price})
+        return price
+
+    def get_prices(self, symbols=None):
+        """
+        Fresh prices for many symbols from one ticker request (all symbols when
+        None). Never substitutes stale values; raises PriceUnavailable.
+        """
+        wanted = set(symbols) if symbols is not None else None
+        data = self.fetch(TICKER_PATH)
+        prices = {
+            ticker['symbol']: Decimal(str(ticker['price']))
+            for ticker in data if wanted is None or ticker['symbol'] in wanted
+        }
+        self._remember(prices)
+        return prices
+
+    def status(self):
+        """Breaker state per host, for diagnostics"""
+        return {host: breaker.state for host, breaker in self.breakers.items()}
+
+
+# Singleton instance
+price_feed = PriceFeed.from_settings()
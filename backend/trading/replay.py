@@ -0,0 +1,412 @@
+"""
+Strategy Record / Replay
+Tapes of every price observation and scheduling decision made by the strategy
+executor, and deterministic replays of them on a virtual clock
+"""
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import dj_database_url
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.utils import load_backend
+from django.db.models import Max, Min
+from .models import TradingPair, TradingStrategy, UserSettings, PaperTradingPosition, Order
+from .price_feed import PriceUnavailable
+from .strategy_executor import StrategyExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+TAPE_VERSION = 1
+
+# Strategy fields restored verbatim before a replay
+STRATEGY_FIELDS = (
+    'name', 'strategy_type', 'amount', 'stop_loss_percentage', 'take_profit_percentage',
+    'custom_config', 'execution_interval', 'next_execution_at', 'total_executions',
+)
+
+
+def _ms(at):
+    return int(at.timestamp() * 1000)
+
+
+def _datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return _ms(value)
+    return value
+
+
+def _same_database(first, second):
+    """Whether two connection settings dicts point at the same database"""
+    def target(settings_dict):
+        name = settings_dict.get('NAME')
+        if 'sqlite3' in settings_dict['ENGINE'] and name and str(name) != ':memory:':
+            name = os.path.realpath(name)
+        return settings_dict['ENGINE'], str(name), settings_dict.get('HOST') or '', str(settings_dict.get('PORT') or '')
+    return target(first) == target(second)
+
+
+@contextmanager
+def scratch_database(url):
+    """
+    Point the default connection at a scratch database for the duration of a
+    replay, migrating it first. `url` is a database URL or a SQLite file
+    path. Replays rewrite strategies, balances and positions, so the live
+    database is refused.
+    """
+    settings_dict = dj_database_url.parse(url) if '://' in url else {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': url,
+    }
+    settings_dict = connections.configure_settings({DEFAULT_DB_ALIAS: settings_dict})[DEFAULT_DB_ALIAS]
+    live = connections[DEFAULT_DB_ALIAS]
+    if _same_database(settings_dict, live.settings_dict):
+        raise ValueError('Refusing to replay against the live database; give a separate scratch database')
+
+    scratch = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+    connections[DEFAULT_DB_ALIAS] = scratch
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield scratch
+    finally:
+        scratch.close()
+        connections[DEFAULT_DB_ALIAS] = live
+
+
+def capture_state():
+    """Everything the executor reads from the database: active strategies, their users' cash and positions"""
+    strategies = list(TradingStrategy.objects.filter(is_active=True).select_related('trading_pair').order_by('id'))
+    user_ids = sorted({strategy.user_id for strategy in strategies})
+    positions = PaperTradingPosition.objects.filter(user_id__in=user_ids).select_related('trading_pair')
+    pairs = {strategy.trading_pair for strategy in strategies} | {position.trading_pair for position in positions}
+    return {
+        'pairs': [
+            {'symbol': pair.symbol, 'base_asset': pair.base_asset, 'quote_asset': pair.quote_asset}
+            for pair in sorted(pairs, key=lambda pair: pair.symbol)
+        ],
+        'strategies': [
+            {
+                'id': strategy.id,
+                'user_id': strategy.user_id,
+                'symbol': strategy.trading_pair.symbol,
+                **{field: _encode(getattr(strategy, field)) for field in STRATEGY_FIELDS},
+            }
+            for strategy in strategies
+        ],
+        'balances': {
+            str(user_id): str(balance)
+            for user_id, balance in UserSettings.objects.filter(user_id__in=user_ids).values_list(
+                'user_id', 'paper_balance_usdt'
+            )
+        },
+        'positions': [
+            {
+                'user_id': position.user_id,
+                'symbol': position.trading_pair.symbol,
+                'amount': str(position.amount),
+                'average_buy_price': str(position.average_buy_price),
+                'total_invested': str(position.total_invested),
+            }
+            for position in positions if position.amount > 0
+        ],
+    }
+
+
+def restore_state(state):
+    """
+    Make the database match a captured state: only the recorded strategies
+    are active, with their recorded schedule, cash and positions. Users and
+    pairs missing from this database are created.
+    """
+    pairs = {}
+    for pair in state['pairs']:
+        pairs[pair['symbol']], _ = TradingPair.objects.get_or_create(
+            symbol=pair['symbol'], defaults={'base_asset': pair['base_asset'], 'quote_asset': pair['quote_asset']}
+        )
+    user_ids = {strategy['user_id'] for strategy in state['strategies']}
+    for user_id in user_ids:
+        User.objects.get_or_create(id=user_id, defaults={'username': f'replay-{user_id}'})
+
+    TradingStrategy.objects.filter(is_active=True).update(is_active=False)
+    for strategy in state['strategies']:
+        fields = {field: strategy[field] for field in STRATEGY_FIELDS}
+        if fields['next_execution_at'] is not None:
+            fields['next_execution_at'] = _datetime(fields['next_execution_at'])
+        TradingStrategy.objects.update_or_create(
+            id=strategy['id'],
+            defaults={**fields, 'user_id': strategy['user_id'], 'trading_pair': pairs[strategy['symbol']], 'is_active': True},
+        )
+
+    for user_id in user_ids:
+        UserSettings.objects.update_or_create(
+            user_id=user_id, defaults={'paper_balance_usdt': Decimal(state['balances'].get(str(user_id), '10000'))}
+        )
+    PaperTradingPosition.objects.filter(user_id__in=user_ids).delete()
+    PaperTradingPosition.objects.bulk_create([
+        PaperTradingPosition(
+            user_id=position['user_id'],
+            trading_pair=pairs[position['symbol']],
+            amount=Decimal(position['amount']),
+            average_buy_price=Decimal(position['average_buy_price']),
+            total_invested=Decimal(position['total_invested']),
+        )
+        for position in state['positions']
+    ])
+
+
+def capture_books(user_ids):
+    """Cash and positions of the given users: {user_id: [cash, {symbol: [amount, average_buy_price, total_invested]}]}"""
+    books = {
+        str(user_id): [str(cash), {}]
+        for user_id, cash in UserSettings.objects.filter(user_id__in=user_ids).values_list('user_id', 'paper_balance_usdt')
+    }
+    positions = PaperTradingPosition.objects.filter(user_id__in=user_ids, amount__gt=0).values_list(
+        'user_id', 'trading_pair__symbol', 'amount', 'average_buy_price', 'total_invested'
+    )
+    for user_id, symbol, amount, average_buy_price, total_invested in positions:
+        books.setdefault(str(user_id), [None, {}])[1][symbol] = [str(amount), str(average_buy_price), str(total_invested)]
+    return books
+
+
+def _same_book(first, second):
+    def values(book):
+        cash, positions = book
+        return (
+            Decimal(cash) if cash is not None else None,
+            {symbol: tuple(Decimal(value) for value in position) for symbol, position in positions.items()},
+        )
+    return values(first) == values(second)
+
+
+def restore_book(user_id, book):
+    """Set one user's cash and positions to a recorded book"""
+    cash, positions = book
+    if cash is not None:
+        UserSettings.objects.filter(user_id=user_id).update(paper_balance_usdt=Decimal(cash))
+    PaperTradingPosition.objects.filter(user_id=user_id).exclude(trading_pair__symbol__in=list(positions)).delete()
+    for symbol, (amount, average_buy_price, total_invested) in positions.items():
+        pair, _ = TradingPair.objects.get_or_create(symbol=symbol)
+        PaperTradingPosition.objects.update_or_create(
+            user_id=user_id, trading_pair=pair,
+            defaults={
+                'amount': Decimal(amount),
+                'average_buy_price': Decimal(average_buy_price),
+                'total_invested': Decimal(total_invested),
+            },
+        )
+
+
+class TapeRecorder:
+    """
+    Writes a gzip JSON-lines tape: a header with the captured state, then one
+    line per executor tick {"t": epoch ms, "due": [strategy ids], "obs":
+    [[kind, key, value, error], ...], "books": {user id: [cash, positions]},
+    "live": [strategy ids]} with observations in the order the executor asked.
+    Live lists the strategies dispatched to the exchange, whose fills are not
+    recorded; replays skip them. Books hold the due
+    strategies' users' cash and positions as the tick found them: the
+    executor is not the only writer (run_risk_monitor's stop-loss and
+    take-profit exits, live-engine strategies, manual orders), and those
+    writes are not observations the replay can repeat.
+    Each tick is flushed, so an interrupted recording is still replayable.
+    """
+    replaying = False
+
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'version': TAPE_VERSION, 'recorded_at': int(time.time() * 1000), 'state': capture_state()})
+        self.tick = None
+        self.ticks = 0
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def begin_tick(self, now, due_ids, user_ids=()):
+        self.tick = {'t': _ms(now), 'due': due_ids, 'obs': []}
+        if user_ids:
+            self.tick['books'] = capture_books(user_ids)
+
+    def observe(self, kind, key, fetch):
+        """Call fetch() and record its result (or PriceUnavailable) under (kind, key)"""
+        try:
+            value = fetch()
+        except PriceUnavailable as e:
+            self.tick['obs'].append([kind, key, None, str(e)])
+            raise
+        self.tick['obs'].append([kind, key, _encode(value), None])
+        return value
+
+    def trade_live(self, strategy_id):
+        """Note a strategy dispatched to the exchange this tick"""
+        self.tick.setdefault('live', []).append(strategy_id)
+
+    def end_tick(self):
+        if not self.tick['obs']:
+            del self.tick['obs']
+        self._write(self.tick)
+        self.file.flush()
+        self.tick = None
+        self.ticks += 1
+
+    def close(self):
+        self.file.close()
+
+
+class TapePlayer:
+    """
+    Replays a tape through a StrategyExecutor whose clock is set to each
+    recorded tick. Prices, order book fills and klines come from the tape,
+    matched by (kind, key) within the tick; anything the executor asks for
+    that was not recorded counts as a miss and is treated as unavailable.
+    A user whose cash or positions differ from the tick's recorded book was
+    changed outside the executor (risk-monitor exits, live or manual orders);
+    the difference is reported as a divergence and the recorded book restored
+    before the tick runs, so later ticks see what the recording saw.
+    Ticks before the earliest next_execution_at are skipped without touching
+    the database, which is where replays get their speed.
+    """
+    replaying = True
+
+    def __init__(self, path):
+        self.path = path
+        self.now = None
+        self.tick = None
+        self.mismatches = []
+        self.divergences = []
+        self.misses = 0
+        self.live_skipped = 0
+
+    def records(self):
+        """(header, tick iterator); a truncated tape ends at its last complete tick"""
+        file = gzip.open(self.path, 'rt', encoding='utf-8')
+        header = json.loads(file.readline())
+        if header.get('version') != TAPE_VERSION:
+            file.close()
+            raise ValueError(f"Unsupported tape version: {header.get('version')}")
+
+        def ticks():
+            with file:
+                try:
+                    for line in file:
+                        yield json.loads(line)
+                except (EOFError, json.JSONDecodeError):
+                    logger.warning(f"Tape {self.path} is truncated; replaying up to the last complete tick")
+        return header, ticks()
+
+    def clock(self):
+        return self.now
+
+    def begin_tick(self, now, due_ids, user_ids=()):
+        if due_ids != self.tick['due']:
+            self.mismatches.append({'t': self.tick['t'], 'recorded': self.tick['due'], 'replayed': due_ids})
+            logger.warning(f"Scheduling diverged at {now.isoformat()}: recorded {self.tick['due']}, replayed {due_ids}")
+
+        recorded = self.tick.get('books', {})
+        replayed = capture_books([int(user_id) for user_id in recorded])
+        for user_id, book in recorded.items():
+            if user_id in replayed and _same_book(book, replayed[user_id]):
+                continue
+            self.divergences.append({
+                't': self.tick['t'], 'user_id': int(user_id), 'recorded': book, 'replayed': replayed.get(user_id),
+            })
+            logger.warning(f"User {user_id}'s cash or positions changed outside the executor before {now.isoformat()}")
+            restore_book(int(user_id), book)
+
+    def observe(self, kind, key, fetch):
+        for i, (obs_kind, obs_key, value, error) in enumerate(self.tick['obs']):
+            if obs_kind == kind and obs_key == key:
+                del self.tick['obs'][i]
+                if error is not None:
+                    raise PriceUnavailable(error)
+                if value is None or kind == 'klines':
+                    return value
+                return Decimal(value)
+        self.misses += 1
+        raise PriceUnavailable(f"{kind} {key} is not on the tape at {self.now.isoformat()}")
+
+    def traded_live(self, strategy_id):
+        """Whether the strategy traded on the exchange at this tick when recorded"""
+        if strategy_id in self.tick.get('live', ()):
+            self.live_skipped += 1
+            return True
+        return False
+
+    def end_tick(self):
+        pass
+
+    def _next_due(self):
+        """Earliest time any active strategy can be due (None when nothing is scheduled)"""
+        if TradingStrategy.objects.filter(is_active=True, next_execution_at__isnull=True).exists():
+            return datetime.min.replace(tzinfo=dt_timezone.utc)
+        return TradingStrategy.objects.filter(is_active=True).aggregate(at=Min('next_execution_at'))['at']
+
+    def play(self, commit=False):
+        """
+        Replay the tape against the recorded starting state on the current
+        default connection, which must be a scratch database (see
+        scratch_database). Everything runs in one transaction that is rolled
+        back unless `commit`; the orders placed are returned in placement
+        order with their virtual fill times.
+        """
+        if _same_database(connections[DEFAULT_DB_ALIAS].settings_dict, settings.DATABASES[DEFAULT_DB_ALIAS]):
+            raise ValueError('Refusing to replay against the live database; use scratch_database()')
+        header, ticks = self.records()
+        executor = StrategyExecutor(clock=self.clock, tape=self)
+        started = time.monotonic()
+        count = executed = 0
+
+        with transaction.atomic():
+            restore_state(header['state'])
+            first_order_id = Order.objects.aggregate(id=Max('id'))['id'] or 0
+            next_due = self._next_due()
+            for tick in ticks:
+                count += 1
+                tick.setdefault('obs', [])
+                self.tick = tick
+                self.now = _datetime(tick['t'])
+                if not tick['due'] and (next_due is None or self.now < next_due):
+                    continue  # Nothing can be due: the executor would find no strategies
+                executed += executor.execute_pending_strategies()
+                next_due = self._next_due()
+
+            orders = [
+                {
+                    'filled_at': order['filled_at'].isoformat(),
+                    'user_id': order['user_id'],
+                    'symbol': order['trading_pair__symbol'],
+                    'side': order['order_side'],
+                    'amount': str(order['amount']),
+                    'filled_price': str(order['filled_price']),
+                }
+                for order in Order.objects.filter(id__gt=first_order_id).order_by('id').values(
+                    'filled_at', 'user_id', 'trading_pair__symbol', 'order_side', 'amount', 'filled_price'
+                )
+            ]
+            if not commit:
+                transaction.set_rollback(True)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Replayed {count} ticks ({executed} executions, {len(orders)} orders) in {elapsed:.2f}s")
+        return {
+            'ticks': count,
+            'executions': executed,
+            'orders': orders,
+            'mismatches': self.mismatches,
+            'divergences': self.divergences,
+            'misses': self.misses,
+            'live_skipped': self.live_skipped,
+            'seconds': round(elapsed, 3),
+        }
@@ -0,0 +1,125 @@
+"""
+Versioned Response Cache
+Conditional GET (ETag / Last-Modified) and an in-process cache of rendered
+bytes for reference-data list endpoints, versioned from the database
+"""
+import functools
+import hashlib
+import threading
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from .models import TradingPair, TradingStrategy
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHED_FORMATS = ('json',)
+
+# Tables each namespace's response is rendered from (strategies embed the pair symbol)
+NAMESPACE_MODELS = {
+    'pairs': (TradingPair,),
+    'strategies': (TradingStrategy, TradingPair),
+}
+
+
+class VersionedResponseCache:
+    """
+    A namespace's version is read from the tables behind it: the newest
+    updated_at plus the row count of each. Every writer - another worker,
+    run_strategies, sync_pairs' bulk upsert - moves one of those, so no
+    shared cache or signal is needed for workers to agree. Rendered bytes
+    live in process memory keyed by request and are only served while their
+    version is current; a conditional request whose ETag still matches gets
+    a 304.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = {}  # (namespace, request key) -> (version, content type, body)
+        self._lock = threading.Lock()
+
+    def get_version(self, namespace):
+        """(version token, last-modified epoch seconds) for a namespace, one query per table"""
+        parts = []
+        last_modified = 0
+        for model in NAMESPACE_MODELS[namespace]:
+            stamp = model.objects.aggregate(modified=Max('updated_at'), rows=Count('pk'))
+            modified = stamp['modified'].timestamp() if stamp['modified'] else 0
+            parts.append(f"{model._meta.label}:{modified}:{stamp['rows']}")
+            last_modified = max(last_modified, int(modified))
+        return hashlib.md5('|'.join(parts).encode()).hexdigest(), last_modified
+
+    def get(self, namespace, request_key, version):
+        entry = self._entries.get((namespace, request_key))
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1], entry[2]
+
+    def store(self, namespace, request_key, version, content_type, body):
+        with self._lock:
+            self._entries.pop((namespace, request_key), None)
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[(namespace, request_key)] = (version, content_type, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance
+response_cache = VersionedResponseCache()
+
+
+def _not_modified(request, etag):
+    # Deleting the newest row moves Last-Modified backwards, so a bare
+    # If-Modified-Since cannot prove freshness; only the ETag is trusted
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is None:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+def versioned_response(namespace):
+    """
+    Serve a read-only DRF view method with ETag/Last-Modified validation and
+    cached rendered bytes for `namespace`. Only JSON responses are cached; the
+    browsable API is always rendered fresh.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            renderer_format = getattr(request.accepted_renderer, 'format', None)
+            if renderer_format not in CACHED_FORMATS:
+                return view_method(self, request, *args, **kwargs)
+
+            version, last_modified = response_cache.get_version(namespace)
+            request_key = f"{renderer_format}:{request.get_full_path()}"
+            digest = hashlib.md5(f"{version}:{request_key}".encode()).hexdigest()
+            etag = f'"{digest}"'
+            headers = {'ETag': etag, 'Last-Modified': http_date(last_modified)}
+
+            if _not_modified(request, etag):
+                response = HttpResponseNotModified(headers=headers)
+            else:
+                cached = response_cache.get(namespace, request_key, version)
+                if cached is not None:
+                    response = HttpResponse(cached[1], content_type=cached[0], headers=headers)
+                else:
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    # Render inside the view so the bytes can be kept for later requests
+                    response = self.finalize_response(request, response, *args, **kwargs)
+                    response.render()
+                    response_cache.store(namespace, request_key, version, response['Content-Type'], response.content)
+                    for header, value in headers.items():
+                        response[header] = value
+
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapper
+    return decorator
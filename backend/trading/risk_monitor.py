@@ -0,0 +1,161 @@
+"""
+Risk Monitor Service
+Continuously enforces stop loss / take profit on positions held by active strategies
+"""
+import time
+import numpy as np
+from decimal import Decimal
+from django.db import transaction
+from .models import TradingStrategy, PaperTradingPosition
+from .paper_trading_service import PaperTradingService, SIMULATED_SYMBOLS
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _SymbolBook:
+    """Threshold arrays for every monitored position on one symbol"""
+
+    __slots__ = ('position_ids', 'stop_prices', 'take_profit_prices', 'strategies')
+
+    def __init__(self, position_ids, stop_prices, take_profit_prices, strategies):
+        self.position_ids = np.asarray(position_ids, dtype=np.int64)
+        self.stop_prices = np.asarray(stop_prices, dtype=np.float64)
+        self.take_profit_prices = np.asarray(take_profit_prices, dtype=np.float64)
+        self.strategies = strategies  # parallel list of TradingStrategy
+
+    def disarm(self, index):
+        """Stop monitoring a position once its exit has been sent"""
+        self.stop_prices[index] = -np.inf
+        self.take_profit_prices[index] = np.inf
+
+
+class RiskMonitor:
+    """
+    Checks every open position linked to an active strategy against current prices.
+
+    Stop loss / take profit prices are precomputed from each position's average
+    buy price and kept in NumPy arrays per symbol, so a tick is one vectorized
+    comparison per symbol followed by a batch of exit orders for the hits.
+    Simulated symbols (commodities priced with random jitter) are not
+    monitored, since a random number must never fire an exit.
+    """
+
+    def __init__(self, reload_interval: float = 10):
+        self.paper_trading = PaperTradingService()
+        self.reload_interval = reload_interval
+        self.books = {}  # symbol -> _SymbolBook
+        self.loaded_at = None
+
+    def load(self):
+        """Rebuild threshold arrays from open positions and active strategies"""
+        # When several active strategies share a position, the tightest thresholds win
+        thresholds = {}
+        strategies = TradingStrategy.objects.filter(is_active=True).exclude(
+            trading_pair__symbol__in=SIMULATED_SYMBOLS
+        ).select_related('trading_pair', 'user')
+        for strategy in strategies:
+            key = (strategy.user_id, strategy.trading_pair_id)
+            stop_pct = strategy.stop_loss_percentage / 100
+            take_pct = strategy.take_profit_percentage / 100
+            current = thresholds.get(key)
+            if current is None:
+                thresholds[key] = [strategy, stop_pct, take_pct]
+            else:
+                current[1] = min(current[1], stop_pct)
+                current[2] = min(current[2], take_pct)
+
+        columns = {}
+        positions = PaperTradingPosition.objects.filter(amount__gt=0).values_list(
+            'id', 'user_id', 'trading_pair_id', 'average_buy_price'
+        )
+        for position_id, user_id, pair_id, buy_price in positions:
+            entry = thresholds.get((user_id, pair_id))
+            if entry is None:
+                continue
+            strategy, stop_pct, take_pct = entry
+            column = columns.setdefault(strategy.trading_pair.symbol, ([], [], [], []))
+            column[0].append(position_id)
+            column[1].append(float(buy_price * (1 - stop_pct)))
+            column[2].append(float(buy_price * (1 + take_pct)))
+            column[3].append(strategy)
+
+        self.books = {symbol: _SymbolBook(*column) for symbol, column in columns.items()}
+        self.loaded_at = time.monotonic()
+        return sum(len(book.strategies) for book in self.books.values())
+
+    def find_triggers(self, prices):
+        """
+        Vectorized threshold check.
+        Returns a list of (symbol, index, kind) for positions that must be exited.
+        """
+        triggers = []
+        for symbol, book in self.books.items():
+            price = prices.get(symbol)
+            if not price:
+                continue
+            price = float(price)
+
+            stop_hits = book.stop_prices >= price
+            take_hits = book.take_profit_prices <= price
+            for index in np.flatnonzero(stop_hits):
+                triggers.append((symbol, int(index), 'stop_loss'))
+            for index in np.flatnonzero(take_hits & ~stop_hits):
+                triggers.append((symbol, int(index), 'take_profit'))
+        return triggers
+
+    def execute_exits(self, triggers, prices):
+        """
+        Send market sells for every triggered position at the tick's price snapshot.
+        Each position row is locked and re-read before selling, so an exit already
+        made by run_strategies (or an earlier tick) is not sold a second time.
+        """
+        exited = 0
+        for symbol, index, kind in triggers:
+            book = self.books[symbol]
+            book.disarm(index)
+            position_id = int(book.position_ids[index])
+            strategy = book.strategies[index]
+
+            try:
+                with transaction.atomic():
+                    position = PaperTradingPosition.objects.select_for_update().filter(pk=position_id).first()
+                    if position is None or position.amount <= 0:
+                        continue
+                    self.paper_trading.execute_market_sell(
+                        user=strategy.user,
+                        trading_pair=strategy.trading_pair,
+                        amount=position.amount,
+                        price=Decimal(str(prices[symbol]))
+                    )
+                exited += 1
+                logger.info(
+                    f"{kind.replace('_', ' ').title()} executed: Sold {position.amount} "
+                    f"{strategy.trading_pair.base_asset} @ {prices[symbol]} "
+                    f"(bought @ {position.average_buy_price})"
+                )
+            except Exception as e:
+                logger.error(f"Error executing {kind} for position {position_id}: {e}")
+
+        return exited
+
+    def run_once(self):
+        """One monitoring tick: reload if due, price every monitored symbol once, exit hits"""
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.reload_interval:
+            self.load()
+
+        if not self.books:
+            return 0
+
+        prices = self.paper_trading.get_all_prices(self.books.keys())
+        triggers = self.find_triggers(prices)
+        exited = self.execute_exits(triggers, prices)
+
+        if exited:
+            # Positions changed, rebuild thresholds on the next tick
+            self.loaded_at = None
+        return exited
+
+
+# Singleton instance
+risk_monitor = RiskMonitor()
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import TradingPair, TradingStrategy, Order, TradeHistory, UserSettings, PriceAlert
+from .custom_strategy import validate_custom_config
 
 
 class TradingPairSerializer(serializers.ModelSerializer):
@@ -17,6 +18,13 @@ class TradingStrategySerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('user', 'created_at', 'updated_at')
 
+    def validate_custom_config(self, value):
+        try:
+            validate_custom_config(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
 
 class OrderSerializer(serializers.ModelSerializer):
     trading_pair_symbol = serializers.CharField(source='trading_pair.symbol', read_only=True)
@@ -0,0 +1,51 @@
+"""
+Model signal handlers for the trading app
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import TradingStrategy, UserSettings, PaperTradingPosition, Order
+from .engine_pool import engine_pool
+from .portfolio_valuation import portfolio_valuator
+from .dashboard import invalidate_dashboard
+from trading_backend.db_router import mark_primary_sticky
+
+
+@receiver(post_save, sender=UserSettings)
+def sync_user_settings(sender, instance, **kwargs):
+    """Keep pooled trading engines in sync; settings carry the cash balance shown on the dashboard"""
+    engine_pool.refresh_settings(instance)
+    transaction.on_commit(lambda: invalidate_dashboard(instance.user_id))
+
+
+@receiver(post_delete, sender=UserSettings)
+def drop_user_settings(sender, instance, **kwargs):
+    """Drop cached per-user state when a user's settings are removed"""
+    engine_pool.invalidate(instance.user_id)
+    portfolio_valuator.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=PaperTradingPosition)
+def invalidate_position_dashboard(sender, instance, **kwargs):
+    """Valuation state sees the fill through its database change marker; the dashboard cache does not"""
+    transaction.on_commit(lambda: invalidate_dashboard(instance.user_id))
+
+
+@receiver(post_delete, sender=PaperTradingPosition)
+def drop_position(sender, instance, **kwargs):
+    """Reload the user's valuation state after a position is deleted"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: portfolio_valuator.invalidate(user_id))
+
+
+@receiver(post_save, sender=Order)
+def pin_reads_to_primary(sender, instance, **kwargs):
+    """Read-your-writes: keep the user's analytics reads on the primary after an order"""
+    mark_primary_sticky(instance.user_id)
+    transaction.on_commit(lambda: invalidate_dashboard(instance.user_id))
+
+
+@receiver(post_save, sender=TradingStrategy)
+@receiver(post_delete, sender=TradingStrategy)
+def invalidate_strategy_dashboard(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_dashboard(instance.user_id))
@@ -0,0 +1,136 @@
+"""
+Strategy Simulation
+Bar-by-bar DCA backtests (one path, or many paths vectorized) and the
+process-pool worker side of the optimizer.
+Kept free of Django imports so spawned workers start quickly.
+"""
+from multiprocessing import shared_memory
+import numpy as np
+
+# Set in each worker by init_worker: a read-only view of the parent's shared price array
+_prices = None
+_shm = None
+
+
+def simulate_dca(prices, step, amount, stop_loss_percentage, take_profit_percentage, initial_cash):
+    """
+    Replay the live DCA strategy over closes: buy `amount` every `step` bars
+    (when cash allows), and sell the whole position at any bar whose close
+    crosses the stop loss or take profit around the average buy price, as the
+    executor and risk monitor do.
+    """
+    stop_multiplier = 1 - stop_loss_percentage / 100
+    take_multiplier = 1 + take_profit_percentage / 100
+    cash = initial_cash
+    quantity = cost = 0.0
+    trades = 0
+    equity = peak = initial_cash
+    max_drawdown = 0.0
+
+    for i, price in enumerate(prices):
+        if i % step == 0 and cash >= amount * price:
+            cash -= amount * price
+            quantity += amount
+            cost += amount * price
+            trades += 1
+        if quantity > 0:
+            average = cost / quantity
+            if price <= average * stop_multiplier or price >= average * take_multiplier:
+                cash += quantity * price
+                quantity = cost = 0.0
+                trades += 1
+        equity = cash + quantity * price
+        if equity > peak:
+            peak = equity
+        elif peak > 0 and (peak - equity) / peak > max_drawdown:
+            max_drawdown = (peak - equity) / peak
+
+    return {
+        'return_pct': round((equity / initial_cash - 1) * 100, 6),
+        'max_drawdown_pct': round(max_drawdown * 100, 6),
+        'trades': trades,
+    }
+
+
+def simulate_dca_paths(price_blocks, n_paths, step, amount, stop_loss_percentage, take_profit_percentage, initial_cash):
+    """
+    simulate_dca across many price paths at once. `price_blocks` yields
+    (n_paths, k) matrices of consecutive closes; each time step is a handful
+    of vector operations over all paths, so memory stays at one block.
+    Returns per-path arrays: return_pct, max_drawdown_pct, stop_outs, take_profits, buys.
+    """
+    stop_multiplier = 1 - stop_loss_percentage / 100
+    take_multiplier = 1 + take_profit_percentage / 100
+    cash = np.full(n_paths, float(initial_cash))
+    quantity = np.zeros(n_paths)
+    cost = np.zeros(n_paths)
+    peak = cash.copy()
+    equity = cash.copy()
+    max_drawdown = np.zeros(n_paths)
+    stop_outs = np.zeros(n_paths, dtype=np.int64)
+    take_profits = np.zeros(n_paths, dtype=np.int64)
+    buys = np.zeros(n_paths, dtype=np.int64)
+    average = np.empty(n_paths)
+    drawdown = np.empty(n_paths)
+
+    t = 0
+    for block in price_blocks:
+        for price in block.T:
+            if t % step == 0:
+                can_buy = cash >= amount * price
+                spend = np.where(can_buy, amount * price, 0.0)
+                cash -= spend
+                cost += spend
+                quantity += np.where(can_buy, amount, 0.0)
+                buys += can_buy
+            held = quantity > 0
+            np.divide(cost, quantity, out=average, where=held)
+            stopped = held & (price <= average * stop_multiplier)
+            took = held & ~stopped & (price >= average * take_multiplier)
+            exited = stopped | took
+            if exited.any():
+                cash += np.where(exited, quantity * price, 0.0)
+                quantity[exited] = 0.0
+                cost[exited] = 0.0
+                stop_outs += stopped
+                take_profits += took
+            np.multiply(quantity, price, out=equity)
+            equity += cash
+            np.maximum(peak, equity, out=peak)
+            np.subtract(peak, equity, out=drawdown)
+            drawdown /= peak
+            np.maximum(max_drawdown, drawdown, out=max_drawdown)
+            t += 1
+
+    return {
+        'return_pct': (equity / initial_cash - 1) * 100,
+        'max_drawdown_pct': max_drawdown * 100,
+        'stop_outs': stop_outs,
+        'take_profits': take_profits,
+        'buys': buys,
+    }
+
+
+def init_worker(shm_name, length):
+    """Pool initializer: attach to the shared closes array without copying it"""
+    global _prices, _shm
+    try:
+        _shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        # Python < 3.13: spawned workers share the parent's resource tracker, so
+        # this re-registration is a no-op and the parent's unlink still owns cleanup
+        _shm = shared_memory.SharedMemory(name=shm_name)
+    _prices = np.ndarray((length,), dtype=np.float64, buffer=_shm.buf)
+
+
+def run_tasks(tasks, prices=None):
+    """
+    Simulate (start, end, step, amount, stop loss %, take profit %, cash) tasks
+    against the shared closes (or `prices` when run in-process)
+    """
+    prices = _prices if prices is None else prices
+    results = []
+    for start, end, step, amount, stop_loss, take_profit, cash in tasks:
+        segment = prices[start:end].tolist()
+        results.append(simulate_dca(segment, step, amount, stop_loss, take_profit, cash))
+    return results
@@ -6,18 +6,32 @@ from decimal import Decimal
 from django.utils import timezone
 from django.db import models
 from datetime import timedelta
-from .models import TradingStrategy, Order, PaperTradingPosition
+from contextlib import nullcontext
+import time
+from .models import TradingStrategy, Order, PaperTradingPosition, UserSettings
+from .engine_pool import engine_pool
 from .paper_trading_service import PaperTradingService
+from .price_feed import PriceUnavailable
+from .portfolio_valuation import portfolio_valuator
+from .custom_strategy import evaluate_custom_strategy, indicator_registry
+from .latency import trace_strategy, price_observed
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class StrategyExecutor:
-    """Executes trading strategies automatically"""
-
-    def __init__(self):
-        self.paper_trading = PaperTradingService()
+    """
+    Executes trading strategies automatically.
+    `clock` (returning an aware datetime) and `tape` let trading.replay record
+    every price observation and scheduling decision, or drive the executor
+    from a recording on a virtual clock.
+    """
+
+    def __init__(self, clock=None, tape=None):
+        self.clock = clock or timezone.now
+        self.tape = tape
+        self.paper_trading = PaperTradingService(clock=self.clock, tape=tape)
 
     def get_interval_timedelta(self, interval_str):
         """Convert interval string to timedelta"""
@@ -31,38 +45,96 @@ class StrategyExecutor:
         return interval_map.get(interval_str, timedelta(hours=1))
 
     def execute_pending_strategies(self):
-        """Execute all strategies that are due"""
-        now = timezone.now()
+        """
+        Execute all strategies that are due.
+        Strategies are grouped by trading pair and every strategy on a pair is
+        evaluated against one price snapshot taken for this tick, so upstream
+        price calls are bounded by the number of distinct symbols.
+        """
+        now = self.clock()
+        tick_at = now.timestamp()
 
         # Get all active strategies that need execution
         strategies = TradingStrategy.objects.filter(
             is_active=True
         ).filter(
             models.Q(next_execution_at__lte=now) | models.Q(next_execution_at__isnull=True)
-        )
+        ).select_related('trading_pair', 'user', 'user__trading_settings').order_by('trading_pair_id', 'id')
 
-        executed_count = 0
+        strategies_by_pair = {}
         for strategy in strategies:
-            try:
-                self.execute_strategy(strategy)
-                executed_count += 1
-            except Exception as e:
-                logger.error(f"Error executing strategy {strategy.id}: {e}")
+            strategies_by_pair.setdefault(strategy.trading_pair_id, []).append(strategy)
+
+        if self.tape is not None:
+            self.tape.begin_tick(
+                now, [strategy.id for strategy in strategies], sorted({strategy.user_id for strategy in strategies})
+            )
+        # Latency offsets from a virtual clock would be meaningless
+        tracing = not getattr(self.tape, 'replaying', False)
 
-        logger.info(f"Executed {executed_count} strategies")
+        executed_count = 0
+        try:
+            for pair_strategies in strategies_by_pair.values():
+                try:
+                    price = self.get_price_snapshot(pair_strategies[0].trading_pair)
+                except PriceUnavailable as e:
+                    # Leave the pair's strategies due; they run on the next tick with a real price
+                    logger.error(f"Skipping {len(pair_strategies)} strategies: {e}")
+                    continue
+                price_at = time.time()
+
+                for strategy in pair_strategies:
+                    try:
+                        due_at = strategy.next_execution_at or now
+                        trace = trace_strategy(strategy, due_at=due_at, tick_at=tick_at, price_at=price_at)
+                        with trace if tracing else nullcontext():
+                            self.execute_strategy(strategy, current_price=price, now=now)
+                        executed_count += 1
+                    except Exception as e:
+                        logger.error(f"Error executing strategy {strategy.id}: {e}")
+        finally:
+            if self.tape is not None:
+                self.tape.end_tick()
+
+        logger.info(f"Executed {executed_count} strategies across {len(strategies_by_pair)} pairs")
         return executed_count
 
-    def execute_strategy(self, strategy):
-        """Execute a single strategy"""
+    def get_price_snapshot(self, trading_pair):
+        """Take the single price observation shared by every strategy on a pair this tick"""
+        if self.tape is not None:
+            price = self.tape.observe(
+                'price', trading_pair.symbol, lambda: self.paper_trading.get_pair_price(trading_pair)
+            )
+        else:
+            price = self.paper_trading.get_pair_price(trading_pair)
+        price_observed()
+        portfolio_valuator.on_price(trading_pair.symbol, price)
+        return price
+
+    def execute_strategy(self, strategy, current_price=None, now=None):
+        """Execute a single strategy, optionally against a shared price snapshot"""
         logger.info(f"Executing strategy: {strategy.name} ({strategy.strategy_type})")
 
-        if strategy.strategy_type == 'dca':
-            self.execute_dca_strategy(strategy)
+        if current_price is None:
+            current_price = self.get_price_snapshot(strategy.trading_pair)
+        now = now or self.clock()
+
+        live_settings = self.live_settings(strategy)
+        if live_settings is not None:
+            # Live accounts trade through their pooled engine (warm session, no settings lookup)
+            if self.tape is not None:
+                self.tape.trade_live(strategy.id)
+            engine_pool.get_engine(strategy.user, live_settings).dispatch_strategy(strategy)
+        elif getattr(self.tape, 'replaying', False) and self.tape.traded_live(strategy.id):
+            pass  # Traded on the exchange when recorded; exchange fills are not on the tape
+        elif strategy.strategy_type == 'dca':
+            self.execute_dca_strategy(strategy, current_price)
+        elif strategy.strategy_type == 'custom':
+            self.execute_custom_strategy(strategy, current_price, now=now)
         else:
             logger.warning(f"Strategy type {strategy.strategy_type} not implemented yet")
 
         # Update execution timestamp
-        now = timezone.now()
         interval = self.get_interval_timedelta(strategy.execution_interval)
 
         strategy.last_executed_at = now
@@ -70,7 +142,20 @@ class StrategyExecutor:
         strategy.total_executions += 1
         strategy.save()
 
-    def execute_dca_strategy(self, strategy):
+    def live_settings(self, strategy):
+        """
+        The user's settings when their strategies trade on the exchange, else
+        None. Replays never trade live, whatever the scratch database says.
+        """
+        if getattr(self.tape, 'replaying', False):
+            return None
+        try:
+            user_settings = strategy.user.trading_settings
+        except UserSettings.DoesNotExist:
+            return None
+        return None if user_settings.paper_trading_mode else user_settings
+
+    def execute_dca_strategy(self, strategy, current_price=None):
         """
         Execute Dollar Cost Averaging strategy
         - Buy fixed amount at regular intervals
@@ -81,19 +166,61 @@ class StrategyExecutor:
             order = self.paper_trading.execute_market_buy(
                 user=strategy.user,
                 trading_pair=strategy.trading_pair,
-                amount=strategy.amount
+                amount=strategy.amount,
+                price=current_price
             )
 
             logger.info(f"DCA Buy executed: {strategy.amount} {strategy.trading_pair.base_asset} @ {order.filled_price}")
 
-            # Check and execute stop loss / take profit on existing positions
-            self.check_stop_loss_take_profit(strategy)
+            # Check stop loss / take profit against the tick's shared snapshot, not this
+            # order's slippage-adjusted fill, so every strategy on the pair sees one price
+            self.check_stop_loss_take_profit(strategy, current_price)
 
         except Exception as e:
             logger.error(f"Error in DCA strategy execution: {e}")
             raise
 
-    def check_stop_loss_take_profit(self, strategy):
+    def execute_custom_strategy(self, strategy, current_price, now=None):
+        """
+        Execute an indicator-rule strategy
+        - Buy strategy.amount when all buy_when rules hold
+        - Sell up to strategy.amount of the position when all sell_when rules hold
+        """
+        now = now or self.clock()
+        fetch_klines = self._tape_klines if self.tape is not None else None
+        signal = evaluate_custom_strategy(strategy, current_price, fetch_klines, int(now.timestamp() * 1000))
+
+        if signal == 'buy':
+            order = self.paper_trading.execute_market_buy(
+                user=strategy.user,
+                trading_pair=strategy.trading_pair,
+                amount=strategy.amount,
+                price=current_price
+            )
+            logger.info(f"Custom Buy executed: {strategy.amount} {strategy.trading_pair.base_asset} @ {order.filled_price}")
+        elif signal == 'sell':
+            position = self.paper_trading.get_user_position(strategy.user, strategy.trading_pair)
+            amount = min(position.amount, strategy.amount)
+            if amount > 0:
+                order = self.paper_trading.execute_market_sell(
+                    user=strategy.user,
+                    trading_pair=strategy.trading_pair,
+                    amount=amount,
+                    price=current_price
+                )
+                logger.info(f"Custom Sell executed: {amount} {strategy.trading_pair.base_asset} @ {order.filled_price}")
+
+        if signal != 'sell':
+            self.check_stop_loss_take_profit(strategy, current_price)
+
+    def _tape_klines(self, symbol, interval, limit):
+        """Klines fetched through the record/replay tape"""
+        return self.tape.observe(
+            'klines', f"{symbol}:{interval}:{limit}",
+            lambda: indicator_registry.fetch_klines(symbol, interval, limit),
+        )
+
+    def check_stop_loss_take_profit(self, strategy, current_price=None):
         """
         Check all positions for this strategy and execute stop loss or take profit
         """
@@ -107,7 +234,8 @@ class StrategyExecutor:
             return
 
         # Get current price
-        current_price = self.paper_trading.get_current_price(strategy.trading_pair.symbol)
+        if current_price is None:
+            current_price = self.paper_trading.get_pair_price(strategy.trading_pair)
         if current_price == 0:
             logger.warning(f"Could not fetch price for {strategy.trading_pair.symbol}")
             return
@@ -144,7 +272,8 @@ class StrategyExecutor:
             order = self.paper_trading.execute_market_sell(
                 user=strategy.user,
                 trading_pair=strategy.trading_pair,
-                amount=position.amount
+                amount=position.amount,
+                price=current_price
             )
 
             logger.info(
@@ -165,7 +294,8 @@ class StrategyExecutor:
             order = self.paper_trading.execute_market_sell(
                 user=strategy.user,
                 trading_pair=strategy.trading_pair,
-                amount=position.amount
+                amount=position.amount,
+                price=current_price
             )
 
             logger.info(
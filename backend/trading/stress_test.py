@@ -0,0 +1,203 @@
+"""
+Strategy Stress Test
+Monte Carlo drawdown, P&L and stop-out distributions for a DCA strategy over
+synthetic price paths (geometric Brownian motion or bootstrapped history)
+"""
+import time
+import numpy as np
+from .custom_strategy import INTERVAL_MS, KLINE_INTERVALS
+from .equity_curve import FetchBudget, candle_cache
+from .paper_trading_service import PaperTradingService
+from .price_feed import PriceUnavailable
+from .simulation import simulate_dca_paths
+import logging
+
+logger = logging.getLogger(__name__)
+
+PATH_METHODS = ('gbm', 'bootstrap')
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+MAX_PATHS = 100_000
+INITIAL_CASH = 10000.0
+# Steps generated per matrix; bounds memory at n_paths x BLOCK_STEPS floats
+BLOCK_STEPS = 256
+YEAR_MS = 365 * 86_400_000
+
+
+def _percentiles(values):
+    return {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+class StressTester:
+    """
+    Paths are produced block by block as (n_paths, BLOCK_STEPS) log-return
+    matrices and fed to simulate_dca_paths, which advances every path one
+    step at a time with vector operations.
+    """
+
+    def __init__(self):
+        self.paper_trading = PaperTradingService()
+
+    def history(self, symbol, interval, days, max_bars=None, budget=None):
+        """
+        Closed-bar closes for the last `days`, or the last `max_bars` bars when
+        fewer, fetching at most as many pages as `budget` allows. Returns
+        (closes, complete_until); closes may be empty when upstream is
+        unavailable and complete_until (open time of the last known bar, None
+        when none is) falls short of the newest closed bar when the budget ran out.
+        """
+        step = INTERVAL_MS[interval]
+        end_ms = int(time.time() * 1000) // step * step - step
+        bars = days * 86_400_000 // step
+        if max_bars is not None:
+            bars = min(bars, max_bars)
+        start_ms = end_ms - (max(bars, 1) - 1) * step
+        candles = candle_cache.get(symbol, interval, start_ms, end_ms, budget)
+        closes = candles['close'][(candles['open_time'] >= start_ms) & (candles['open_time'] <= end_ms)]
+        complete = min(candle_cache.complete_through(symbol, interval, start_ms), end_ms)
+        return closes, complete if complete >= start_ms else None
+
+    def gbm_blocks(self, rng, n_paths, n_steps, start_price, drift, volatility, dt):
+        """Log-price increments (mu - sigma^2/2) dt + sigma sqrt(dt) Z, compounded per block"""
+        price = np.full(n_paths, start_price)
+        mean = (drift - 0.5 * volatility ** 2) * dt
+        scale = volatility * np.sqrt(dt)
+        for start in range(0, n_steps, BLOCK_STEPS):
+            returns = rng.standard_normal((n_paths, min(BLOCK_STEPS, n_steps - start)))
+            returns *= scale
+            returns += mean
+            block = price[:, None] * np.exp(np.cumsum(returns, axis=1))
+            price = block[:, -1]
+            yield block
+
+    def bootstrap_blocks(self, rng, n_paths, n_steps, start_price, log_returns, block_length):
+        """Historical log-returns resampled in contiguous blocks to keep volatility clustering"""
+        block_length = max(1, min(block_length, len(log_returns)))
+        price = np.full(n_paths, start_price)
+        offsets = np.arange(block_length)
+        for start in range(0, n_steps, BLOCK_STEPS):
+            width = min(BLOCK_STEPS, n_steps - start)
+            count = -(-width // block_length)
+            starts = rng.integers(0, len(log_returns) - block_length + 1, size=(n_paths, count))
+            index = (starts[:, :, None] + offsets).reshape(n_paths, -1)[:, :width]
+            block = price[:, None] * np.exp(np.cumsum(log_returns[index], axis=1))
+            price = block[:, -1]
+            yield block
+
+    def run(self, strategy, method='gbm', paths=10000, days=365, step_interval='1h', history_days=365,
+            drift=None, volatility=None, block_length=24, params=None, initial_cash=INITIAL_CASH, seed=None,
+            max_steps=None, max_path_steps=None, history_bars=None, fetch_pages=None):
+        """
+        Simulate `paths` synthetic futures of `days` for a DCA strategy. GBM
+        drift/volatility (annualized) default to estimates from history;
+        `params` overrides stop_loss_percentage, take_profit_percentage,
+        amount or execution_interval to test settings before saving them.
+        `max_steps` and `max_path_steps` (paths x steps) bound the work;
+        `history_bars` and `fetch_pages` bound the history fetched for the
+        estimates (None = unbounded). When the history stops short of the
+        newest bar, paths start from the current price and the result's
+        history_complete_until says how far the estimates reach.
+        """
+        if strategy.strategy_type != 'dca':
+            raise ValueError("Only DCA strategies can be stress tested")
+        if method not in PATH_METHODS:
+            raise ValueError(f"Unknown path method: {method}")
+        if step_interval not in INTERVAL_MS:
+            raise ValueError(f"Unsupported step interval: {step_interval}")
+        if not 1 <= paths <= MAX_PATHS:
+            raise ValueError(f"paths must be between 1 and {MAX_PATHS}")
+        if days <= 0:
+            raise ValueError("days must be positive")
+
+        defaults = {
+            'stop_loss_percentage': float(strategy.stop_loss_percentage),
+            'take_profit_percentage': float(strategy.take_profit_percentage),
+            'amount': float(strategy.amount),
+            'execution_interval': strategy.execution_interval,
+        }
+        unknown = set(params or {}) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters: {sorted(unknown)}")
+        params = {**defaults, **(params or {})}
+        if params['execution_interval'] not in KLINE_INTERVALS:
+            raise ValueError(f"Unsupported execution_interval: {params['execution_interval']}")
+        for name in ('stop_loss_percentage', 'take_profit_percentage', 'amount'):
+            params[name] = float(params[name])
+            if params[name] <= 0:
+                raise ValueError(f"{name} must be positive")
+
+        symbol = strategy.trading_pair.symbol
+        step_ms = INTERVAL_MS[step_interval]
+        n_steps = days * 86_400_000 // step_ms
+        if max_steps is not None and n_steps > max_steps:
+            raise ValueError(
+                f"{days} days of {step_interval} steps is {n_steps:,} steps, over the limit of {max_steps:,}; "
+                f"use a coarser step_interval or run manage.py stress_test_strategy"
+            )
+        if max_path_steps is not None and paths * n_steps > max_path_steps:
+            raise ValueError(
+                f"{paths:,} paths x {n_steps:,} steps is over the limit of {max_path_steps:,}; "
+                f"use fewer paths or run manage.py stress_test_strategy"
+            )
+        dt = step_ms / YEAR_MS
+        # Buys happen every execution interval; SL/TP are checked every step
+        execution_steps = max(1, INTERVAL_MS[KLINE_INTERVALS[params['execution_interval']]] // step_ms)
+
+        closes, complete_until = self.history(
+            symbol, step_interval, history_days, max_bars=history_bars, budget=FetchBudget(fetch_pages),
+        )
+        log_returns = np.diff(np.log(closes)) if len(closes) > 1 else np.empty(0)
+        newest_bar = int(time.time() * 1000) // step_ms * step_ms - step_ms
+        start_price = float(closes[-1]) if len(closes) and complete_until == newest_bar else None
+        if start_price is None:
+            try:
+                start_price = float(self.paper_trading.get_pair_price(strategy.trading_pair))
+            except PriceUnavailable as e:
+                if not len(closes):
+                    raise ValueError(f"No price history or current price for {symbol}: {e}")
+                start_price = float(closes[-1])
+
+        rng = np.random.default_rng(seed)
+        if method == 'gbm':
+            if (drift is None or volatility is None) and len(log_returns) < 2:
+                raise ValueError(f"Not enough price history for {symbol}; pass drift and volatility")
+            drift = float(drift) if drift is not None else float(log_returns.mean() / dt + 0.5 * log_returns.var() / dt)
+            volatility = float(volatility) if volatility is not None else float(log_returns.std() / np.sqrt(dt))
+            blocks = self.gbm_blocks(rng, paths, n_steps, start_price, drift, volatility, dt)
+        else:
+            if len(log_returns) < block_length:
+                raise ValueError(f"Not enough price history for {symbol} to bootstrap ({len(log_returns)} returns)")
+            blocks = self.bootstrap_blocks(rng, paths, n_steps, start_price, log_returns, block_length)
+
+        started = time.monotonic()
+        result = simulate_dca_paths(
+            blocks, paths, execution_steps, params['amount'],
+            params['stop_loss_percentage'], params['take_profit_percentage'], initial_cash,
+        )
+        elapsed = time.monotonic() - started
+        logger.info(f"Stress tested strategy {strategy.id}: {paths} {method} paths x {n_steps} steps in {elapsed:.2f}s")
+
+        return {
+            'strategy_id': strategy.id,
+            'symbol': symbol,
+            'method': method,
+            'paths': paths,
+            'steps': n_steps,
+            'step_interval': step_interval,
+            'start_price': start_price,
+            'history_bars': len(closes),
+            'history_complete_until': complete_until,
+            'drift': drift if method == 'gbm' else None,
+            'volatility': volatility if method == 'gbm' else None,
+            'params': params,
+            'seconds': round(elapsed, 3),
+            'max_drawdown_pct': _percentiles(result['max_drawdown_pct']),
+            'return_pct': _percentiles(result['return_pct']),
+            'stop_out_rate': round(float((result['stop_outs'] > 0).mean()), 4),
+            'stop_outs_per_path': _percentiles(result['stop_outs']),
+            'take_profit_rate': round(float((result['take_profits'] > 0).mean()), 4),
+            'loss_probability': round(float((result['return_pct'] < 0).mean()), 4),
+        }
+
+
+# Singleton instance
+stress_tester = StressTester()
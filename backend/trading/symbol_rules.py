@@ -0,0 +1,190 @@
+"""
+Exchange Symbol Rules
+Caches /v3/exchangeInfo filters and normalizes orders before they reach Binance
+"""
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Binance quotes every filter with at most 8 decimals, so 1e-8 units are exact
+SCALE = 10 ** 8
+
+
+def to_units(value) -> int:
+    """Convert a decimal-like value to integer 1e-8 units (truncating)"""
+    return int((Decimal(str(value)) * SCALE).to_integral_value(rounding=ROUND_DOWN))
+
+
+def format_units(units: int) -> str:
+    """Format integer 1e-8 units as a plain decimal string without exponent"""
+    sign = '-' if units < 0 else ''
+    whole, frac = divmod(abs(units), SCALE)
+    frac_str = f"{frac:08d}".rstrip('0')
+    return f"{sign}{whole}.{frac_str}" if frac_str else f"{sign}{whole}"
+
+
+class SymbolRules:
+    """Precomputed LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL limits for one symbol"""
+
+    __slots__ = (
+        'symbol', 'status', 'min_qty', 'max_qty', 'step_size',
+        'min_price', 'max_price', 'tick_size', 'min_notional',
+    )
+
+    def __init__(self, symbol: str, status: str = 'TRADING', min_qty: int = 0, max_qty: int = 0,
+                 step_size: int = 0, min_price: int = 0, max_price: int = 0, tick_size: int = 0,
+                 min_notional: int = 0):
+        self.symbol = symbol
+        self.status = status
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.step_size = step_size
+        self.min_price = min_price
+        self.max_price = max_price
+        self.tick_size = tick_size
+        self.min_notional = min_notional
+
+    @classmethod
+    def from_exchange_info(cls, info: Dict) -> 'SymbolRules':
+        """Build rules from one entry of exchangeInfo['symbols']"""
+        rules = cls(info['symbol'], info.get('status', 'TRADING'))
+        for f in info.get('filters', []):
+            filter_type = f.get('filterType')
+            if filter_type == 'LOT_SIZE':
+                rules.min_qty = to_units(f.get('minQty', '0'))
+                rules.max_qty = to_units(f.get('maxQty', '0'))
+                rules.step_size = to_units(f.get('stepSize', '0'))
+            elif filter_type == 'PRICE_FILTER':
+                rules.min_price = to_units(f.get('minPrice', '0'))
+                rules.max_price = to_units(f.get('maxPrice', '0'))
+                rules.tick_size = to_units(f.get('tickSize', '0'))
+            elif filter_type in ('MIN_NOTIONAL', 'NOTIONAL'):
+                rules.min_notional = to_units(f.get('minNotional', '0'))
+        return rules
+
+    def normalize_quantity(self, quantity) -> int:
+        """Round a quantity down onto the LOT_SIZE step grid"""
+        units = to_units(quantity)
+        if self.step_size:
+            units -= (units - self.min_qty) % self.step_size
+        return units
+
+    def normalize_price(self, price, side: str = 'buy') -> int:
+        """Snap a price onto the tick grid (buys round down, sells round up)"""
+        units = to_units(price)
+        if self.tick_size:
+            remainder = (units - self.min_price) % self.tick_size
+            if remainder:
+                units -= remainder
+                if side.lower() == 'sell':
+                    units += self.tick_size
+        return units
+
+    def validate(self, quantity_units: int, price_units: int) -> None:
+        """Raise ValueError if a normalized order would be rejected by the exchange"""
+        if self.status != 'TRADING':
+            raise ValueError(f"{self.symbol} is not trading (status: {self.status})")
+        if quantity_units <= 0 or quantity_units < self.min_qty:
+            raise ValueError(
+                f"Quantity {format_units(quantity_units)} below minimum {format_units(self.min_qty)} for {self.symbol}"
+            )
+        if self.max_qty and quantity_units > self.max_qty:
+            raise ValueError(
+                f"Quantity {format_units(quantity_units)} above maximum {format_units(self.max_qty)} for {self.symbol}"
+            )
+        if price_units:
+            if price_units < self.min_price:
+                raise ValueError(
+                    f"Price {format_units(price_units)} below minimum {format_units(self.min_price)} for {self.symbol}"
+                )
+            if self.max_price and price_units > self.max_price:
+                raise ValueError(
+                    f"Price {format_units(price_units)} above maximum {format_units(self.max_price)} for {self.symbol}"
+                )
+            if self.min_notional and quantity_units * price_units < self.min_notional * SCALE:
+                notional = format_units(quantity_units * price_units // SCALE)
+                raise ValueError(
+                    f"Order value {notional} below minimum notional {format_units(self.min_notional)} for {self.symbol}"
+                )
+
+    def prepare_order(self, side: str, quantity, price=None) -> Tuple[str, Optional[str]]:
+        """
+        Normalize and validate an order.
+        Returns (quantity, price) as exchange-ready strings; price is None when not given.
+        For market orders pass the reference price so MIN_NOTIONAL can still be checked.
+        """
+        quantity_units = self.normalize_quantity(quantity)
+        price_units = self.normalize_price(price, side) if price is not None else 0
+        self.validate(quantity_units, price_units)
+        return format_units(quantity_units), (format_units(price_units) if price is not None else None)
+
+
+class SymbolRulesCache:
+    """Per-endpoint cache of SymbolRules refreshed from /v3/exchangeInfo"""
+
+    def __init__(self, refresh_interval: int = 3600):
+        self.refresh_interval = refresh_interval
+        self._rules = {}  # base_url -> (loaded_at, {symbol: SymbolRules})
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # One exchangeInfo download at a time
+
+    def load(self, base_url: str, exchange_info: Dict) -> Dict[str, SymbolRules]:
+        """Replace the cached rules for an endpoint from an exchangeInfo payload"""
+        rules = {
+            info['symbol']: SymbolRules.from_exchange_info(info)
+            for info in exchange_info.get('symbols', [])
+        }
+        with self._lock:
+            self._rules[base_url] = (time.monotonic(), rules)
+        return rules
+
+    def _fresh(self, base_url):
+        entry = self._rules.get(base_url)
+        if entry is not None and time.monotonic() - entry[0] < self.refresh_interval:
+            return entry[1]
+        return None
+
+    def _rules_for(self, binance) -> Dict[str, SymbolRules]:
+        rules = self._fresh(binance.base_url)
+        if rules is not None:
+            return rules
+
+        with self._refresh_lock:
+            # Threads that waited on the lock use the rules the first one loaded
+            rules = self._fresh(binance.base_url)
+            if rules is not None:
+                return rules
+
+            exchange_info = binance.get_exchange_info()
+            if exchange_info:
+                return self.load(binance.base_url, exchange_info)
+
+            entry = self._rules.get(binance.base_url)
+            if entry is not None:
+                # Keep serving the previous rules if a refresh fails
+                logger.warning("exchangeInfo refresh failed, using cached symbol rules")
+                return entry[1]
+            return {}
+
+    def get(self, binance, symbol: str) -> Optional[SymbolRules]:
+        """Rules for a symbol on the binance client's endpoint, or None if unknown"""
+        return self._rules_for(binance).get(symbol.replace('/', ''))
+
+    def invalidate(self, base_url: str = None):
+        """Force the next lookup to reload exchangeInfo"""
+        with self._lock:
+            if base_url is None:
+                self._rules.clear()
+            else:
+                self._rules.pop(base_url, None)
+
+
+# Singleton instance
+symbol_rules_cache = SymbolRulesCache(
+    refresh_interval=getattr(settings, 'EXCHANGE_INFO_REFRESH_SECONDS', 3600)
+)
@@ -1,3 +1,1818 @@
-from django.test import TestCase
+"""
+API performance budgets
+Hits every route registered in trading/urls.py against seeded datasets at two
+scales and fails on an unexpected status, on query-count growth (N+1), or on
+query count over the per-endpoint budget. DB and wall time budgets are checked
+with ENDPOINT_TIMING_BUDGETS=1.
+"""
+import importlib.util
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import (
+    TradingPair, TradingStrategy, Order, OrderLatency, TradeHistory, UserSettings, PriceAlert, PaperTradingPosition,
+    SimulationResult,
+)
+from .paper_trading_service import PaperTradingService
+from .portfolio_valuation import portfolio_valuator
+from .response_cache import response_cache
+from .urls import router
+from trading_backend import db_router
 
-# Create your tests here.
+STUB_PRICE = Decimal('100')
+
+# Columnar exports need the optional pyarrow package; their tests skip without it
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Rows seeded per scale unit; every endpoint is measured at SMALL_SCALE and
+# again at LARGE_SCALE, and its query count must not change between the two
+PAIRS_PER_SCALE = 5
+ORDERS_PER_PAIR = 8
+SMALL_SCALE = 1
+LARGE_SCALE = 5
+
+# DB and wall-time budgets depend on the host; query counts do not. Timings
+# are only enforced when ENDPOINT_TIMING_BUDGETS=1 (e.g. on a dedicated runner)
+CHECK_TIMINGS = os.environ.get('ENDPOINT_TIMING_BUDGETS') == '1'
+
+# (url name, method) -> (max queries, max DB ms, max wall ms) at LARGE_SCALE
+ENDPOINT_BUDGETS = {
+    ('api-root', 'get'): (0, 5, 200),
+    ('trading-pair-list', 'get'): (2, 50, 500),
+    ('trading-pair-detail', 'get'): (1, 20, 200),
+    ('trading-pair-price', 'get'): (1, 20, 200),
+    ('strategy-list', 'get'): (3, 50, 500),
+    ('strategy-list', 'post'): (4, 50, 500),
+    ('strategy-detail', 'get'): (1, 20, 200),
+    ('strategy-activate', 'post'): (2, 20, 200),
+    ('strategy-deactivate', 'post'): (2, 20, 200),
+    ('strategy-optimize', 'post'): (5, 20, 1000),
+    ('strategy-stress-test', 'post'): (2, 20, 500),
+    ('order-list', 'get'): (1, 100, 1000),
+    ('order-list', 'post'): (12, 100, 500),
+    ('order-detail', 'get'): (1, 20, 200),
+    ('order-portfolio', 'get'): (5, 50, 500),
+    ('order-equity-curve', 'get'): (6, 50, 500),
+    ('order-pnl-statement', 'get'): (10, 200, 1000),
+    ('order-export', 'get'): (1, 100, 1000),
+    ('order-cancel', 'post'): (2, 20, 200),
+    ('trade-history-list', 'get'): (1, 100, 1000),
+    ('trade-history-detail', 'get'): (1, 20, 200),
+    ('trade-history-export', 'get'): (1, 100, 1000),
+    ('user-settings-list', 'get'): (1, 20, 200),
+    ('user-settings-detail', 'get'): (2, 20, 200),
+    ('price-alert-list', 'get'): (1, 50, 500),
+    ('price-alert-list', 'post'): (3, 20, 200),
+    ('price-alert-detail', 'get'): (1, 20, 200),
+    ('dashboard-list', 'get'): (12, 100, 1000),  # Includes the change marker read without a shared cache
+}
+
+# Routes answering anything but 200 on success; a 4xx would pass the budget without doing the work
+EXPECTED_STATUS = {
+    ('strategy-list', 'post'): 201,
+    ('order-list', 'post'): 201,
+    ('price-alert-list', 'post'): 201,
+}
+
+# Bodies for POSTs to list routes; lambdas take the test case for seeded ids
+POST_PAYLOADS = {
+    'strategy-list': lambda case: {
+        'name': 'Budget DCA',
+        'strategy_type': 'dca',
+        'trading_pair': case.pair.id,
+        'amount': '0.01',
+    },
+    'order-list': lambda case: {'trading_pair': case.pair.id, 'order_side': 'buy', 'amount': '0.01'},
+    'price-alert-list': lambda case: {
+        'trading_pair': case.pair.id,
+        'condition': 'above',
+        'target_price': '150',
+    },
+    # Small searches: the budget covers request overhead, not simulation size
+    'strategy-optimize': lambda case: {
+        'method': 'random', 'samples': 4, 'days': 10, 'folds': 2, 'train_blocks': 1, 'seed': 1,
+        'space': {'execution_interval': ['1h']},
+    },
+    'strategy-stress-test': lambda case: {'paths': 100, 'days': 10, 'step_interval': '1h', 'seed': 1},
+}
+
+_SQL_LITERALS = re.compile(r"'[^']*'|\b\d+(\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced, so repeats of one query shape group together"""
+    return _SQL_LITERALS.sub('?', sql)
+
+
+def iter_routes():
+    """(url name, method, basename or None) for every route the trading router exposes"""
+    yield 'api-root', 'get', None
+    for _prefix, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            methods = router.get_method_map(viewset, route.mapping)
+            name = route.name.format(basename=basename)
+            for method in ('get', 'post'):
+                if method not in methods:
+                    continue
+                if methods[method] == 'create' and name not in POST_PAYLOADS:
+                    continue
+                yield name, method, basename if route.detail else None
+
+
+# fake_fetch makes kline pages free; an exhausted page budget would only change which bars are complete
+@override_settings(EQUITY_CURVE_FETCH_PAGES=1000)
+class EndpointBudgetTests(TestCase):
+    """Query-count, DB-time and latency budgets for the trading API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('budget', 'budget@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user)
+
+    def setUp(self):
+        from .equity_curve import CandleCache
+        from .price_feed import price_feed
+        self.pair = None
+        self.seeded_pairs = 0
+        self.unexpected_calls = []
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        candles = CandleCache(directory=self.dir.name)
+        patches = [
+            # Upstream data comes from fake_fetch; anything reaching HTTP is a stubbing bug
+            mock.patch('requests.Session.request', side_effect=self.unexpected_request),
+            mock.patch.object(price_feed, 'fetch', side_effect=self.fake_fetch),
+            # optimizer and stress_test import the singleton by name; all three share one temporary cache
+            mock.patch('trading.equity_curve.candle_cache', candles),
+            mock.patch('trading.optimizer.candle_cache', candles),
+            mock.patch('trading.stress_test.candle_cache', candles),
+            mock.patch(
+                'trading.paper_trading_service.PaperTradingService.get_current_price',
+                return_value=STUB_PRICE,
+            ),
+            mock.patch('trading.price_board.price_board.get_price', return_value=None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def unexpected_request(self, method, url, *args, **kwargs):
+        # Callers swallow request errors, so the call is recorded and the test fails on it
+        self.unexpected_calls.append(f"{method} {url}")
+        raise AssertionError(f"unexpected upstream HTTP call: {method} {url}")
+
+    def fake_fetch(self, path, params=None):
+        """Upstream stand-in: every ticker at STUB_PRICE, flat klines over any range"""
+        from .equity_curve import KLINES_PATH
+        from .price_feed import TICKER_PATH, PriceUnavailable
+        params = params or {}
+        if path == TICKER_PATH:
+            if 'symbol' in params:
+                return {'symbol': params['symbol'], 'price': str(STUB_PRICE)}
+            return [{'symbol': f"C{index}USDT", 'price': str(STUB_PRICE)} for index in range(self.seeded_pairs)]
+        if path == KLINES_PATH:
+            step = 3_600_000 if params['interval'] == '1h' else 60_000
+            start = params.get('startTime', params['endTime'] - (params['limit'] - 1) * step)
+            start = -(-start // step) * step
+            return [
+                [open_time, '0', '0', '0', str(STUB_PRICE)]
+                for open_time in range(start, params['endTime'] + 1, step)
+            ][:params['limit']]
+        self.unexpected_calls.append(f"fetch {path} {params}")
+        raise PriceUnavailable(f"unexpected upstream fetch: {path}")
+
+    def seed(self, scale):
+        """Grow the dataset to `scale` units of pairs, strategies, orders, trades, alerts and positions"""
+        now = timezone.now()
+        target = scale * PAIRS_PER_SCALE
+        pairs = TradingPair.objects.bulk_create([
+            TradingPair(symbol=f"C{index}USDT", base_asset=f"C{index}", quote_asset='USDT')
+            for index in range(self.seeded_pairs, target)
+        ])
+        self.seeded_pairs = target
+        if self.pair is None:
+            self.pair = pairs[0]
+
+        orders = []
+        for pair in pairs:
+            for index in range(ORDERS_PER_PAIR):
+                orders.append(Order(
+                    user=self.user,
+                    trading_pair=pair,
+                    order_type='market',
+                    order_side='buy' if index % 2 == 0 else 'sell',
+                    status='pending' if index == ORDERS_PER_PAIR - 1 else 'filled',
+                    amount=Decimal('1'),
+                    filled_amount=Decimal('1'),
+                    filled_price=Decimal(90 + index),
+                    created_at=now - timedelta(hours=ORDERS_PER_PAIR - index),
+                ))
+        Order.objects.bulk_create(orders)
+        TradeHistory.objects.bulk_create([
+            TradeHistory(
+                user=self.user,
+                order=order,
+                trading_pair=order.trading_pair,
+                side=order.order_side,
+                price=order.filled_price,
+                amount=order.amount,
+                total=order.amount * order.filled_price,
+                executed_at=order.created_at,
+            )
+            for order in orders if order.status == 'filled'
+        ])
+        TradingStrategy.objects.bulk_create([
+            TradingStrategy(
+                user=self.user,
+                name=f"{pair.symbol} DCA",
+                strategy_type='dca',
+                trading_pair=pair,
+                amount=Decimal('0.01'),
+            )
+            for pair in pairs
+        ])
+        PriceAlert.objects.bulk_create([
+            PriceAlert(user=self.user, trading_pair=pair, condition='above', target_price=Decimal('150'))
+            for pair in pairs
+        ])
+        PaperTradingPosition.objects.bulk_create([
+            PaperTradingPosition(
+                user=self.user,
+                trading_pair=pair,
+                amount=Decimal('1'),
+                average_buy_price=Decimal('90'),
+                total_invested=Decimal('90'),
+            )
+            for pair in pairs
+        ])
+
+    def detail_pk(self, name, basename):
+        for _prefix, viewset, registered in router.registry:
+            if registered == basename:
+                queryset = viewset.serializer_class.Meta.model.objects.order_by('pk')
+                if name == 'order-cancel':
+                    queryset = queryset.filter(status='pending')
+                return queryset.values_list('pk', flat=True).first()
+
+    def measure(self, name, method, basename):
+        """Run one request cold and return (status, queries, db ms, wall ms)"""
+        kwargs = {'pk': self.detail_pk(name, basename)} if basename else {}
+        url = reverse(name, kwargs=kwargs)
+        data = POST_PAYLOADS[name](self) if method == 'post' and name in POST_PAYLOADS else None
+
+        # Per-process caches would otherwise hide the first-request cost
+        cache.clear()
+        response_cache.clear()
+        portfolio_valuator.invalidate(self.user.id)
+        SimulationResult.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if method == 'post':
+                response = self.client.post(url, data, content_type='application/json')
+            else:
+                response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            wall_ms = (time.perf_counter() - started) * 1000
+
+        db_ms = sum(float(query['time']) for query in captured.captured_queries) * 1000
+        return response.status_code, captured.captured_queries, db_ms, wall_ms
+
+    def measure_all(self):
+        return {
+            (name, method): self.measure(name, method, basename)
+            for name, method, basename in iter_routes()
+        }
+
+    def test_every_route_has_a_budget(self):
+        missing = [key for key in ((name, method) for name, method, _ in iter_routes()) if key not in ENDPOINT_BUDGETS]
+        self.assertEqual(missing, [], 'Add ENDPOINT_BUDGETS entries for new routes')
+
+    def test_endpoint_budgets(self):
+        self.seed(SMALL_SCALE)
+        small = self.measure_all()
+        self.seed(LARGE_SCALE)
+        large = self.measure_all()
+
+        offenders = []
+        for key, (status_code, queries, db_ms, wall_ms) in large.items():
+            max_queries, max_db_ms, max_wall_ms = ENDPOINT_BUDGETS[key]
+            problems = []
+            expected = EXPECTED_STATUS.get(key, 200)
+            if status_code != expected or small[key][0] != expected:
+                problems.append(f"status {small[key][0]}/{status_code}, expected {expected}")
+            if len(queries) != len(small[key][1]):
+                problems.append(f"queries grew {len(small[key][1])} -> {len(queries)} with data")
+            if len(queries) > max_queries:
+                problems.append(f"{len(queries)} queries > {max_queries}")
+            if CHECK_TIMINGS and db_ms > max_db_ms:
+                problems.append(f"DB {db_ms:.1f}ms > {max_db_ms}ms")
+            if CHECK_TIMINGS and wall_ms > max_wall_ms:
+                problems.append(f"wall {wall_ms:.1f}ms > {max_wall_ms}ms")
+            if not problems:
+                continue
+
+            report = [f"{key[1].upper()} {key[0]}: {'; '.join(problems)}"]
+            repeated = Counter(normalize_sql(query['sql']) for query in queries)
+            for sql, count in repeated.most_common():
+                if count < 2:
+                    break
+                report.append(f"    {count}x {sql[:300]}")
+            offenders.append('\n'.join(report))
+
+        if offenders:
+            self.fail('Endpoint budgets exceeded:\n' + '\n'.join(offenders))
+        self.assertEqual(self.unexpected_calls, [], 'Views reached upstream past the stubs')
+
+
+class VersionedResponseTests(TestCase):
+    """Cached pair/strategy lists follow writes this process never saw"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('cached', 'cached@test.com', 'testpass')
+        cls.btc = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.eth = TradingPair.objects.create(symbol='ETHUSDT', base_asset='ETH', quote_asset='USDT')
+        cls.strategy = TradingStrategy.objects.create(
+            user=cls.user, name='Cached DCA', strategy_type='dca', trading_pair=cls.btc, amount=Decimal('0.01'),
+        )
+
+    def setUp(self):
+        response_cache.clear()
+
+    def get(self, name, etag=None):
+        headers = {'HTTP_ACCEPT': 'application/json'}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(reverse(name), **headers)
+
+    def test_unchanged_list_is_not_modified(self):
+        first = self.get('trading-pair-list')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get('trading-pair-list', first['ETag']).status_code, 304)
+
+    def test_pair_write_from_another_process_changes_list(self):
+        first = self.get('trading-pair-list')
+        # Queryset updates send no signals, like a write made by another worker or sync_pairs
+        TradingPair.objects.filter(pk=self.eth.pk).update(
+            is_active=False, updated_at=timezone.now() + timedelta(seconds=1),
+        )
+        second = self.get('trading-pair-list', first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual([row['symbol'] for row in second.json()], ['BTCUSDT'])
+
+    def test_strategy_write_from_another_process_changes_list(self):
+        first = self.get('strategy-list')
+        TradingStrategy.objects.filter(pk=self.strategy.pk).update(
+            total_executions=7, updated_at=timezone.now() + timedelta(seconds=1),
+        )
+        second = self.get('strategy-list', first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()[0]['total_executions'], 7)
+
+    def test_strategy_delete_changes_list(self):
+        first = self.get('strategy-list')
+        TradingStrategy.objects.filter(pk=self.strategy.pk).delete()
+        second = self.get('strategy-list', first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), [])
+
+
+class PortfolioValuationTests(TestCase):
+    """Valuation state follows the database, stays bounded and is never handed out for mutation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [User.objects.create_user(f'valued{i}', f'valued{i}@test.com', 'testpass') for i in range(3)]
+        cls.pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        for user in cls.users:
+            UserSettings.objects.create(user=user)
+            PaperTradingPosition.objects.create(
+                user=user, trading_pair=cls.pair, amount=Decimal('1'),
+                average_buy_price=Decimal('90'), total_invested=Decimal('90'),
+            )
+
+    def setUp(self):
+        from .portfolio_valuation import PortfolioValuator
+        self.valuator = PortfolioValuator(max_users=2)
+
+    def portfolio(self, user):
+        return self.valuator.get_portfolio(user, price_source=lambda symbol, pair_id: STUB_PRICE)
+
+    def test_fill_from_another_process_is_seen_on_next_read(self):
+        user = self.users[0]
+        self.assertEqual(self.portfolio(user)['total_value'], 10100.0)
+        # Written the way another worker would: no in-process hooks reach this valuator
+        position = PaperTradingPosition.objects.get(user=user)
+        position.amount = Decimal('2')
+        position.save()
+        user_settings = UserSettings.objects.get(user=user)
+        user_settings.paper_balance_usdt -= Decimal('100')
+        user_settings.save()
+        portfolio = self.portfolio(user)
+        self.assertEqual(portfolio['positions'][0]['amount'], 2.0)
+        self.assertEqual(portfolio['total_value'], 10100.0)
+
+    def test_returns_copies(self):
+        user = self.users[0]
+        self.portfolio(user)['positions'][0]['value'] = -1
+        self.portfolio(user)['cash_balance'] = -1
+        portfolio = self.portfolio(user)
+        self.assertEqual(portfolio['positions'][0]['value'], 100.0)
+        self.assertEqual(portfolio['cash_balance'], 10000.0)
+
+    def test_snapshot_prices_mark_only_the_copy(self):
+        user, other = self.users[:2]
+        self.portfolio(other)
+        marked = self.valuator.get_portfolio(
+            user, price_source=lambda symbol, pair_id: STUB_PRICE, prices={'BTCUSDT': Decimal('120')}
+        )
+        self.assertEqual(marked['positions'][0]['current_price'], 120.0)
+        self.assertEqual(marked['total_value'], 10120.0)
+        self.assertEqual(self.valuator._prices['BTCUSDT'][0], STUB_PRICE)
+        self.assertEqual(self.portfolio(user)['total_value'], 10100.0)
+        self.assertEqual(self.portfolio(other)['total_value'], 10100.0)
+
+    def test_unpriced_positions_are_listed_apart(self):
+        from .price_feed import PriceUnavailable
+
+        def unavailable(symbol, pair_id):
+            raise PriceUnavailable('down')
+
+        portfolio = self.valuator.get_portfolio(self.users[0], price_source=unavailable)
+        self.assertEqual(portfolio['positions'], [])
+        self.assertEqual([position['symbol'] for position in portfolio['unpriced_positions']], ['BTCUSDT'])
+        self.assertEqual(portfolio['positions_value'], 0.0)
+        self.assertEqual(portfolio['total_value'], 10000.0)
+
+    def test_least_recently_read_users_are_evicted(self):
+        for user in self.users:
+            self.portfolio(user)
+        self.assertEqual(list(self.valuator._states), [self.users[1].pk, self.users[2].pk])
+        self.assertEqual(self.valuator._holders['BTCUSDT'], {self.users[1].pk, self.users[2].pk})
+        self.portfolio(self.users[1])
+        self.portfolio(self.users[0])
+        self.assertEqual(list(self.valuator._states), [self.users[1].pk, self.users[0].pk])
+
+
+class ReplicaStickinessTests(TestCase):
+    """Read-your-writes flags must be visible to every worker process"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        replica = mock.patch.dict(settings.DATABASES, {'replica': settings.DATABASES['default']})
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def test_process_local_cache_disables_replica(self):
+        with override_settings(REPLICA_STICKY_CACHE='default'):
+            self.assertFalse(db_router.replica_configured())
+            with db_router.read_replica(1) as use_replica:
+                self.assertFalse(use_replica)
+
+    def test_sticky_flag_is_shared_between_processes(self):
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.dir.name}
+        caches_setting = {**settings.CACHES, 'shared': shared}
+        with override_settings(CACHES=caches_setting, REPLICA_STICKY_CACHE='shared'):
+            self.assertTrue(db_router.replica_configured())
+            self.assertFalse(db_router.is_primary_sticky(7))
+            db_router.mark_primary_sticky(7)
+            # A separate cache instance on the same location stands in for another worker
+            other_worker = FileBasedCache(self.dir.name, {})
+            self.assertIsNotNone(other_worker.get(db_router._sticky_key(7)))
+            with mock.patch.object(db_router.replica_health, 'healthy', return_value=True):
+                with db_router.read_replica(7) as use_replica:
+                    self.assertFalse(use_replica)
+                with db_router.read_replica(8) as use_replica:
+                    self.assertTrue(use_replica)
+
+
+class DashboardSnapshotTests(TestCase):
+    """Cached snapshots expire on writes from any process; prices are fetched outside the transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('dashboard', 'dashboard@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user)
+        cls.pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+
+    def setUp(self):
+        from .dashboard import dashboard_builder
+        cache.clear()
+        self.builder = dashboard_builder
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        for patcher in (
+            mock.patch('trading.dashboard.price_board.get_price', return_value=None),
+            mock.patch.object(PaperTradingService, 'get_all_prices', return_value={'BTCUSDT': STUB_PRICE}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def order_ids(self):
+        snapshot = self.builder.get_snapshot(self.user, {'orders': None})
+        return [order['id'] for order in snapshot['orders']]
+
+    def create_order_elsewhere(self):
+        # Another process's signal handlers never reach this process's cache
+        with mock.patch('trading.signals.invalidate_dashboard'):
+            return Order.objects.create(
+                user=self.user, trading_pair=self.pair, order_type='market', order_side='buy', amount=Decimal('1'),
+            )
+
+    @override_settings(DASHBOARD_CACHE_SECONDS=60, DASHBOARD_VERSION_CACHE='default')
+    def test_process_local_cache_checks_the_database_marker(self):
+        self.assertEqual(self.order_ids(), [])
+        order = self.create_order_elsewhere()
+        self.assertEqual(self.order_ids(), [order.id])
+        with self.assertNumQueries(1):  # Just the marker while nothing changes
+            self.assertEqual(self.order_ids(), [order.id])
+
+    def test_shared_cache_carries_invalidations_between_processes(self):
+        from .dashboard import invalidate_dashboard
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.dir.name}
+        with override_settings(CACHES={**settings.CACHES, 'shared': shared}, DASHBOARD_CACHE_SECONDS=60,
+                               DASHBOARD_VERSION_CACHE='shared'):
+            self.assertEqual(self.order_ids(), [])
+            order = self.create_order_elsewhere()
+            with self.assertNumQueries(0):
+                self.assertEqual(self.order_ids(), [])
+            invalidate_dashboard(self.user.pk)  # What the other process's on_commit hook does
+            self.assertEqual(self.order_ids(), [order.id])
+
+    def test_prices_are_fetched_before_the_transaction(self):
+        depth = len(connection.atomic_blocks)
+        seen = []
+        fetch = PaperTradingService.get_all_prices
+        fetch.side_effect = lambda symbols: seen.append(len(connection.atomic_blocks)) or {'BTCUSDT': STUB_PRICE}
+        snapshot = self.builder.build(self.user, {'prices': None, 'portfolio': None})
+        self.assertEqual(seen, [depth])
+        self.assertEqual(snapshot['prices'], {'BTCUSDT': str(STUB_PRICE)})
+
+class RiskMonitorTests(TestCase):
+    """Exits re-read the locked position and never fire on simulated prices"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('risk', 'risk@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user, paper_balance_usdt=Decimal('1000'))
+        cls.btc = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.gold = TradingPair.objects.create(symbol='XAUUSD', base_asset='XAU', quote_asset='USD')
+        for pair in (cls.btc, cls.gold):
+            TradingStrategy.objects.create(
+                user=cls.user, name=f"{pair.symbol} DCA", strategy_type='dca', trading_pair=pair,
+                amount=Decimal('1'), is_active=True,
+            )
+            PaperTradingPosition.objects.create(
+                user=cls.user, trading_pair=pair, amount=Decimal('2'),
+                average_buy_price=Decimal('100'), total_invested=Decimal('200'),
+            )
+
+    def setUp(self):
+        from .risk_monitor import RiskMonitor
+        self.monitor = RiskMonitor()
+        self.monitor.load()
+
+    def balance(self):
+        return UserSettings.objects.get(user=self.user).paper_balance_usdt
+
+    def test_simulated_symbols_are_not_monitored(self):
+        self.assertEqual(list(self.monitor.books), ['BTCUSDT'])
+
+    def test_stop_loss_sells_position_once(self):
+        prices = {'BTCUSDT': Decimal('50')}
+        triggers = self.monitor.find_triggers(prices)
+        self.assertEqual(triggers, [('BTCUSDT', 0, 'stop_loss')])
+        self.assertEqual(self.monitor.execute_exits(triggers, prices), 1)
+        self.assertEqual(self.balance(), Decimal('1100'))
+        self.assertEqual(PaperTradingPosition.objects.get(trading_pair=self.btc).amount, 0)
+
+    def test_position_sold_elsewhere_is_not_sold_again(self):
+        prices = {'BTCUSDT': Decimal('50')}
+        triggers = self.monitor.find_triggers(prices)
+        # run_strategies exits the same position between the load and this tick
+        PaperTradingService().execute_market_sell(self.user, self.btc, Decimal('2'), price=Decimal('50'))
+        self.assertEqual(self.monitor.execute_exits(triggers, prices), 0)
+        self.assertEqual(self.balance(), Decimal('1100'))
+
+
+class CustomStrategyValidationTests(TestCase):
+    """Malformed custom configs are rejected with 400, never a 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        get_user_model().objects.create_user('custom', 'custom@test.com', 'testpass')
+        cls.pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+
+    def post(self, custom_config):
+        return self.client.post(reverse('strategy-list'), {
+            'name': 'Custom',
+            'strategy_type': 'custom',
+            'trading_pair': self.pair.id,
+            'amount': '0.01',
+            'custom_config': custom_config,
+        }, content_type='application/json')
+
+    def rule(self, params):
+        return {'buy_when': [{'left': {'indicator': 'rsi', 'params': params}, 'op': '<', 'right': 30}]}
+
+    def test_malformed_configs_are_rejected(self):
+        for config in (
+            {'buy_when': 'x'},
+            {'buy_when': ['x']},
+            self.rule(['a']),
+            self.rule(14),
+            self.rule([14, 2, 3]),
+            {'buy_when': [{'left': {'indicator': 'sma', 'params': [0]}, 'op': '<', 'right': 30}]},
+            {'buy_when': [{'left': {'indicator': 'ema', 'params': [1]}, 'op': '<', 'right': 30}]},
+            self.rule([1]),
+        ):
+            with self.subTest(config=config):
+                response = self.post(config)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('custom_config', response.json())
+
+    def test_valid_config_is_accepted(self):
+        self.assertEqual(self.post(self.rule([14])).status_code, 201)
+
+    def test_ema_series_without_smoothing_is_the_input(self):
+        from .indicators import ema_series
+        values = [1.0, 2.0, 3.0]
+        self.assertEqual(ema_series(values, 1.0).tolist(), values)
+
+
+class PriceFeedTests(TestCase):
+    """Hedging and circuit breakers across price hosts, with a fake transport"""
+
+    def make_feed(self, answers):
+        """PriceFeed over hosts a and b whose _get answers from `answers` (host -> callable)"""
+        from .price_feed import PriceFeed
+        feed = PriceFeed(hosts=('a', 'b'), budget=1.0, hedge_delay=0.05, failure_threshold=2, reset_seconds=60)
+        self.calls = []
+
+        def fake_get(host, path, params, deadline):
+            self.calls.append(host)
+            breaker = feed.breakers[host]
+            try:
+                data = answers[host]()
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            return data
+
+        feed._get = fake_get
+        self.addCleanup(feed._executor.shutdown)
+        return feed
+
+    def test_breaker_opens_after_threshold_and_probe_closes_it(self):
+        from .price_feed import CircuitBreaker
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow(), 'only one probe while half-open')
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_unlaunched_half_open_host_keeps_its_probe(self):
+        state = {'a_up': True}
+
+        def host_a():
+            if not state['a_up']:
+                raise ConnectionError('a down')
+            return {'price': '1'}
+
+        feed = self.make_feed({'a': host_a, 'b': lambda: {'price': '2'}})
+        feed.breakers['b'].opened_at = time.monotonic() - 120  # b is due a half-open probe
+
+        self.assertEqual(feed.fetch('/p'), {'price': '1'})
+        self.assertEqual(self.calls, ['a'])
+        self.assertFalse(feed.breakers['b'].probing)
+
+        state['a_up'] = False
+        self.assertEqual(feed.fetch('/p'), {'price': '2'})
+        self.assertEqual(feed.breakers['b'].state, 'closed')
+
+    def test_slow_host_is_hedged(self):
+        feed = self.make_feed({'a': lambda: time.sleep(0.5) or {'price': '1'}, 'b': lambda: {'price': '2'}})
+        self.assertEqual(feed.fetch('/p'), {'price': '2'})
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    def test_every_circuit_open_fails_fast(self):
+        from .price_feed import PriceUnavailable
+        feed = self.make_feed({'a': lambda: {}, 'b': lambda: {}})
+        for breaker in feed.breakers.values():
+            breaker.opened_at = time.monotonic()
+        with self.assertRaisesMessage(PriceUnavailable, 'Circuit open'):
+            feed.fetch('/p')
+        self.assertEqual(self.calls, [])
+
+
+class EquityCurveTests(TestCase):
+    """Curve maths, and no caching of bars priced without candles"""
+
+    STEP = 3_600_000
+    BAR0 = 1_700_000_000_000 // STEP * STEP
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('curve', 'curve@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user, paper_balance_usdt=Decimal('900'))
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        order = Order.objects.create(
+            user=cls.user, trading_pair=pair, order_type='market', order_side='buy', status='filled',
+            amount=Decimal('1'), filled_amount=Decimal('1'), filled_price=Decimal('100'),
+        )
+        TradeHistory.objects.create(
+            user=cls.user, order=order, trading_pair=pair, side='buy', price=Decimal('100'),
+            amount=Decimal('1'), total=Decimal('100'),
+            executed_at=datetime.fromtimestamp((cls.BAR0 + 60_000) / 1000, tz=dt_timezone.utc),
+        )
+
+    def setUp(self):
+        from .equity_curve import CandleCache, equity_curves
+        cache.clear()
+        self.closes = {self.BAR0: 100.0, self.BAR0 + self.STEP: 110.0, self.BAR0 + 2 * self.STEP: 120.0}
+        self.available_until = self.BAR0 + 2 * self.STEP
+        self.fetches = 0
+        candles = CandleCache(directory=tempfile.mkdtemp())
+        for patcher in (
+            mock.patch('trading.equity_curve.candle_cache', candles),
+            mock.patch('trading.equity_curve.price_feed.fetch', side_effect=self.fake_klines),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.candles = candles
+        self.curves = equity_curves
+        self.now_ms = self.BAR0 + 3 * self.STEP + 1
+
+    def fake_klines(self, path, params):
+        from .price_feed import PriceUnavailable
+        self.fetches += 1
+        start, end = params.get('startTime', 0), params['endTime']
+        if end > self.available_until:
+            raise PriceUnavailable('upstream down')
+        return [
+            [open_time, '0', '0', '0', str(close)]
+            for open_time, close in sorted(self.closes.items()) if start <= open_time <= end
+        ][:params['limit']]
+
+    def test_equity_is_cash_plus_marked_positions(self):
+        curve = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms)
+        self.assertEqual(curve['bar_times'].tolist(), [self.BAR0 + i * self.STEP for i in range(3)])
+        self.assertEqual(curve['cash'].tolist(), [900.0] * 3)
+        self.assertEqual(curve['positions_value'].tolist(), [100.0, 110.0, 120.0])
+        self.assertEqual(curve['equity'].tolist(), [1000.0, 1010.0, 1020.0])
+        self.assertEqual(curve['complete_until'], self.BAR0 + 2 * self.STEP)
+
+    def test_bars_without_candles_are_not_cached(self):
+        self.available_until = self.BAR0 + self.STEP - 1  # Outage covering the last two bars
+        curve = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms)
+        self.assertIsNone(curve['complete_until'])
+        self.assertEqual(curve['positions_value'].tolist(), [100.0, 100.0, 100.0])
+
+        # Upstream recovers after the retry backoff
+        self.available_until = self.BAR0 + 2 * self.STEP
+        self.candles._failed_at.clear()
+        curve = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms)
+        self.assertEqual(curve['positions_value'].tolist(), [100.0, 110.0, 120.0])
+        self.assertEqual(curve['complete_until'], self.BAR0 + 2 * self.STEP)
+
+    def test_fetch_budget_bounds_a_cold_request(self):
+        curve = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms, fetch_pages=0)
+        self.assertEqual(self.fetches, 0)
+        self.assertIsNone(curve['complete_until'])
+        self.assertEqual(len(curve['bar_times']), 3)
+
+    def test_cached_curve_is_extended_with_new_bars(self):
+        self.curves.get_curve(self.user, '1h', now_ms=self.now_ms)
+        self.closes[self.BAR0 + 3 * self.STEP] = 130.0
+        self.available_until = self.BAR0 + 3 * self.STEP
+        curve = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms + self.STEP)
+        self.assertEqual(curve['positions_value'].tolist(), [100.0, 110.0, 120.0, 130.0])
+
+    def test_archived_fills_stay_on_the_curve(self):
+        from .archive_service import trade_archiver
+        fill = TradeHistory.objects.get(user=self.user)
+        Order.objects.filter(id=fill.order_id).update(created_at=fill.executed_at)
+        before = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms)
+        with mock.patch.object(trade_archiver, 'archive_dir', Path(tempfile.mkdtemp())):
+            at = fill.executed_at
+            self.assertEqual(trade_archiver.archive_month(at.year, at.month), (1, 1))
+            after = self.curves.get_curve(self.user, '1h', now_ms=self.now_ms)
+        self.assertEqual(after['equity'].tolist(), before['equity'].tolist())
+
+
+class TradeArchiveTests(TestCase):
+    """Archiving a month keeps its rows reachable and reported"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('archive', 'archive@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user, paper_balance_usdt=Decimal('10000'))
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        for side, price in (('buy', '100'), ('sell', '120')):
+            order = Order.objects.create(
+                user=cls.user, trading_pair=pair, order_type='market', order_side=side, status='filled',
+                amount=Decimal('1'), filled_amount=Decimal('1'), filled_price=Decimal(price),
+            )
+            OrderLatency.objects.create(
+                order=order, strategy_type='dca', symbol='BTCUSDT', due_at=order.created_at, acked_us=1500,
+            )
+
+    def setUp(self):
+        from .archive_service import trade_archiver
+        patcher = mock.patch.object(trade_archiver, 'archive_dir', Path(tempfile.mkdtemp()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.archiver = trade_archiver
+
+    def archive(self):
+        now = timezone.now()
+        return self.archiver.archive_month(now.year, now.month)
+
+    def test_latency_rows_are_archived_with_their_orders(self):
+        self.assertEqual(self.archive(), (2, 0))
+        self.assertFalse(OrderLatency.objects.exists())
+        self.assertEqual(sorted(row['acked_us'] for row in self.archiver.iter_archived('latency')), [1500, 1500])
+
+    def test_pnl_statement_includes_archived_orders(self):
+        url = reverse('order-pnl-statement')
+        before = self.client.get(url).json()
+        self.archive()
+        self.assertFalse(Order.objects.exists())
+        after = self.client.get(url).json()
+        self.assertEqual(after['archived_trades'], 2)
+        for field in ('total_trades', 'realized_pnl', 'total_volume', 'winning_trades'):
+            self.assertEqual(after[field], before[field], field)
+
+        # Archived months outside the requested range stay excluded
+        after = self.client.get(url, {'filter_type': 'custom', 'from_date': '2000-01-01', 'to_date': '2000-01-31'})
+        self.assertEqual(after.json()['total_trades'], 0)
+
+    def test_indexed_parts_outside_the_request_are_not_read(self):
+        self.archive()
+        later = timezone.now() + timedelta(days=1)
+        with mock.patch('trading.archive_service.gzip.open') as opened:
+            self.assertEqual(list(self.archiver.iter_archived('orders', user_id=self.user.pk + 1)), [])
+            self.assertEqual(list(self.archiver.iter_archived('orders', start=later, user_id=self.user.pk)), [])
+            self.assertIsNotNone(self.archiver.newest('orders'))
+        opened.assert_not_called()
+        self.assertEqual(len(list(self.archiver.iter_archived('orders', user_id=self.user.pk))), 2)
+
+
+class ExportTests(TestCase):
+    """Exports stream hot and archived rows in time order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('export', 'export@test.com', 'testpass')
+        cls.pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.old = datetime(2024, 1, 10, tzinfo=dt_timezone.utc)
+        cls.orders = []
+        for created_at, side, status in (
+            (cls.old, 'buy', 'filled'),
+            (cls.old + timedelta(days=40), 'sell', 'filled'),
+            (cls.old + timedelta(days=5), 'buy', 'pending'),  # Open, so it stays hot
+        ):
+            order = Order.objects.create(
+                user=cls.user, trading_pair=cls.pair, order_type='market', order_side=side, status=status,
+                amount=Decimal('0.5'), filled_amount=Decimal('0.5'), filled_price=Decimal('100.25'),
+            )
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+            cls.orders.append(order)
+
+    def setUp(self):
+        from .archive_service import trade_archiver
+        patcher = mock.patch.object(trade_archiver, 'archive_dir', Path(tempfile.mkdtemp()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.archiver = trade_archiver
+
+    def export_csv(self, filters=None):
+        import csv
+        from .export_service import iter_export
+        content = b''.join(iter_export('orders', filters or {}, 'csv', chunk_size=2)).decode('utf-8')
+        return list(csv.DictReader(content.splitlines()))
+
+    def test_csv_round_trip_includes_archived_months_in_order(self):
+        before = self.export_csv()
+        self.assertEqual(self.archiver.archive_month(2024, 1), (1, 0))
+        after = self.export_csv()
+        self.assertEqual(after, before)
+        self.assertEqual(
+            [row['id'] for row in after], [str(self.orders[i].id) for i in (0, 2, 1)]
+        )
+        first = after[0]
+        self.assertEqual(first['trading_pair_symbol'], 'BTCUSDT')
+        self.assertEqual(Decimal(first['filled_price']), Decimal('100.25'))
+        self.assertEqual(first['strategy_id'], '')
+        self.assertEqual(datetime.fromisoformat(first['created_at']), self.old)
+
+    def test_filters_apply_to_archived_rows(self):
+        self.archiver.archive_month(2024, 1)
+        self.assertEqual(self.export_csv({'side': 'sell'})[0]['id'], str(self.orders[1].id))
+        self.assertEqual(len(self.export_csv({'status': 'filled'})), 2)
+        self.assertEqual(self.export_csv({'from_date': '2024-01-12'})[0]['id'], str(self.orders[2].id))
+        self.assertEqual(self.export_csv({'user_id': str(self.user.pk + 1)}), [])
+
+    @skipUnless(HAS_PYARROW, 'pyarrow is an optional dependency')
+    def test_parquet_round_trip(self):
+        import io
+        import pyarrow.parquet as pq
+        from .export_service import iter_export
+        self.archiver.archive_month(2024, 1)
+        table = pq.read_table(io.BytesIO(b''.join(iter_export('orders', {}, 'parquet', chunk_size=2))))
+        self.assertEqual(table.column('id').to_pylist(), [self.orders[i].id for i in (0, 2, 1)])
+
+    @skipUnless(HAS_PYARROW, 'pyarrow is an optional dependency')
+    def test_arrow_round_trip(self):
+        import pyarrow.ipc as pa_ipc
+        from .export_service import iter_export
+        table = pa_ipc.open_stream(b''.join(iter_export('orders', {}, 'arrow'))).read_all()
+        self.assertEqual(table.num_rows, 3)
+
+
+class OrderBookReplayTests(TestCase):
+    """Local books rebuilt from recorded depth data price paper fills"""
+
+    def replay(self, events):
+        import json
+        from .order_book import OrderBookManager, ReplayDepthSource
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as fh:
+            fh.write('\n'.join(json.dumps(event) for event in events))
+        self.addCleanup(os.remove, fh.name)
+        manager = OrderBookManager()
+        manager.consume(ReplayDepthSource(fh.name))
+        return manager
+
+    def recorded(self):
+        return [
+            {'type': 'snapshot', 'symbol': 'BTCUSDT', 'lastUpdateId': 10,
+             'bids': [['99', '1'], ['98', '2']], 'asks': [['101', '1'], ['102', '1']]},
+            {'type': 'diff', 'symbol': 'BTCUSDT', 'U': 5, 'u': 9, 'b': [], 'a': [['101', '50']]},  # Before snapshot
+            {'type': 'diff', 'symbol': 'BTCUSDT', 'U': 9, 'u': 12, 'b': [], 'a': [['103', '2']]},
+            {'type': 'diff', 'symbol': 'BTCUSDT', 'U': 13, 'u': 13, 'b': [['99', '0']], 'a': []},
+        ]
+
+    def test_diffs_bridge_the_snapshot(self):
+        book = self.replay(self.recorded()).get('BTCUSDT')
+        self.assertIsNotNone(book)
+        self.assertEqual(book.best_ask(), (101.0, 1.0))
+        self.assertEqual(book.best_bid(), (98.0, 2.0))
+
+    def test_fill_walks_levels(self):
+        manager = self.replay(self.recorded())
+        self.assertEqual(manager.fill_price('BTCUSDT', 'buy', 2), Decimal('101.5'))
+        self.assertEqual(manager.fill_price('BTCUSDT', 'sell', 1), Decimal('98.0'))
+
+    @override_settings(PAPER_DEPTH_SHORTFALL_BPS=100)
+    def test_order_deeper_than_book_pays_past_worst_level(self):
+        manager = self.replay(self.recorded())
+        # 4 on the book (101 + 102 + 2 x 103), the other 4 at 103 + 1%
+        price = manager.fill_price('BTCUSDT', 'buy', 8)
+        self.assertAlmostEqual(float(price), (101 + 102 + 206 + 4 * 104.03) / 8)
+        self.assertGreater(price, manager.fill_price('BTCUSDT', 'buy', 4))
+
+    def test_gap_in_diffs_unsyncs_the_book(self):
+        events = self.recorded()
+        events.append({'type': 'diff', 'symbol': 'BTCUSDT', 'U': 20, 'u': 21, 'b': [], 'a': []})
+        self.assertIsNone(self.replay(events).get('BTCUSDT'))
+
+
+    @override_settings(PAPER_ORDER_BOOK_RECONNECT_SECONDS=1.0, PAPER_ORDER_BOOK_RECONNECT_MAX_SECONDS=4.0)
+    def test_reconnects_back_off_until_a_book_syncs(self):
+        from .order_book import LocalOrderBook, OrderBookManager
+
+        class Stop(Exception):
+            pass
+
+        manager = OrderBookManager()
+        manager.books['BTCUSDT'] = LocalOrderBook('BTCUSDT')
+
+        def connect(source):
+            if len(delays) == 4:  # This connection syncs before dropping
+                manager.books['BTCUSDT'].synced = True
+            raise ConnectionError('dropped')
+
+        def sleep(seconds):
+            delays.append(seconds)
+            if len(delays) == 7:
+                raise Stop
+
+        delays = []
+        with mock.patch('trading.order_book.BinanceDepthSource'), \
+                mock.patch.object(manager, 'consume', side_effect=connect), \
+                mock.patch('trading.order_book.random.uniform', side_effect=lambda low, high: high), \
+                mock.patch('trading.order_book.time.sleep', side_effect=sleep):
+            with self.assertRaises(Stop):
+                manager._run_live(['BTCUSDT'])
+        self.assertEqual(delays, [1.0, 2.0, 4.0, 4.0, 1.0, 2.0, 4.0])
+        self.assertFalse(manager.books['BTCUSDT'].synced)
+
+class PriceBoardTests(TestCase):
+    """Readers follow the writer onto a recreated segment"""
+
+    def setUp(self):
+        self.name = f'test_price_board_{os.getpid()}'
+        self.boards = []
+        self.addCleanup(lambda: [board.close() for board in self.boards if board.slots is not None])
+
+    def create(self):
+        from .price_board import PriceBoard
+        board = PriceBoard.create(self.name, 8)
+        self.boards.append(board)
+        return board
+
+    def test_reader_reattaches_after_writer_restart(self):
+        from .price_board import PriceBoardReader
+        reader = PriceBoardReader(self.name, max_age=60)
+        self.create().write(1, 100.0)
+        self.assertEqual(reader.get_price(1), 100.0)
+
+        # A restarted writer replaces the segment; the old mapping is retired
+        self.create().write(1, 200.0)
+        self.assertEqual(reader.get_price(1), 200.0)
+        reader._board.close()
+
+    def test_quiet_writer_keeps_the_same_segment(self):
+        from .price_board import PriceBoardReader
+        board = self.create()
+        board.write(1, 100.0)
+        board.heartbeat(time.time() - 60)
+        reader = PriceBoardReader(self.name, max_age=120)
+        attached = reader._get_board()
+        reader._next_attach = 0.0
+        self.assertIs(reader._get_board(), attached)
+        self.assertEqual(reader.get_price(1), 100.0)
+        attached.close()
+
+
+class StrategyExecutorTests(TestCase):
+    """Strategies on one pair evaluate exits against the tick's shared price"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('executor', 'executor@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user)
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.strategy = TradingStrategy.objects.create(
+            user=cls.user, name='DCA', strategy_type='dca', trading_pair=pair, amount=Decimal('1'),
+        )
+
+    def test_dca_checks_exits_at_snapshot_not_fill_price(self):
+        from .strategy_executor import StrategyExecutor
+        executor = StrategyExecutor()
+        # The order book filled the buy with slippage above the snapshot
+        with mock.patch('trading.order_book.order_books.fill_price', return_value=Decimal('105')), \
+                mock.patch.object(executor, 'check_stop_loss_take_profit') as check:
+            executor.execute_dca_strategy(self.strategy, Decimal('100'))
+        check.assert_called_once_with(self.strategy, Decimal('100'))
+        self.assertEqual(Order.objects.get().filled_price, Decimal('105'))
+
+
+class EnginePoolTests(TestCase):
+    """Live accounts trade through a pooled engine that follows their credentials"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('live', 'live@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user, paper_trading_mode=False, binance_api_key='key-1')
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.strategy = TradingStrategy.objects.create(
+            user=cls.user, name='Live DCA', strategy_type='dca', trading_pair=pair, amount=Decimal('1'),
+            is_active=True,
+        )
+
+    def setUp(self):
+        from .engine_pool import TradingEnginePool
+        self.pool = TradingEnginePool(max_size=2)
+        for patcher in (
+            mock.patch('trading.strategy_executor.engine_pool', self.pool),
+            mock.patch('trading.trading_engine.TradingEngine.dispatch_strategy'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_tick(self, executor=None):
+        from .strategy_executor import StrategyExecutor
+        TradingStrategy.objects.filter(id=self.strategy.id).update(next_execution_at=None)
+        with mock.patch.object(StrategyExecutor, 'get_price_snapshot', return_value=Decimal('100')):
+            (executor or StrategyExecutor()).execute_pending_strategies()
+
+    def test_hot_user_reuses_engine_without_settings_lookup(self):
+        self.run_tick()
+        engine = self.pool._engines[self.user.pk][1]
+        engine.dispatch_strategy.assert_called_once()
+        self.assertFalse(Order.objects.exists())  # Not routed through the paper ledger
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_tick()
+        self.assertIs(self.pool._engines[self.user.pk][1], engine)
+        # Settings arrive joined to the due-strategy query; no separate lookup
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "trading_usersettings"' in q['sql']])
+
+    def test_credentials_saved_elsewhere_rebuild_the_engine(self):
+        self.run_tick()
+        engine = self.pool._engines[self.user.pk][1]
+        # Written the way another process would: the post_save hook never reaches this pool
+        UserSettings.objects.filter(user=self.user).update(binance_api_key='key-2')
+        self.run_tick()
+        rebuilt = self.pool._engines[self.user.pk][1]
+        self.assertIsNot(rebuilt, engine)
+        self.assertEqual(rebuilt.binance.api_key, 'key-2')
+
+    def test_replays_never_trade_live(self):
+        from .strategy_executor import StrategyExecutor
+        tape = mock.Mock(replaying=True, **{'traded_live.return_value': False})  # Recorded as a paper execution
+        executor = StrategyExecutor(tape=tape)
+        with mock.patch.object(executor.paper_trading, 'execute_market_buy') as buy, \
+                mock.patch.object(executor, 'check_stop_loss_take_profit'):
+            self.run_tick(executor)
+        buy.assert_called_once()
+        self.assertEqual(len(self.pool), 0)
+
+
+class SimulationEquivalenceTests(TestCase):
+    """The vectorized and pooled simulations agree with the bar-by-bar reference"""
+
+    def paths(self, n_paths=20, n_steps=300):
+        rng = np.random.default_rng(7)
+        return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_paths, n_steps)), axis=1))
+
+    def test_vectorized_paths_match_single_path_simulation(self):
+        from .simulation import simulate_dca, simulate_dca_paths
+        prices = self.paths()
+        # Uneven blocks exercise the step counter across block boundaries
+        blocks = [prices[:, :100], prices[:, 100:117], prices[:, 117:]]
+        vectorized = simulate_dca_paths(iter(blocks), len(prices), 5, 1.0, 3.0, 4.0, 10000.0)
+        for i, path in enumerate(prices):
+            single = simulate_dca(path.tolist(), 5, 1.0, 3.0, 4.0, 10000.0)
+            self.assertAlmostEqual(vectorized['return_pct'][i], single['return_pct'], places=5)
+            self.assertAlmostEqual(vectorized['max_drawdown_pct'][i], single['max_drawdown_pct'], places=5)
+            exits = vectorized['stop_outs'][i] + vectorized['take_profits'][i]
+            self.assertEqual(vectorized['buys'][i] + exits, single['trades'])
+
+    def test_process_pool_matches_in_process_run(self):
+        from .optimizer import strategy_optimizer
+        closes = self.paths(1, 2000)[0]
+        tasks = [
+            (start, start + 500, step, 1.0, stop_loss, 5.0, 10000.0)
+            for start in (0, 700, 1500) for step in (1, 4) for stop_loss in (2.0, 6.0)
+        ]
+        results = []
+        for workers in (1, 2):
+            with strategy_optimizer._runner(closes, workers) as run:
+                results.append(run(tasks))
+        self.assertEqual(results[0], results[1])
+
+
+class ConversionGraphTests(TestCase):
+    """Conversion paths, balance valuation and graph rebuilds"""
+
+    PAIRS = [
+        ('BTCUSDT', 'BTC', 'USDT'), ('ETHUSDT', 'ETH', 'USDT'), ('ETHBTC', 'ETH', 'BTC'),
+        ('SOLBTC', 'SOL', 'BTC'), ('SOLETH', 'SOL', 'ETH'), ('USDTTRY', 'USDT', 'TRY'),
+        ('XYZABC', 'XYZ', 'ABC'),
+    ]
+    PRICES = {
+        'BTCUSDT': Decimal('50000'), 'ETHUSDT': Decimal('2500'), 'ETHBTC': Decimal('0.05'),
+        'SOLBTC': Decimal('0.002'), 'SOLETH': Decimal('0.04'), 'USDTTRY': Decimal('40'),
+        'XYZABC': Decimal('1'),
+    }
+
+    def test_paths_prefer_direct_then_hub_order(self):
+        from .conversion import ConversionGraph
+        graph = ConversionGraph(self.PAIRS)
+        self.assertEqual(graph.paths['ETH'], (('ETHUSDT', False),))
+        self.assertEqual(graph.paths['SOL'], (('SOLBTC', False), ('BTCUSDT', False)))
+        self.assertEqual(graph.paths['TRY'], (('USDTTRY', True),))
+        self.assertNotIn('XYZ', graph.paths)
+        self.assertEqual(graph.rate('SOL', self.PRICES), Decimal('100'))
+        self.assertEqual(graph.rate('TRY', self.PRICES), Decimal('0.025'))
+        self.assertIsNone(graph.rate('SOL', {'SOLBTC': Decimal('0.002')}))
+
+    def test_value_balances(self):
+        from .conversion import ConversionGraph
+        valued = ConversionGraph(self.PAIRS).value_balances([
+            {'asset': 'BTC', 'free': '0.5', 'locked': '0.5'},
+            {'asset': 'SOL', 'free': '10', 'locked': '0'},
+            {'asset': 'USDT', 'free': '100', 'locked': '0'},
+            {'asset': 'XYZ', 'free': '3', 'locked': '0'},
+            {'asset': 'ETH', 'free': '0', 'locked': '0'},
+        ], self.PRICES)
+        self.assertEqual(valued['total'], Decimal('51100'))
+        self.assertEqual([asset['asset'] for asset in valued['assets']], ['BTC', 'SOL', 'USDT'])
+        self.assertEqual(valued['assets'][1]['path'], ['SOLBTC', 'BTCUSDT'])
+        self.assertEqual(valued['unpriced'], [{'asset': 'XYZ', 'amount': Decimal('3')}])
+
+    def test_cache_rebuilds_only_when_the_universe_changes(self):
+        from .conversion import ConversionGraphCache
+        from .price_feed import PriceUnavailable
+        feed = mock.Mock()
+        feed.fetch.return_value = {'symbols': [
+            {'symbol': symbol, 'baseAsset': base, 'quoteAsset': quote} for symbol, base, quote in self.PAIRS
+        ]}
+        graphs = ConversionGraphCache(feed=feed)
+        first = graphs.get(self.PRICES)
+        self.assertIs(graphs.get(dict(self.PRICES)), first)
+        self.assertEqual(feed.fetch.call_count, 1)
+
+        # A delisted symbol drops out of the rebuilt graph
+        prices = {symbol: price for symbol, price in self.PRICES.items() if symbol != 'USDTTRY'}
+        rebuilt = graphs.get(prices)
+        self.assertEqual(feed.fetch.call_count, 2)
+        self.assertNotIn('TRY', rebuilt.paths)
+
+        # A failed refresh keeps serving the previous graph
+        feed.fetch.side_effect = PriceUnavailable('down')
+        self.assertIs(graphs.get(self.PRICES), rebuilt)
+
+
+class SymbolRulesTests(TestCase):
+    """Orders are snapped onto the exchange's grids and rejected before they reach it"""
+
+    EXCHANGE_INFO = {'symbols': [{
+        'symbol': 'BTCUSDT', 'status': 'TRADING', 'filters': [
+            {'filterType': 'PRICE_FILTER', 'minPrice': '0.01000000', 'maxPrice': '1000000.00000000', 'tickSize': '0.01000000'},
+            {'filterType': 'LOT_SIZE', 'minQty': '0.00001000', 'maxQty': '9000.00000000', 'stepSize': '0.00001000'},
+            {'filterType': 'NOTIONAL', 'minNotional': '5.00000000'},
+        ],
+    }]}
+
+    def setUp(self):
+        from .symbol_rules import SymbolRulesCache
+        self.cache = SymbolRulesCache()
+        self.binance = mock.Mock(base_url='https://api.binance.test')
+        self.binance.get_exchange_info.return_value = self.EXCHANGE_INFO
+        self.rules = self.cache.get(self.binance, 'BTC/USDT')
+
+    def test_quantity_rounds_down_onto_the_step(self):
+        self.assertEqual(self.rules.prepare_order('buy', '0.123456789', '50000')[0], '0.12345')
+
+    def test_limit_prices_round_toward_the_passive_side(self):
+        self.assertEqual(self.rules.prepare_order('buy', '0.1', '50000.019')[1], '50000.01')
+        self.assertEqual(self.rules.prepare_order('sell', '0.1', '50000.011')[1], '50000.02')
+        self.assertEqual(self.rules.prepare_order('sell', '0.1', '50000.01')[1], '50000.01')
+
+    def test_orders_below_min_notional_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'minimum notional'):
+            self.rules.prepare_order('buy', '0.0001', '49999.99')  # 4.99 USDT
+        self.assertEqual(self.rules.prepare_order('buy', '0.0001', '50000'), ('0.0001', '50000'))
+        with self.assertRaisesRegex(ValueError, 'below minimum'):
+            self.rules.prepare_order('buy', '0.000009', '50000')
+
+    def test_concurrent_refreshes_download_exchange_info_once(self):
+        import threading
+        self.cache.invalidate()
+        started = threading.Event()
+
+        def slow_exchange_info():
+            started.set()
+            time.sleep(0.05)
+            return self.EXCHANGE_INFO
+
+        self.binance.get_exchange_info.reset_mock()
+        self.binance.get_exchange_info.side_effect = slow_exchange_info
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get(self.binance, 'BTCUSDT')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(started.is_set())
+        self.assertEqual(self.binance.get_exchange_info.call_count, 1)
+        self.assertEqual(len({id(rules) for rules in results}), 1)
+
+class SyncPairsTests(TestCase):
+    """sync_pairs upserts the quoted universe, deactivates delistings and leaves other pairs alone"""
+
+    EXCHANGE_INFO = {'symbols': [
+        {'symbol': 'BTCUSDT', 'baseAsset': 'BTC', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+        {'symbol': 'ETHUSDT', 'baseAsset': 'ETH', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+        {'symbol': 'ETHBTC', 'baseAsset': 'ETH', 'quoteAsset': 'BTC', 'status': 'TRADING'},
+        {'symbol': 'HALTUSDT', 'baseAsset': 'HALT', 'quoteAsset': 'USDT', 'status': 'BREAK'},
+    ]}
+
+    @classmethod
+    def setUpTestData(cls):
+        TradingPair.objects.create(symbol='BTCUSDT', base_asset='XBT', quote_asset='USDT')
+        TradingPair.objects.create(symbol='OLDUSDT', base_asset='OLD', quote_asset='USDT')
+        TradingPair.objects.create(symbol='XAUUSD', base_asset='XAU', quote_asset='USD')
+
+    def sync(self):
+        import io
+        import json
+        from django.core.management import call_command
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as fh:
+            json.dump(self.EXCHANGE_INFO, fh)
+        self.addCleanup(os.remove, fh.name)
+        out = io.StringIO()
+        call_command('sync_pairs', file=fh.name, stdout=out)
+        return out.getvalue()
+
+    def pairs(self):
+        return {
+            symbol: (base_asset, is_active, updated_at)
+            for symbol, base_asset, is_active, updated_at in TradingPair.objects.values_list(
+                'symbol', 'base_asset', 'is_active', 'updated_at'
+            )
+        }
+
+    def test_inserts_updates_and_deactivates(self):
+        untouched = TradingPair.objects.get(symbol='XAUUSD').updated_at
+        self.assertIn('added 1, updated 1, deactivated 1', self.sync())
+        pairs = self.pairs()
+        self.assertEqual(set(pairs), {'BTCUSDT', 'ETHUSDT', 'OLDUSDT', 'XAUUSD'})
+        self.assertEqual(pairs['BTCUSDT'][:2], ('BTC', True))
+        self.assertEqual(pairs['ETHUSDT'][:2], ('ETH', True))
+        self.assertEqual(pairs['OLDUSDT'][:2], ('OLD', False))
+        self.assertEqual(pairs['XAUUSD'], ('XAU', True, untouched))
+
+    def test_rerun_is_a_no_op(self):
+        self.sync()
+        before = self.pairs()
+        self.assertIn('added 0, updated 0, deactivated 0', self.sync())
+        self.assertEqual(self.pairs(), before)
+
+    def test_relisted_pair_is_reactivated(self):
+        self.sync()
+        self.EXCHANGE_INFO = {'symbols': self.EXCHANGE_INFO['symbols'] + [
+            {'symbol': 'OLDUSDT', 'baseAsset': 'OLD', 'quoteAsset': 'USDT', 'status': 'TRADING'},
+        ]}
+        self.assertIn('added 0, updated 1, deactivated 0', self.sync())
+        self.assertTrue(self.pairs()['OLDUSDT'][1])
+
+class ProfilingTests(TestCase):
+    """Requests are profiled only when opted in, and leave a profile plus metadata behind"""
+
+    def setUp(self):
+        from django.test import RequestFactory
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.factory = RequestFactory()
+
+    def middleware(self, **overrides):
+        from django.http import HttpResponse
+        from trading_backend.profiling import ProfilingMiddleware
+        options = {'PROFILING_ENABLED': True, 'PROFILING_TOKEN': 'secret', 'PROFILING_SAMPLE_RATE': 0.0,
+                   'PROFILING_DIR': self.dir.name, 'PROFILING_INTERVAL_MS': 1, **overrides}
+        override = self.settings(**options)  # Read again when the profile is dumped
+        override.enable()
+        self.addCleanup(override.disable)
+        return ProfilingMiddleware(lambda request: HttpResponse('ok'))
+
+    def files(self):
+        return sorted(path.suffix for path in Path(self.dir.name).iterdir())
+
+    def test_disabled_middleware_is_removed(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware(PROFILING_ENABLED=False)
+
+    def test_only_opted_in_requests_are_profiled(self):
+        middleware = self.middleware()
+        self.assertNotIn('X-Profile-File', middleware(self.factory.get('/api/trading/pairs/')))
+        self.assertNotIn('X-Profile-File', middleware(self.factory.get('/api/trading/pairs/', HTTP_X_PROFILE='wrong')))
+        self.assertEqual(self.files(), [])
+
+        sampled = self.middleware(PROFILING_TOKEN='', PROFILING_SAMPLE_RATE=0.25)
+        with mock.patch('trading_backend.profiling.random.random', side_effect=[0.5, 0.1]):
+            self.assertNotIn('X-Profile-File', sampled(self.factory.get('/api/trading/pairs/')))
+            self.assertIn('X-Profile-File', sampled(self.factory.get('/api/trading/pairs/')))
+
+    def test_profile_and_metadata_are_written(self):
+        import json
+        middleware = self.middleware()
+        response = middleware(self.factory.get('/api/trading/pairs/?page=2', HTTP_X_PROFILE='secret',
+                                               HTTP_X_PROFILE_MODE='cprofile'))
+        profile = Path(self.dir.name) / response['X-Profile-File']
+        self.assertEqual(profile.suffix, '.prof')
+        self.assertTrue(profile.stat().st_size > 0)
+        meta = json.loads(profile.with_suffix('.json').read_text())
+        self.assertEqual((meta['mode'], meta['method'], meta['path'], meta['status'], meta['streaming']),
+                         ('cprofile', 'GET', '/api/trading/pairs/?page=2', 200, False))
+        self.assertTrue(profile.name.endswith('-api.trading.pairs.prof'))
+
+    def test_sampler_writes_collapsed_stacks(self):
+        from trading_backend.profiling import Profiler
+
+        def busy_wait():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        with Profiler('sample', interval=0.001) as profiler:
+            busy_wait()
+        path = profiler.dump('busy', directory=self.dir.name)
+        lines = Path(path).read_text().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any('trading.tests:busy_wait' in line for line in lines))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertEqual(sum(int(line.rsplit(' ', 1)[1]) for line in lines), profiler.stacks.total())
+
+class LatencyReportTests(TestCase):
+    """Stage percentiles are computed per group from the stored microsecond offsets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        user = User.objects.create_user('latency', 'latency@test.com', 'testpass')
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        orders = Order.objects.bulk_create([
+            Order(user=user, trading_pair=pair, order_type='market', order_side='buy', amount=Decimal('1'))
+            for _ in range(101)
+        ])
+        due_at = timezone.now() - timedelta(hours=1)
+        # DCA on BTCUSDT: schedule i ms, price +1 ms, persist +2 ms, ack +10 ms for i = 1..100
+        rows = [
+            OrderLatency(order=order, strategy_type='dca', symbol='BTCUSDT', due_at=due_at,
+                         tick_us=i * 1000, price_us=i * 1000 + 1000, persisted_us=i * 1000 + 3000,
+                         acked_us=i * 1000 + 13000)
+            for i, order in enumerate(orders[:100], start=1)
+        ]
+        # One custom order that never got an ack
+        rows.append(OrderLatency(order=orders[100], strategy_type='custom', symbol='BTCUSDT', due_at=due_at,
+                                 tick_us=4000, price_us=5000, persisted_us=6000, acked_us=None))
+        OrderLatency.objects.bulk_create(rows)
+
+    def test_percentiles_per_stage_and_group(self):
+        from .latency import latency_report
+        custom, dca = latency_report()
+        self.assertEqual((dca['group'], dca['count']), ({'strategy_type': 'dca', 'symbol': 'BTCUSDT'}, 100))
+        self.assertEqual(dca['stages']['schedule'], {'p50': 50.5, 'p95': 95.05, 'p99': 99.01})
+        self.assertEqual(dca['stages']['price'], {'p50': 1.0, 'p95': 1.0, 'p99': 1.0})
+        self.assertEqual(dca['stages']['persist'], {'p50': 2.0, 'p95': 2.0, 'p99': 2.0})
+        self.assertEqual(dca['stages']['ack'], {'p50': 10.0, 'p95': 10.0, 'p99': 10.0})
+        self.assertEqual(dca['stages']['total'], {'p50': 63.5, 'p95': 108.05, 'p99': 112.01})
+
+        self.assertEqual(custom['count'], 1)
+        self.assertEqual(custom['stages']['persist'], {'p50': 1.0, 'p95': 1.0, 'p99': 1.0})
+        self.assertEqual(custom['stages']['ack'], {'p50': None, 'p95': None, 'p99': None})
+
+    def test_command_reports_groups(self):
+        import io
+        from django.core.management import call_command
+        out = io.StringIO()
+        call_command('latency_report', by='strategy_type', stdout=out)
+        header, custom, dca, summary = out.getvalue().splitlines()
+        self.assertEqual(header.split('\t')[2:5], ['schedule p50', 'schedule p95', 'schedule p99'])
+        self.assertEqual(dca.split('\t')[:5], ['dca', '100', '50.5', '95.0', '99.0'])
+        self.assertEqual(custom.split('\t')[-3:], ['-', '-', '-'])
+        self.assertIn('2 groups', summary)
+
+class FastSerializerTests(TestCase):
+    """The fast list path renders exactly what the DRF serializers would"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        user = User.objects.create_user('fast', 'fast@test.com', 'testpass')
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        strategy = TradingStrategy.objects.create(
+            user=user, name='Grid ü', strategy_type='dca', trading_pair=pair, amount=Decimal('0.5'),
+        )
+        filled = Order.objects.create(
+            user=user, strategy=strategy, trading_pair=pair, order_type='limit', order_side='sell', status='filled',
+            price=Decimal('43210.12345678'), amount=Decimal('0.00000001'), filled_amount=Decimal('0.00000001'),
+            filled_price=Decimal('43210.1'), exchange_order_id='x-1', filled_at=timezone.now(),
+        )
+        # Nullable columns left empty: no strategy, price, fill or exchange id
+        Order.objects.create(
+            user=user, trading_pair=pair, order_type='market', order_side='buy', amount=Decimal('12345.6789'),
+        )
+        TradeHistory.objects.create(
+            user=user, order=filled, trading_pair=pair, side='sell', price=Decimal('43210.1'),
+            amount=Decimal('0.00000001'), total=Decimal('0.00043210'), fee=Decimal('0'), profit_loss=Decimal('-1.5'),
+        )
+        TradeHistory.objects.create(
+            user=user, order=filled, trading_pair=pair, side='buy', price=Decimal('1E+2'),
+            amount=Decimal('3'), total=Decimal('300'), profit_loss=None,
+        )
+
+    def expected(self, serializer_class, queryset):
+        from rest_framework.renderers import JSONRenderer
+        return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+    def test_rows_match_the_serializers(self):
+        from .fast_serializers import FastJSONRenderer, build_row_plan, serialize_rows, values_queryset
+        from .serializers import OrderSerializer, TradeHistorySerializer
+        for serializer_class, queryset in ((OrderSerializer, Order.objects.order_by('id')),
+                                           (TradeHistorySerializer, TradeHistory.objects.order_by('id'))):
+            with self.subTest(serializer_class.__name__):
+                plan = build_row_plan(serializer_class)
+                self.assertIsNotNone(plan)
+                rows = serialize_rows(plan, values_queryset(plan, queryset))
+                self.assertEqual(rows, serializer_class(queryset, many=True).data)
+                self.assertEqual(FastJSONRenderer().render(rows), self.expected(serializer_class, queryset))
+                with mock.patch('trading.fast_serializers.orjson', None):
+                    self.assertEqual(FastJSONRenderer().render(rows), self.expected(serializer_class, queryset))
+
+    def test_list_endpoints_match_the_serializers(self):
+        from .serializers import OrderSerializer, TradeHistorySerializer
+        for name, serializer_class, queryset in (
+            ('order-list', OrderSerializer, Order.objects.select_related('trading_pair').order_by('-created_at')),
+            ('trade-history-list', TradeHistorySerializer,
+             TradeHistory.objects.select_related('trading_pair').order_by('-executed_at')),
+        ):
+            with self.subTest(name):
+                response = self.client.get(reverse(name), HTTP_ACCEPT='application/json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, self.expected(serializer_class, queryset))
+
+class SimulationLimitTests(TestCase):
+    """Optimize and stress-test requests are bounded before any work starts"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('simulate', 'simulate@test.com', 'testpass')
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.strategy = TradingStrategy.objects.create(
+            user=cls.user, name='DCA', strategy_type='dca', trading_pair=pair, amount=Decimal('1'),
+        )
+
+    def setUp(self):
+        cache.clear()  # Throttle history
+        patcher = mock.patch('trading.equity_curve.candle_cache.get', side_effect=AssertionError('fetched history'))
+        self.candles = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, name, body):
+        return self.client.post(reverse(name, args=[self.strategy.pk]), body, content_type='application/json')
+
+    def test_stress_test_caps_paths_times_steps(self):
+        response = self.post('strategy-stress-test', {'paths': 100000, 'days': 365, 'step_interval': '1h'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stress_test_strategy', response.json()['error'])
+        response = self.post('strategy-stress-test', {'paths': 1, 'days': 365, 'step_interval': '1m'})
+        self.assertEqual(response.status_code, 400)
+        self.candles.assert_not_called()
+
+    def test_stress_test_history_is_capped_and_fetched_within_budget(self):
+        from .equity_curve import CandleCache, KLINES_PAGE
+        from .paper_trading_service import PaperTradingService
+        step = 60_000
+        newest = int(time.time() * 1000) // step * step - step
+        pages = []
+
+        def klines(path, params):
+            pages.append(params)
+            start = params.get('startTime', params['endTime'] - (KLINES_PAGE - 1) * step)
+            times = range(start, min(params['endTime'], start + (KLINES_PAGE - 1) * step) + 1, step)
+            return [[t, '0', '0', '0', str(100 + t // step % 7)] for t in times]
+
+        def run(history_bars):
+            pages.clear()
+            with tempfile.TemporaryDirectory() as directory, \
+                    mock.patch('trading.stress_test.candle_cache', CandleCache(directory=directory)), \
+                    mock.patch('trading.equity_curve.price_feed.fetch', side_effect=klines), \
+                    mock.patch.object(PaperTradingService, 'get_pair_price', return_value=Decimal('250')), \
+                    self.settings(STRESS_TEST_REQUEST_HISTORY_BARS=history_bars, STRESS_TEST_REQUEST_FETCH_PAGES=3):
+                response = self.post('strategy-stress-test', {'paths': 10, 'days': 30, 'step_interval': '1m', 'seed': 1})
+            self.assertEqual(response.status_code, 200)
+            return response.json()
+
+        # 30 days of 1m bars would be 44 pages; the request stops after its budget
+        result = run(10_000)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(result['history_bars'], 3 * KLINES_PAGE)
+        self.assertLess(result['history_complete_until'], newest)
+        self.assertEqual(result['start_price'], 250.0)  # Partial history is older than the current price
+
+        result = run(1500)
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(result['history_bars'], 1500)
+        self.assertEqual(result['history_complete_until'], newest)
+        self.assertEqual(result['start_price'], 100 + newest // step % 7)
+
+    def test_optimize_caps_grid_before_fetching(self):
+        response = self.post('strategy-optimize', {'method': 'grid', 'days': 365})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('optimize_strategy', response.json()['error'])
+        self.candles.assert_not_called()
+
+    def test_optimize_request_runs_without_a_process_pool(self):
+        from .optimizer import strategy_optimizer
+        with mock.patch.object(strategy_optimizer, 'optimize', return_value={'recommended': {}}) as optimize:
+            self.post('strategy-optimize', {})
+        self.assertEqual(optimize.call_args.kwargs['workers'], 1)
+
+    def test_simulation_requests_are_throttled(self):
+        from rest_framework.throttling import ScopedRateThrottle
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'simulation': '2/min'}):
+            codes = [self.post('strategy-stress-test', {'paths': 100000}).status_code for _ in range(3)]
+        self.assertEqual(codes, [400, 400, 429])
+
+
+class ReplayTests(TestCase):
+    """Replays are deterministic and only ever write to a scratch database"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('replay', 'replay@test.com', 'testpass')
+        UserSettings.objects.create(user=cls.user)
+        pair = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.strategy = TradingStrategy.objects.create(
+            user=cls.user, name='DCA', strategy_type='dca', trading_pair=pair, amount=Decimal('1'),
+            execution_interval='15min', is_active=True,
+        )
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.tape = os.path.join(self.dir.name, 'tape.jsonl.gz')
+        for patcher in (
+            mock.patch.object(PaperTradingService, 'get_pair_price', return_value=STUB_PRICE),
+            mock.patch('trading.order_book.order_books.fill_price', return_value=None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def record(self, ticks=3, between=None):
+        from .replay import TapeRecorder
+        from .strategy_executor import StrategyExecutor
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        now = [start]
+        recorder = TapeRecorder(self.tape)
+        executor = StrategyExecutor(clock=lambda: now[0], tape=recorder)
+        for tick in range(ticks):
+            now[0] = start + timedelta(minutes=15 * tick)
+            executor.execute_pending_strategies()
+            if between is not None:
+                between(tick)
+        recorder.close()
+        return list(
+            Order.objects.filter(user=self.user).order_by('id').values_list('order_side', 'amount', 'filled_price')
+        )
+
+    def replay(self, name):
+        from .replay import TapePlayer, scratch_database
+        with scratch_database(os.path.join(self.dir.name, name)):
+            return TapePlayer(self.tape).play()
+
+    def test_replay_is_deterministic_and_leaves_live_data_alone(self):
+        recorded = self.record()
+        self.assertEqual(len(recorded), 3)
+        live_balance = UserSettings.objects.get(user=self.user).paper_balance_usdt
+        live_next = TradingStrategy.objects.get(pk=self.strategy.pk).next_execution_at
+
+        first = self.replay('first.sqlite3')
+        second = self.replay('second.sqlite3')
+        self.assertEqual(first['orders'], second['orders'])
+        self.assertEqual(first['mismatches'], [])
+        self.assertEqual(first['misses'], 0)
+        self.assertEqual(
+            [(order['side'], Decimal(order['amount']), Decimal(order['filled_price'])) for order in first['orders']],
+            recorded,
+        )
+
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(UserSettings.objects.get(user=self.user).paper_balance_usdt, live_balance)
+        self.assertEqual(TradingStrategy.objects.get(pk=self.strategy.pk).next_execution_at, live_next)
+
+    def test_exits_outside_the_executor_are_flagged_and_replayed_from_the_tape(self):
+        def risk_monitor_exit(tick):
+            if tick == 1:  # A stop-loss fired by run_risk_monitor, which the tape cannot observe
+                PaperTradingService().execute_market_sell(self.user, self.strategy.trading_pair, Decimal('2'))
+
+        self.record(between=risk_monitor_exit)
+        live_position = PaperTradingPosition.objects.get(user=self.user)
+        result = self.replay('diverged.sqlite3')
+        self.assertEqual(len(result['orders']), 3)  # The executor's own orders only
+        self.assertEqual([divergence['t'] for divergence in result['divergences']],
+                         [int(datetime(2024, 1, 1, 0, 30, tzinfo=dt_timezone.utc).timestamp() * 1000)])
+        self.assertEqual(result['divergences'][0]['recorded'][1], {})
+        self.assertEqual(result['mismatches'], [])
+
+        from .replay import TapePlayer, scratch_database
+        with scratch_database(os.path.join(self.dir.name, 'committed.sqlite3')):
+            TapePlayer(self.tape).play(commit=True)
+            replayed = PaperTradingPosition.objects.get(user_id=self.user.pk)
+        self.assertEqual(replayed.amount, live_position.amount)
+
+    def test_live_executions_are_skipped_in_replay(self):
+        UserSettings.objects.filter(user=self.user).update(paper_trading_mode=False)
+        with mock.patch('trading.strategy_executor.engine_pool.get_engine') as get_engine:
+            self.assertEqual(self.record(), [])
+        self.assertEqual(get_engine.return_value.dispatch_strategy.call_count, 3)
+        result = self.replay('live.sqlite3')
+        self.assertEqual((result['orders'], result['live_skipped']), ([], 3))
+
+    def test_refuses_live_database(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .replay import TapePlayer, scratch_database
+        self.record(ticks=1)
+        with self.assertRaises(ValueError):
+            with scratch_database(connection.settings_dict['NAME']):
+                pass
+        with self.assertRaises(ValueError):
+            TapePlayer(self.tape).play()
+        with self.assertRaises(CommandError):
+            call_command('run_strategies', replay=self.tape)
+
+
+class TradeImportTests(TestCase):
+    """Imported fills rebuild positions like the paper ledger, with fresh order ids"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('importer', 'importer@test.com', 'testpass')
+        cls.btc = TradingPair.objects.create(symbol='BTCUSDT', base_asset='BTC', quote_asset='USDT')
+        cls.eth = TradingPair.objects.create(symbol='ETHUSDT', base_asset='ETH', quote_asset='USDT')
+
+    def imported(self, trade_id, side, price, minute, symbol='BTCUSDT'):
+        from .trade_import import ImportedTrade
+        return ImportedTrade(
+            trade_id=str(trade_id), order_id=None, symbol=symbol, side=side, price=Decimal(price),
+            quantity=Decimal('1'), fee=Decimal('0'), executed_at=timezone.now() - timedelta(minutes=60 - minute),
+        )
+
+    def test_cost_basis_resets_when_position_is_closed(self):
+        from .trade_import import TradeImporter
+        # A paper fill on the same pair must not be blended into the imported ledger
+        PaperTradingService().execute_market_buy(self.user, self.btc, Decimal('1'), price=Decimal('10'))
+        TradeImporter(self.user).run([
+            self.imported(1, 'buy', '100', 1),
+            self.imported(2, 'sell', '200', 2),
+            self.imported(3, 'buy', '50', 3),
+        ])
+        position = PaperTradingPosition.objects.get(user=self.user, trading_pair=self.btc)
+        self.assertEqual(position.amount, Decimal('1'))
+        self.assertEqual(position.average_buy_price, Decimal('50'))
+
+    def test_pairs_without_imported_fills_are_untouched(self):
+        from .trade_import import TradeImporter
+        PaperTradingService().execute_market_buy(self.user, self.eth, Decimal('2'), price=Decimal('10'))
+        TradeImporter(self.user).run([self.imported(1, 'buy', '100', 1)])
+        position = PaperTradingPosition.objects.get(user=self.user, trading_pair=self.eth)
+        self.assertEqual((position.amount, position.average_buy_price), (Decimal('2'), Decimal('10')))
+
+    def test_identical_csv_rows_are_separate_fills(self):
+        from .trade_import import TradeImporter, iter_trades
+        row = '2024-01-02 03:04:05,BTCUSDT,BUY,100,1BTC,100USDT,0.001BTC'
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('\n'.join(['Date(UTC),Pair,Side,Price,Executed,Amount,Fee', row, row,
+                                 '2024-01-02 03:05:00,BTCUSDT,SELL,110,1BTC,110USDT,0.1USDT']))
+        self.addCleanup(os.remove, fh.name)
+
+        TradeImporter(self.user).run(iter_trades(fh.name))
+        self.assertEqual(TradeHistory.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(PaperTradingPosition.objects.get(user=self.user, trading_pair=self.btc).amount, Decimal('1'))
+
+        # Re-importing the same file derives the same ids
+        stats = TradeImporter(self.user).run(iter_trades(fh.name))
+        self.assertEqual(stats['imported'], 0)
+        self.assertEqual(TradeHistory.objects.filter(user=self.user).count(), 3)
+
+    def test_ids_freed_by_archiving_are_not_reused(self):
+        from .trade_import import TradeImporter
+        service = PaperTradingService()
+        for _ in range(3):
+            service.execute_market_buy(self.user, self.eth, Decimal('1'), price=Decimal('10'))
+        highest = Order.objects.order_by('-id').first()
+        highest_id = highest.id
+        highest.delete()  # As archive_trades does for closed months
+
+        TradeImporter(self.user).run([self.imported(1, 'buy', '100', 1)], rebuild_positions=False)
+        self.assertGreater(Order.objects.get(is_paper_trade=False).id, highest_id)
@@ -0,0 +1,327 @@
+"""
+Trade Import Service
+Bulk imports historical Binance fills and rebuilds paper positions from them
+"""
+import csv
+import hashlib
+import itertools
+import json
+import re
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Order, TradeHistory, TradingPair, PaperTradingPosition
+from .portfolio_valuation import portfolio_valuator
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+
+_NUMBER = re.compile(r'^-?[\d.]+(?:[eE]-?\d+)?')
+
+
+def _number(value):
+    """Parse '0.00100000BTC' / '89.5' style export values"""
+    match = _NUMBER.match(str(value).strip().replace(',', ''))
+    return Decimal(match.group(0)) if match else Decimal('0')
+
+
+class ImportedTrade:
+    """One normalized fill from an exchange export"""
+
+    __slots__ = ('trade_id', 'order_id', 'symbol', 'side', 'price', 'quantity', 'fee', 'executed_at')
+
+    def __init__(self, trade_id, order_id, symbol, side, price, quantity, fee, executed_at):
+        self.trade_id = trade_id
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.fee = fee
+        self.executed_at = executed_at
+
+
+def _from_csv_row(row, occurrences):
+    """
+    Normalize a Binance spot trade-history CSV row.
+    Handles both the 'Date(UTC),Pair,Side,Price,Executed,Amount,Fee' layout and the
+    older 'Date(UTC),Market,Type,Price,Amount,Total,Fee,Fee Coin' layout.
+    occurrences counts the rows of the file seen so far per content hash.
+    """
+    executed_at = datetime.strptime(row['Date(UTC)'].strip(), '%Y-%m-%d %H:%M:%S').replace(tzinfo=dt_timezone.utc)
+    symbol = (row.get('Pair') or row.get('Market') or '').strip().replace('/', '')
+    side = (row.get('Side') or row.get('Type') or '').strip().lower()
+    quantity = _number(row['Executed'] if 'Executed' in row else row['Amount'])
+
+    trade_id = row.get('TradeId') or row.get('Trade ID')
+    if not trade_id:
+        # UI exports carry no trade id; derive a stable one from the row contents
+        content = '|'.join(str(row[key]) for key in sorted(row) if key is not None)
+        trade_id = 'csv:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+        # Identical fills (same second, price and size) are told apart by their
+        # position among the file's identical rows; the first keeps the bare hash
+        ordinal = occurrences[trade_id]
+        occurrences[trade_id] += 1
+        if ordinal:
+            trade_id = f'{trade_id}#{ordinal}'
+
+    return ImportedTrade(
+        trade_id=str(trade_id),
+        order_id=row.get('OrderId') or row.get('Order ID') or None,
+        symbol=symbol,
+        side=side,
+        price=_number(row['Price']),
+        quantity=quantity,
+        fee=_number(row.get('Fee', '0')),
+        executed_at=executed_at,
+    )
+
+
+def _from_api_trade(trade):
+    """Normalize a /v3/myTrades JSON object"""
+    return ImportedTrade(
+        trade_id=str(trade['id']),
+        order_id=str(trade['orderId']) if trade.get('orderId') is not None else None,
+        symbol=trade['symbol'],
+        side='buy' if trade.get('isBuyer') else 'sell',
+        price=Decimal(str(trade['price'])),
+        quantity=Decimal(str(trade['qty'])),
+        fee=Decimal(str(trade.get('commission', '0'))),
+        executed_at=datetime.fromtimestamp(trade['time'] / 1000, tz=dt_timezone.utc),
+    )
+
+
+def iter_trades(path, file_format='auto'):
+    """
+    Stream normalized trades from a CSV export, JSON lines or a JSON array of myTrades objects.
+    CSV and JSON lines are read row by row; a JSON array is loaded in one piece.
+    """
+    if file_format == 'auto':
+        file_format = 'csv' if str(path).lower().endswith('.csv') else 'json'
+
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        if file_format == 'csv':
+            occurrences = Counter()
+            for row in csv.DictReader(fh):
+                yield _from_csv_row(row, occurrences)
+            return
+
+        first = fh.read(1)
+        while first and first.isspace():
+            first = fh.read(1)
+        if first == '[':
+            for trade in json.loads(first + fh.read()):
+                yield _from_api_trade(trade)
+        elif first:
+            for line in itertools.chain([first + fh.readline()], fh):
+                if line.strip():
+                    yield _from_api_trade(json.loads(line))
+
+
+ORDER_COLUMNS = (
+    'id', 'user', 'strategy', 'trading_pair', 'order_type', 'order_side', 'status',
+    'price', 'amount', 'filled_amount', 'filled_price', 'is_paper_trade', 'exchange_order_id',
+    'created_at', 'updated_at', 'filled_at',
+)
+TRADE_COLUMNS = (
+    'user', 'order', 'trading_pair', 'side', 'price', 'amount',
+    'total', 'fee', 'profit_loss', 'exchange_trade_id', 'executed_at',
+)
+
+
+def _allocate_ids(model, count):
+    """Reserve primary keys up front so orders and their trades can be written without RETURNING"""
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"SELECT nextval(pg_get_serial_sequence('{model._meta.db_table}', 'id')) "
+                f"FROM generate_series(1, %s)",
+                [count]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+        # Take the write lock before reading the counters so concurrent writers cannot interleave
+        cursor.execute(f"UPDATE {table} SET id = id WHERE 0 = 1")
+        # AUTOINCREMENT tables remember ids freed by archiving in sqlite_sequence, which
+        # MAX(id) does not; inserting above it advances the sequence past our block
+        cursor.execute(
+            f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = %s), 0), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0))",
+            [model._meta.db_table]
+        )
+        start = cursor.fetchone()[0] + 1
+        return list(range(start, start + count))
+
+
+def _db_adapters():
+    """
+    (decimal, datetime) value adapters for the active backend.
+    psycopg adapts Python values itself; sqlite3 needs strings, in the same
+    naive-UTC text form Django writes.
+    """
+    if connection.vendor == 'postgresql':
+        return (lambda value: value), (lambda value: value)
+    return (
+        lambda value: None if value is None else str(value),
+        lambda value: str(value.astimezone(dt_timezone.utc).replace(tzinfo=None)),
+    )
+
+
+def _bulk_insert(model, fields, rows):
+    """
+    Insert backend-adapted row tuples, bypassing per-object ORM overhead.
+    Uses COPY on PostgreSQL and executemany elsewhere.
+    """
+    columns = [model._meta.get_field(name).column for name in fields]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_sql = ', '.join(connection.ops.quote_name(column) for column in columns)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with cursor.cursor.copy(f"COPY {table} ({column_sql}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+            return
+
+        placeholders = ', '.join(['%s'] * len(columns))
+        cursor.executemany(f"INSERT INTO {table} ({column_sql}) VALUES ({placeholders})", rows)
+
+
+class TradeImporter:
+    """Batches imported fills into bulk Order/TradeHistory inserts"""
+
+    def __init__(self, user, batch_size=DEFAULT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.pairs = dict(TradingPair.objects.values_list('symbol', 'id'))
+        self.stats = {'imported': 0, 'duplicates': 0, 'unknown_symbol': 0}
+        self.unknown_symbols = set()
+        self._seen = set()
+
+    def run(self, trades, rebuild_positions=True):
+        """Import an iterable of ImportedTrade, then optionally rebuild positions"""
+        batch = []
+        for trade in trades:
+            batch.append(trade)
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+
+        if rebuild_positions:
+            rebuild_positions_for_user(self.user)
+        return self.stats
+
+    def _import_batch(self, batch):
+        candidates = []
+        for trade in batch:
+            if trade.trade_id in self._seen:
+                self.stats['duplicates'] += 1
+                continue
+            self._seen.add(trade.trade_id)
+
+            if trade.symbol not in self.pairs:
+                self.stats['unknown_symbol'] += 1
+                self.unknown_symbols.add(trade.symbol)
+                continue
+            candidates.append(trade)
+
+        existing = set(
+            TradeHistory.objects
+            .filter(user=self.user, exchange_trade_id__in=[t.trade_id for t in candidates])
+            .values_list('exchange_trade_id', flat=True)
+        )
+        new_trades = [t for t in candidates if t.trade_id not in existing]
+        self.stats['duplicates'] += len(candidates) - len(new_trades)
+        if not new_trades:
+            return
+
+        dec, dt = _db_adapters()
+        now = dt(timezone.now())
+        user_id = self.user.pk
+
+        with transaction.atomic():
+            order_ids = _allocate_ids(Order, len(new_trades))
+            order_rows = []
+            trade_rows = []
+            for order_id, t in zip(order_ids, new_trades):
+                pair_id = self.pairs[t.symbol]
+                executed_at = dt(t.executed_at)
+                price = dec(t.price)
+                quantity = dec(t.quantity)
+                order_rows.append((
+                    order_id, user_id, None, pair_id, 'market', t.side, 'filled',
+                    price, quantity, quantity, price, False, t.order_id,
+                    executed_at, now, executed_at,
+                ))
+                trade_rows.append((
+                    user_id, order_id, pair_id, t.side, price, quantity,
+                    dec(t.price * t.quantity), dec(t.fee), None, t.trade_id, executed_at,
+                ))
+
+            _bulk_insert(Order, ORDER_COLUMNS, order_rows)
+            _bulk_insert(TradeHistory, TRADE_COLUMNS, trade_rows)
+
+        self.stats['imported'] += len(new_trades)
+
+
+def rebuild_positions_for_user(user):
+    """
+    Recompute the user's PaperTradingPosition rows from imported fills (those
+    with an exchange trade id) in one ordered pass. Only pairs with imported
+    fills are rewritten, and paper fills are not blended in. Positions use
+    average cost like the paper ledger: buys move the average, sells keep it,
+    and the cost basis resets whenever the position is fully sold.
+    """
+    fills = (
+        TradeHistory.objects
+        .filter(user=user, exchange_trade_id__isnull=False)
+        .order_by('trading_pair_id', 'executed_at', 'id')
+        .values_list('trading_pair_id', 'side', 'amount', 'total')
+    )
+
+    ledgers = {}  # pair id -> [amount, cost of the amount held]
+    for pair_id, side, amount, total in fills.iterator(chunk_size=DEFAULT_BATCH_SIZE):
+        ledger = ledgers.setdefault(pair_id, [Decimal('0'), Decimal('0')])
+        if side == 'buy':
+            ledger[0] += amount
+            ledger[1] += total
+        elif ledger[0] > 0:
+            sold = min(amount, ledger[0])
+            ledger[1] -= ledger[1] * sold / ledger[0]
+            ledger[0] -= sold
+        if ledger[0] <= 0:
+            ledger[0] = ledger[1] = Decimal('0')
+
+    positions = []
+    for pair_id, (amount, cost) in ledgers.items():
+        if amount > 0:
+            average = (cost / amount).quantize(Decimal('0.00000001'))
+            invested = (amount * average).quantize(Decimal('0.00000001'))
+        else:
+            average = invested = Decimal('0')
+        positions.append(PaperTradingPosition(
+            user=user,
+            trading_pair_id=pair_id,
+            amount=amount,
+            average_buy_price=average,
+            total_invested=invested,
+        ))
+
+    with transaction.atomic():
+        PaperTradingPosition.objects.bulk_create(
+            positions,
+            update_conflicts=True,
+            unique_fields=['user', 'trading_pair'],
+            update_fields=['amount', 'average_buy_price', 'total_invested', 'updated_at'],
+        )
+        # bulk writes skip model signals, so drop the cached valuation explicitly
+        transaction.on_commit(lambda: portfolio_valuator.invalidate(user.pk))
+
+    return len(positions)
@@ -7,6 +7,11 @@ from decimal import Decimal
 from django.utils import timezone
 from .models import TradingStrategy, Order, TradeHistory, UserSettings
 from .binance_service import BinanceService
+from .conversion import conversion_graphs, VALUATION_ASSET
+from .price_feed import price_feed
+from .symbol_rules import symbol_rules_cache
+from .custom_strategy import evaluate_custom_strategy
+from .latency import trace_strategy, price_observed, order_persisted, order_acked
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,9 +20,9 @@ logger = logging.getLogger(__name__)
 class TradingEngine:
     """Main trading engine for executing automated strategies"""
 
-    def __init__(self, user):
+    def __init__(self, user, user_settings: UserSettings = None):
         self.user = user
-        self.user_settings = UserSettings.objects.get_or_create(user=user)[0]
+        self.user_settings = user_settings or UserSettings.objects.get_or_create(user=user)[0]
         self.binance = BinanceService(
             api_key=self.user_settings.binance_api_key,
             api_secret=self.user_settings.binance_api_secret,
@@ -30,6 +35,11 @@ class TradingEngine:
             logger.info(f"Strategy {strategy.name} is not active")
             return None
 
+        with trace_strategy(strategy, due_at=timezone.now()):
+            return self.dispatch_strategy(strategy)
+
+    def dispatch_strategy(self, strategy: TradingStrategy):
+        """Run one strategy inside the caller's latency trace (see StrategyExecutor)"""
         if strategy.strategy_type == 'manual':
             return self._execute_manual_strategy(strategy)
         elif strategy.strategy_type == 'dca':
@@ -38,6 +48,8 @@ class TradingEngine:
             return self._execute_grid_strategy(strategy)
         elif strategy.strategy_type == 'scalping':
             return self._execute_scalping_strategy(strategy)
+        elif strategy.strategy_type == 'custom':
+            return self._execute_custom_strategy(strategy)
         else:
             logger.warning(f"Unknown strategy type: {strategy.strategy_type}")
             return None
@@ -112,6 +124,20 @@ class TradingEngine:
 
         return self._place_buy_order(strategy, str(buy_price), order_type='limit')
 
+    def _execute_custom_strategy(self, strategy: TradingStrategy):
+        """Execute indicator-rule strategy using shared per-pair indicator state"""
+        current_price = self._get_current_price(strategy.trading_pair.symbol)
+
+        if not current_price:
+            return None
+
+        signal = evaluate_custom_strategy(strategy, current_price)
+        if signal == 'buy':
+            return self._place_buy_order(strategy, current_price)
+        if signal == 'sell':
+            return self._place_sell_order(strategy, current_price)
+        return None
+
     def _place_buy_order(self, strategy: TradingStrategy, price: str, order_type: str = 'market'):
         """Place a buy order"""
         order = Order.objects.create(
@@ -124,6 +150,7 @@ class TradingEngine:
             amount=strategy.amount,
             status='pending'
         )
+        order_persisted(order)
 
         # Execute on exchange if API keys are configured
         if self.user_settings.binance_api_key and self.user_settings.auto_trading_enabled:
@@ -148,6 +175,7 @@ class TradingEngine:
             amount=strategy.amount,
             status='pending'
         )
+        order_persisted(order)
 
         # Execute on exchange if API keys are configured
         if self.user_settings.binance_api_key and self.user_settings.auto_trading_enabled:
@@ -165,24 +193,27 @@ class TradingEngine:
         symbol = order.trading_pair.symbol.replace('/', '')
 
         try:
+            quantity, price = self._prepare_order(order, symbol)
+
             if order.order_type == 'market':
                 result = self.binance.create_market_order(
                     symbol=symbol,
                     side=order.order_side,
-                    quantity=float(order.amount)
+                    quantity=quantity
                 )
             elif order.order_type == 'limit':
                 result = self.binance.create_limit_order(
                     symbol=symbol,
                     side=order.order_side,
-                    quantity=float(order.amount),
-                    price=float(order.price)
+                    quantity=quantity,
+                    price=price
                 )
             else:
                 logger.warning(f"Unsupported order type: {order.order_type}")
                 return None
 
             if result:
+                order_acked(order)
                 self._record_trade(order, result)
 
             return result
@@ -192,6 +223,27 @@ class TradingEngine:
             order.save()
             return None
 
+    def _prepare_order(self, order: Order, symbol: str):
+        """
+        Normalize quantity/price to the symbol's exchange filters before submitting.
+        Raises ValueError for orders the exchange would reject, so no round trip is wasted.
+        """
+        rules = symbol_rules_cache.get(self.binance, symbol)
+        if rules is None:
+            logger.warning(f"No exchange rules cached for {symbol}, submitting unnormalized order")
+            price = str(order.price) if order.order_type == 'limit' else None
+            return str(order.amount), price
+
+        quantity, price = rules.prepare_order(order.order_side, order.amount, order.price)
+
+        # Keep the stored order in step with what is actually sent
+        order.amount = Decimal(quantity)
+        if order.order_type == 'limit':
+            order.price = Decimal(price)
+        order.save(update_fields=['amount', 'price', 'updated_at'])
+
+        return quantity, price if order.order_type == 'limit' else None
+
     def _record_trade(self, order: Order, exchange_result: dict):
         """Record completed trade in history"""
         if exchange_result.get('status') == 'FILLED':
@@ -211,25 +263,33 @@ class TradingEngine:
         """Get current price from exchange"""
         try:
             ticker = self.binance.get_ticker_price(symbol)
+            price_observed()
             if ticker:
                 return ticker.get('price')
         except Exception as e:
             logger.error(f"Error getting price for {symbol}: {str(e)}")
         return None
 
-    def get_portfolio_value(self):
-        """Calculate total portfolio value"""
+    def get_portfolio_valuation(self):
+        """
+        Value every exchange balance in USDT from one all-symbols price
+        snapshot, converting through the cached conversion graph (directly or
+        via a hub asset such as BTC). Raises PriceUnavailable.
+        """
         balance = self.binance.get_account_balance()
         if not balance:
-            return Decimal('0')
+            return {'currency': VALUATION_ASSET, 'total': Decimal('0'), 'assets': [], 'unpriced': []}
 
-        total_value = Decimal('0')
-        for asset in balance.get('balances', []):
-            free = Decimal(asset.get('free', '0'))
-            locked = Decimal(asset.get('locked', '0'))
-            total_value += (free + locked)
+        prices = price_feed.get_prices()
+        graph = conversion_graphs.get(prices)
+        valuation = graph.value_balances(balance.get('balances', []), prices)
+        if valuation['unpriced']:
+            logger.warning(f"No USDT conversion for {[item['asset'] for item in valuation['unpriced']]}")
+        return valuation
 
-        return total_value
+    def get_portfolio_value(self):
+        """Calculate total portfolio value in USDT"""
+        return self.get_portfolio_valuation()['total']
 
     def cancel_order(self, order: Order):
         """Cancel an existing order"""
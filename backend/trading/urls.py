@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     TradingPairViewSet, TradingStrategyViewSet, OrderViewSet,
-    TradeHistoryViewSet, UserSettingsViewSet, PriceAlertViewSet
+    TradeHistoryViewSet, UserSettingsViewSet, PriceAlertViewSet, DashboardViewSet
 )
 
 router = DefaultRouter()
@@ -12,6 +12,7 @@ router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'history', TradeHistoryViewSet, basename='trade-history')
 router.register(r'settings', UserSettingsViewSet, basename='user-settings')
 router.register(r'alerts', PriceAlertViewSet, basename='price-alert')
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,6 +2,10 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.throttling import ScopedRateThrottle
+import functools
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from .models import TradingPair, TradingStrategy, Order, TradeHistory, UserSettings, PriceAlert
 from .serializers import (
@@ -9,6 +13,49 @@ from .serializers import (
     TradeHistorySerializer, UserSettingsSerializer, PriceAlertSerializer
 )
 from .paper_trading_service import PaperTradingService
+from .price_feed import PriceUnavailable
+from .export_service import EXPORT_FORMATS, iter_export, export_filename
+from .response_cache import versioned_response
+from .fast_serializers import FastListMixin
+from .archive_service import trade_archiver
+from .equity_curve import equity_curves
+from .optimizer import strategy_optimizer
+from .stress_test import stress_tester
+from .dashboard import dashboard_builder, parse_fields, DEFAULT_ORDERS_LIMIT, MAX_ORDERS_LIMIT
+from trading_backend.db_router import read_replica, replica_configured
+
+
+def _replica_user_id(request):
+    """User whose read-your-writes stickiness applies to this request"""
+    if request.user and request.user.is_authenticated:
+        return request.user.pk
+    # Unauthenticated requests act as the first user throughout these views
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.order_by('pk').values_list('pk', flat=True).first()
+
+
+def replica_reads(view_method):
+    """Serve a read-only view from the read replica when one is configured"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not replica_configured():
+            return view_method(self, request, *args, **kwargs)
+        with read_replica(_replica_user_id(request)):
+            return view_method(self, request, *args, **kwargs)
+    return wrapper
+
+
+def stream_export(request, kind):
+    """Stream an orders/trades export; filters come from the query string"""
+    export_format = request.query_params.get('export_format', 'csv')
+    try:
+        chunks = iter_export(kind, request.query_params, export_format)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(kind, export_format)}"'
+    return response
 
 
 class TradingPairViewSet(viewsets.ReadOnlyModelViewSet):
@@ -17,12 +64,19 @@ class TradingPairViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TradingPairSerializer
     permission_classes = [AllowAny]
 
+    @versioned_response('pairs')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
     def price(self, request, pk=None):
         """Get current price for a trading pair"""
         trading_pair = self.get_object()
         paper_service = PaperTradingService()
-        price = paper_service.get_current_price(trading_pair.symbol)
+        try:
+            price = paper_service.get_pair_price(trading_pair)
+        except PriceUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         from django.utils import timezone
         return Response({
             'symbol': trading_pair.symbol,
@@ -31,13 +85,18 @@ class TradingPairViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
-class TradingStrategyViewSet(viewsets.ModelViewSet):
+class TradingStrategyViewSet(FastListMixin, viewsets.ModelViewSet):
     """API endpoint for managing trading strategies"""
     serializer_class = TradingStrategySerializer
     permission_classes = [AllowAny]
+    throttle_scope = None  # Set per action for the simulation endpoints
 
     def get_queryset(self):
-        return TradingStrategy.objects.all()
+        return TradingStrategy.objects.select_related('trading_pair')
+
+    @versioned_response('strategies')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         # For testing without authentication, use first user or create one
@@ -64,14 +123,84 @@ class TradingStrategyViewSet(viewsets.ModelViewSet):
         strategy.save()
         return Response({'status': 'Strategy deactivated'})
 
+    @action(detail=True, methods=['post'], throttle_classes=[ScopedRateThrottle], throttle_scope='simulation')
+    def optimize(self, request, pk=None):
+        """
+        Walk-forward parameter search over historical klines
+        Body: method (random|grid), samples, days, folds, train_blocks, seed,
+        space ({parameter: [values]}), apply (save the recommendation).
+        Runs in this worker with OPTIMIZE_REQUEST_WORKERS processes and at most
+        OPTIMIZE_REQUEST_MAX_BARS simulated bars; use optimize_strategy beyond that.
+        """
+        strategy = self.get_object()
+        data = request.data
+        try:
+            result = strategy_optimizer.optimize(
+                strategy,
+                method=data.get('method', 'random'),
+                space=data.get('space') or {},
+                samples=int(data.get('samples', 50)),
+                days=int(data.get('days', 180)),
+                folds=int(data.get('folds', 4)),
+                train_blocks=int(data.get('train_blocks', 3)),
+                seed=data.get('seed'),
+                workers=getattr(settings, 'OPTIMIZE_REQUEST_WORKERS', 1),
+                max_bars=getattr(settings, 'OPTIMIZE_REQUEST_MAX_BARS', 2_000_000),
+            )
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if data.get('apply'):
+            strategy_optimizer.apply(strategy, result['recommended'])
+        return Response(result)
+
+    @action(detail=True, methods=['post'], url_path='stress-test',
+            throttle_classes=[ScopedRateThrottle], throttle_scope='simulation')
+    def stress_test(self, request, pk=None):
+        """
+        Monte Carlo drawdown, P&L and stop-out percentiles over synthetic paths
+        Body: method (gbm|bootstrap), paths, days, step_interval, drift, volatility,
+        block_length, seed, params ({stop_loss_percentage, take_profit_percentage, amount, execution_interval}).
+        Bounded by STRESS_TEST_REQUEST_MAX_STEPS and STRESS_TEST_REQUEST_MAX_PATH_STEPS;
+        use stress_test_strategy beyond that. Drift and volatility are estimated from at
+        most STRESS_TEST_REQUEST_HISTORY_BARS bars, fetched in at most
+        STRESS_TEST_REQUEST_FETCH_PAGES kline pages (see history_complete_until).
+        """
+        strategy = self.get_object()
+        data = request.data
+        try:
+            result = stress_tester.run(
+                strategy,
+                method=data.get('method', 'gbm'),
+                paths=int(data.get('paths', 2000)),
+                days=int(data.get('days', 365)),
+                step_interval=data.get('step_interval', '1h'),
+                drift=data.get('drift'),
+                volatility=data.get('volatility'),
+                block_length=int(data.get('block_length', 24)),
+                params=data.get('params') or {},
+                seed=data.get('seed'),
+                max_steps=getattr(settings, 'STRESS_TEST_REQUEST_MAX_STEPS', 50_000),
+                max_path_steps=getattr(settings, 'STRESS_TEST_REQUEST_MAX_PATH_STEPS', 20_000_000),
+                history_bars=getattr(settings, 'STRESS_TEST_REQUEST_HISTORY_BARS', 10_000),
+                fetch_pages=getattr(settings, 'STRESS_TEST_REQUEST_FETCH_PAGES', 10),
+            )
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(FastListMixin, viewsets.ModelViewSet):
     """API endpoint for managing orders"""
     serializer_class = OrderSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return Order.objects.all().order_by('-created_at')
+        return Order.objects.select_related('trading_pair').order_by('-created_at')
+
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         """Create and execute a paper trading order"""
@@ -111,6 +240,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(order)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+        except PriceUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -120,6 +251,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @replica_reads
     def portfolio(self, request):
         """Get user's portfolio (balance + positions)"""
         from django.contrib.auth import get_user_model
@@ -132,7 +264,50 @@ class OrderViewSet(viewsets.ModelViewSet):
         portfolio = paper_service.get_portfolio_value(user)
         return Response(portfolio)
 
+    @action(detail=False, methods=['get'], url_path='equity-curve')
+    def equity_curve(self, request):
+        """
+        Portfolio value per closed bar, rebuilt from trade history
+        Query params: interval (default 1h), from_date / to_date (YYYY-MM-DD, inclusive)
+        """
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        user = User.objects.first()
+        if not user:
+            return Response({'error': 'No user found'}, status=status.HTTP_404_NOT_FOUND)
+
+        interval = request.query_params.get('interval', '1h')
+        try:
+            bounds = [
+                datetime.strptime(request.query_params[param], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+                if request.query_params.get(param) else None
+                for param in ('from_date', 'to_date')
+            ]
+            curve = equity_curves.get_curve(user, interval)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = {
+            'interval': interval, 'timestamps': [], 'equity': [], 'cash': [], 'positions_value': [],
+            'complete_until': None,  # Later bars are marked at the last known price and recomputed later
+        }
+        if curve is None:
+            return Response(result)
+        result['complete_until'] = curve['complete_until']
+
+        start, end = 0, len(curve['bar_times'])
+        if bounds[0]:
+            start = curve['bar_times'].searchsorted(int(bounds[0].timestamp() * 1000))
+        if bounds[1]:
+            end = curve['bar_times'].searchsorted(int((bounds[1] + timedelta(days=1)).timestamp() * 1000))
+        result['timestamps'] = curve['bar_times'][start:end].tolist()
+        for series in ('equity', 'cash', 'positions_value'):
+            result[series] = curve[series][start:end].round(2).tolist()
+        return Response(result)
+
     @action(detail=False, methods=['get'])
+    @replica_reads
     def pnl_statement(self, request):
         """Get comprehensive profit and loss statement"""
         from django.contrib.auth import get_user_model
@@ -154,36 +329,58 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Get all completed orders
         all_orders = Order.objects.filter(user=user, status='filled')
 
-        # Apply date filters
+        # Apply date filters as a [start, end) range on created_at
+        start = end = None
         if filter_type == 'day':
             # Today's trades
-            today = timezone.now().date()
-            all_orders = all_orders.filter(created_at__date=today)
+            start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+            end = start + timedelta(days=1)
         elif filter_type == 'week':
             # Last 7 days
-            week_ago = timezone.now() - timedelta(days=7)
-            all_orders = all_orders.filter(created_at__gte=week_ago)
+            start = timezone.now() - timedelta(days=7)
         elif filter_type == 'month':
             # Current month
-            month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            all_orders = all_orders.filter(created_at__gte=month_start)
+            start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         elif filter_type == 'custom' and from_date and to_date:
             # Custom date range
             try:
                 from_dt = datetime.strptime(from_date, '%Y-%m-%d')
                 to_dt = datetime.strptime(to_date, '%Y-%m-%d')
-                # Add end of day to to_date
-                to_dt = to_dt.replace(hour=23, minute=59, second=59)
-                # Make timezone aware
-                from_dt = timezone.make_aware(from_dt) if timezone.is_naive(from_dt) else from_dt
-                to_dt = timezone.make_aware(to_dt) if timezone.is_naive(to_dt) else to_dt
-                all_orders = all_orders.filter(created_at__gte=from_dt, created_at__lte=to_dt)
             except ValueError:
                 return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+            # Make timezone aware; the range runs to the end of to_date
+            start = timezone.make_aware(from_dt)
+            end = timezone.make_aware(to_dt + timedelta(days=1))
+        if start is not None:
+            all_orders = all_orders.filter(created_at__gte=start)
+        if end is not None:
+            all_orders = all_orders.filter(created_at__lt=end)
+
+        # One query for everything below; the statistics are computed in memory
+        all_orders = list(all_orders.select_related('trading_pair').order_by('created_at'))
+
+        # Closed months moved out of the hot table by archive_trades
+        archived_orders = [
+            row for row in trade_archiver.iter_archived('orders', start=start, end=end, user_id=user.pk)
+            if row['status'] == 'filled'
+        ]
+        if archived_orders:
+            pairs = TradingPair.objects.in_bulk({row['trading_pair_id'] for row in archived_orders})
+            all_orders = sorted(all_orders + [
+                Order(
+                    id=row['id'],
+                    user=user,
+                    trading_pair=pairs.get(row['trading_pair_id']),
+                    order_side=row['order_side'],
+                    status=row['status'],
+                    amount=Decimal(row['amount']),
+                    filled_price=Decimal(row['filled_price']),
+                    created_at=datetime.fromisoformat(row['created_at']),
+                )
+                for row in archived_orders if row['trading_pair_id'] in pairs
+            ], key=lambda order: order.created_at)
 
-        all_orders = all_orders.order_by('created_at')
-
-        if not all_orders.exists():
+        if not all_orders:
             return Response({
                 'total_trades': 0,
                 'total_profit_loss': 0,
@@ -193,8 +390,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             })
 
         # Calculate overall statistics
-        buy_orders = all_orders.filter(order_side='buy')
-        sell_orders = all_orders.filter(order_side='sell')
+        buy_orders = [o for o in all_orders if o.order_side == 'buy']
+        sell_orders = [o for o in all_orders if o.order_side == 'sell']
 
         total_buy_value = sum(float(o.amount) * float(o.filled_price) for o in buy_orders)
         total_sell_value = sum(float(o.amount) * float(o.filled_price) for o in sell_orders)
@@ -204,15 +401,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         paper_service = PaperTradingService()
         portfolio = paper_service.get_portfolio_value(user)
 
-        # Calculate realized P&L (from completed buy-sell pairs)
+        # Calculate realized P&L (from completed buy-sell pairs), matching each
+        # sell against the pair's first buy placed before it
+        first_buys = {}
+        for buy in buy_orders:
+            first_buys.setdefault(buy.trading_pair_id, buy)
         realized_pnl = total_sell_value - sum(
-            float(sell.amount) * float(buy_orders.filter(
-                trading_pair=sell.trading_pair,
-                created_at__lt=sell.created_at
-            ).order_by('created_at').first().filled_price)
+            float(sell.amount) * float(first_buys[sell.trading_pair_id].filled_price)
             for sell in sell_orders
-            if buy_orders.filter(trading_pair=sell.trading_pair, created_at__lt=sell.created_at).exists()
-        ) if sell_orders.exists() and buy_orders.exists() else 0
+            if sell.trading_pair_id in first_buys and first_buys[sell.trading_pair_id].created_at < sell.created_at
+        ) if sell_orders and buy_orders else 0
 
         # Calculate unrealized P&L (from current positions)
         unrealized_pnl = sum(pos['profit_loss'] for pos in portfolio['positions'])
@@ -281,10 +479,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         total_volume = total_buy_value + total_sell_value
 
         return Response({
-            'total_trades': all_orders.count(),
+            'total_trades': len(all_orders),
+            'archived_trades': len(archived_orders),
             'completed_trades': total_completed,
-            'buy_orders': buy_orders.count(),
-            'sell_orders': sell_orders.count(),
+            'buy_orders': len(buy_orders),
+            'sell_orders': len(sell_orders),
             'total_volume': round(total_volume, 2),
             'total_buy_value': round(total_buy_value, 2),
             'total_sell_value': round(total_sell_value, 2),
@@ -302,6 +501,14 @@ class OrderViewSet(viewsets.ModelViewSet):
             'trades': completed_trades[-20:]  # Last 20 trades
         })
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream orders as CSV, Parquet or Arrow
+        Query params: export_format, from_date, to_date, symbol, side, status, user_id
+        """
+        return stream_export(request, 'orders')
+
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel an order"""
@@ -316,13 +523,25 @@ class OrderViewSet(viewsets.ModelViewSet):
         )
 
 
-class TradeHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class TradeHistoryViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     """API endpoint for viewing trade history"""
     serializer_class = TradeHistorySerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return TradeHistory.objects.all().order_by('-executed_at')
+        return TradeHistory.objects.select_related('trading_pair').order_by('-executed_at')
+
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream trade history as CSV, Parquet or Arrow
+        Query params: export_format, from_date, to_date, symbol, side, user_id
+        """
+        return stream_export(request, 'trades')
 
 
 class UserSettingsViewSet(viewsets.ModelViewSet):
@@ -357,7 +576,7 @@ class PriceAlertViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return PriceAlert.objects.all().order_by('-created_at')
+        return PriceAlert.objects.select_related('trading_pair').order_by('-created_at')
 
     def perform_create(self, serializer):
         from django.contrib.auth import get_user_model
@@ -366,3 +585,33 @@ class PriceAlertViewSet(viewsets.ModelViewSet):
         if not user:
             user = User.objects.create_user('testuser', 'test@test.com', 'testpass')
         serializer.save(user=user)
+
+
+class DashboardViewSet(viewsets.ViewSet):
+    """Everything the trading dashboard needs in one response"""
+    permission_classes = [AllowAny]
+
+    def list(self, request):
+        """
+        Snapshot of pairs, prices, portfolio, orders, strategies and settings
+        Query params: fields (e.g. portfolio,orders.id,orders.status), orders_limit
+        """
+        if request.user and request.user.is_authenticated:
+            user = request.user
+        else:
+            from django.contrib.auth import get_user_model
+            user = get_user_model().objects.order_by('pk').first()
+        if not user:
+            return Response({'error': 'No user found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            selected = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            orders_limit = int(request.query_params.get('orders_limit', DEFAULT_ORDERS_LIMIT))
+        except ValueError:
+            return Response({'error': 'orders_limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        orders_limit = max(0, min(orders_limit, MAX_ORDERS_LIMIT))
+
+        return Response(dashboard_builder.get_snapshot(user, selected, orders_limit))
@@ -0,0 +1,169 @@
+"""
+Read-replica database routing
+Sends reads from analytics-heavy views to a replica while keeping every
+write, and any read from a user who just traded, on the primary
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, DatabaseError
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+
+# Cache backends whose entries other worker processes cannot see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_replica_requested = ContextVar('replica_requested', default=False)
+_warned_local_cache = False
+
+
+def _sticky_cache():
+    """
+    The cache holding read-your-writes flags, or None when it is process-local.
+    A write handled by one worker must pin the user's reads in every worker,
+    so a per-process cache cannot provide stickiness.
+    """
+    alias = getattr(settings, 'REPLICA_STICKY_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None or backend in PROCESS_LOCAL_CACHES:
+        return None
+    return caches[alias]
+
+
+def replica_configured():
+    """A replica is only used when one is configured and stickiness is shared between processes"""
+    global _warned_local_cache
+    if REPLICA_ALIAS not in settings.DATABASES:
+        return False
+    if _sticky_cache() is None:
+        if not _warned_local_cache:
+            _warned_local_cache = True
+            logger.warning(
+                "Read replica disabled: REPLICA_STICKY_CACHE is not a shared cache, "
+                "so read-your-writes cannot hold across worker processes"
+            )
+        return False
+    return True
+
+
+def _sticky_key(user_id):
+    return f'db-router:sticky:{user_id}'
+
+
+def mark_primary_sticky(user_id):
+    """Pin a user's reads to the primary for a while after they write (read-your-writes)"""
+    if not replica_configured() or user_id is None:
+        return
+    try:
+        _sticky_cache().set(_sticky_key(user_id), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+    except Exception as e:
+        logger.warning(f"Could not mark user {user_id} sticky to the primary: {e}")
+
+
+def is_primary_sticky(user_id):
+    if user_id is None:
+        return False
+    cache = _sticky_cache()
+    if cache is None:
+        return True
+    try:
+        return cache.get(_sticky_key(user_id)) is not None
+    except Exception as e:
+        # Without the flag we cannot rule out a recent write; stay on the primary
+        logger.warning(f"Sticky cache unavailable, reading from the primary: {e}")
+        return True
+
+
+class _ReplicaHealth:
+    """Caches whether the replica is reachable and within the lag budget"""
+
+    def __init__(self):
+        self._checked_at = 0.0
+        self._healthy = False
+        self._lock = threading.Lock()
+
+    def healthy(self):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_SECONDS', 5)
+        now = time.monotonic()
+        if now - self._checked_at < interval:
+            return self._healthy
+
+        with self._lock:
+            if now - self._checked_at >= interval:
+                self._healthy = self._check()
+                self._checked_at = now
+        return self._healthy
+
+    def _check(self):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+        try:
+            connection = connections[REPLICA_ALIAS]
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                    )
+                    lag = float(cursor.fetchone()[0])
+                else:
+                    cursor.execute("SELECT 1")
+                    lag = 0.0
+        except DatabaseError as e:
+            logger.warning(f"Read replica unavailable, using primary: {e}")
+            return False
+
+        if lag > max_lag:
+            logger.warning(f"Read replica lagging {lag:.1f}s (max {max_lag}s), using primary")
+            return False
+        return True
+
+    def reset(self):
+        self._checked_at = 0.0
+
+
+replica_health = _ReplicaHealth()
+
+
+@contextmanager
+def read_replica(user_id=None):
+    """
+    Route reads inside the block to the replica when one is configured and healthy,
+    and the user has not written recently. Everything else stays on the primary.
+    """
+    use_replica = (
+        replica_configured()
+        and not is_primary_sticky(user_id)
+        and replica_health.healthy()
+    )
+    token = _replica_requested.set(use_replica)
+    try:
+        yield use_replica
+    finally:
+        _replica_requested.reset(token)
+
+
+class ReadReplicaRouter:
+    """Database router enabled when REPLICA_DATABASE_URL is set"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_requested.get():
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
@@ -0,0 +1,165 @@
+"""
+On-demand profiling
+Profiles selected requests (and strategy executor ticks) with a stack sampler
+or cProfile and dumps the result next to a JSON metadata file
+"""
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+class Profiler:
+    """
+    Profiles the calling thread between start() and stop().
+
+    'sample' mode polls the thread's stack every `interval` seconds from a
+    helper thread and produces collapsed stacks (flamegraph.pl / speedscope
+    input); 'cprofile' mode records deterministic per-function timings.
+    """
+
+    def __init__(self, mode='sample', interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.stacks = Counter()
+        self.duration = 0.0
+        self._profile = None
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            target = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample, args=(target,), daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self._profile.disable()
+        else:
+            self._stopped.set()
+            self._sampler.join()
+        self.duration = time.perf_counter() - self._started_at
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _sample(self, thread_id):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, name, metadata=None, directory=None):
+        """
+        Write the profile and a .json metadata file; returns the profile path.
+        Sample profiles are written as `<name>.collapsed`, cProfile as `<name>.prof`.
+        """
+        directory = directory or getattr(settings, 'PROFILING_DIR', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}")
+
+        if self.mode == 'cprofile':
+            path = f"{base}.prof"
+            self._profile.dump_stats(path)
+        else:
+            path = f"{base}.collapsed"
+            with open(path, 'w', encoding='utf-8') as fh:
+                for stack, count in self.stacks.most_common():
+                    fh.write(f"{stack} {count}\n")
+
+        meta = {
+            'mode': self.mode,
+            'duration_ms': round(self.duration * 1000, 3),
+            'samples': sum(self.stacks.values()),
+            'created_at': datetime.now().isoformat(),
+            **(metadata or {}),
+        }
+        with open(f"{base}.json", 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh, indent=2, default=str)
+        return path
+
+
+def new_profiler(mode=None):
+    """Profiler configured from PROFILING_MODE / PROFILING_INTERVAL_MS"""
+    return Profiler(
+        mode=mode or getattr(settings, 'PROFILING_MODE', 'sample'),
+        interval=getattr(settings, 'PROFILING_INTERVAL_MS', 5) / 1000,
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when it carries `X-Profile: <PROFILING_TOKEN>` or is
+    picked by PROFILING_SAMPLE_RATE. Removed from the stack at startup unless
+    PROFILING_ENABLED is set, so it costs nothing when installed but off.
+
+    Streaming responses (exports) are only profiled until the response object
+    is returned; the body is generated later, while the server iterates it,
+    outside the profile. Their metadata carries 'streaming': true.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.token = getattr(settings, 'PROFILING_TOKEN', '')
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+    def should_profile(self, request):
+        if self.token and request.headers.get('X-Profile') == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        mode = request.headers.get('X-Profile-Mode')
+        profiler = new_profiler(mode if mode in PROFILE_MODES else None)
+        with profiler:
+            response = self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        name = request.path.strip('/').replace('/', '.') or 'root'
+        try:
+            path = profiler.dump(name, {
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user_id': user.pk if user is not None and user.is_authenticated else None,
+                'streaming': response.streaming,
+            })
+            response['X-Profile-File'] = os.path.basename(path)
+        except OSError as e:
+            logger.error(f"Could not write profile for {request.path}: {e}")
+        return response
@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 import dj_database_url
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'trading_backend.profiling.ProfilingMiddleware',  # No-op unless PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -103,6 +104,41 @@ else:
         }
     }
 
+# Optional read replica for analytics-heavy endpoints (pnl_statement, portfolio,
+# order/history lists). Any Django database URL works, including a second
+# SQLite file for local testing.
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default=None)
+
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        REPLICA_DATABASE_URL,
+        conn_max_age=600,
+        conn_health_checks=True,
+    )
+    # Tests run against the primary's test database through the replica alias
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['trading_backend.db_router.ReadReplicaRouter']
+
+# Optional shared cache (Redis, needs the redis package) under the 'shared' alias;
+# the default cache stays per-process
+REDIS_URL = config('REDIS_URL', default=None)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL},
+    }
+
+# Cache alias holding read-your-writes flags. It must be shared by every worker
+# process (Redis, memcached, database or file cache); with a per-process cache
+# the replica is left unused.
+REPLICA_STICKY_CACHE = config('REPLICA_STICKY_CACHE', default='shared' if REDIS_URL else 'default')
+# Reads stay on the primary for this long after a user's own order
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+# Fall back to the primary when replication lag exceeds this
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+REPLICA_HEALTH_CHECK_SECONDS = config('REPLICA_HEALTH_CHECK_SECONDS', default=5, cast=float)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -180,9 +216,91 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'simulation': config('SIMULATION_THROTTLE_RATE', default='10/min'),  # optimize / stress-test actions
+    },
+    'DEFAULT_RENDERER_CLASSES': [
+        'trading.fast_serializers.FastJSONRenderer',  # orjson for fast-path list rows when installed
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Trading Settings
 BINANCE_API_KEY = ''  # Add your Binance API key
 BINANCE_API_SECRET = ''  # Add your Binance API secret
 BINANCE_TESTNET = True  # Use testnet for development
+
+# Maximum number of warm per-user trading engines kept in each process
+TRADING_ENGINE_POOL_SIZE = config('TRADING_ENGINE_POOL_SIZE', default=256, cast=int)
+
+# How often cached /v3/exchangeInfo symbol filters are refreshed (seconds)
+EXCHANGE_INFO_REFRESH_SECONDS = config('EXCHANGE_INFO_REFRESH_SECONDS', default=3600, cast=int)
+
+# Portfolio valuation: price staleness before re-fetching (seconds), and users kept in memory per process
+PORTFOLIO_PRICE_TTL_SECONDS = config('PORTFOLIO_PRICE_TTL_SECONDS', default=5, cast=float)
+PORTFOLIO_MAX_USERS = config('PORTFOLIO_MAX_USERS', default=1024, cast=int)
+
+# Order / trade history archiving (see `manage.py archive_trades`)
+TRADE_ARCHIVE_DIR = config('TRADE_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+TRADE_ARCHIVE_RETENTION_DAYS = config('TRADE_ARCHIVE_RETENTION_DAYS', default=365, cast=int)
+
+# Shared-memory price board (see `manage.py run_price_board`)
+PRICE_BOARD_NAME = config('PRICE_BOARD_NAME', default='tradepro_price_board')
+PRICE_BOARD_CAPACITY = config('PRICE_BOARD_CAPACITY', default=4096, cast=int)  # highest TradingPair.id + 1
+PRICE_BOARD_MAX_AGE_SECONDS = config('PRICE_BOARD_MAX_AGE_SECONDS', default=5, cast=float)
+
+# Local order books for slippage-aware paper fills (needs websocket-client)
+PAPER_ORDER_BOOK_SYMBOLS = config('PAPER_ORDER_BOOK_SYMBOLS', default='', cast=Csv())
+# Reconnect delay bounds for the depth stream (jittered, doubling per failed connection)
+PAPER_ORDER_BOOK_RECONNECT_SECONDS = config('PAPER_ORDER_BOOK_RECONNECT_SECONDS', default=1.0, cast=float)
+PAPER_ORDER_BOOK_RECONNECT_MAX_SECONDS = config('PAPER_ORDER_BOOK_RECONNECT_MAX_SECONDS', default=60.0, cast=float)
+# Slippage past the worst level charged on the part of an order deeper than the local book
+PAPER_DEPTH_SHORTFALL_BPS = config('PAPER_DEPTH_SHORTFALL_BPS', default=50, cast=float)
+
+# On-demand request profiling (see trading_backend/profiling.py)
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_TOKEN = config('PROFILING_TOKEN', default='')  # X-Profile header value that forces a profile
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_MODE = config('PROFILING_MODE', default='sample')  # 'sample' (collapsed stacks) or 'cprofile'
+PROFILING_INTERVAL_MS = config('PROFILING_INTERVAL_MS', default=5, cast=float)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Record per-order tick-to-trade timings for automated orders (see `manage.py latency_report`)
+LATENCY_TRACKING_ENABLED = config('LATENCY_TRACKING_ENABLED', default=True, cast=bool)
+
+# Per-user cache lifetime for /api/trading/dashboard/ snapshots (0 disables)
+DASHBOARD_CACHE_SECONDS = config('DASHBOARD_CACHE_SECONDS', default=2, cast=float)
+# Cache alias holding per-user dashboard versions, bumped by fills in any process.
+# With a per-process cache each read checks a one-query database change marker instead.
+DASHBOARD_VERSION_CACHE = config('DASHBOARD_VERSION_CACHE', default='shared' if REDIS_URL else 'default')
+
+# Price fetches: hedged across these hosts within a latency budget, with per-host circuit breakers
+PRICE_FEED_HOSTS = config(
+    'PRICE_FEED_HOSTS',
+    default='https://api.binance.com,https://api1.binance.com,https://api2.binance.com,https://api3.binance.com',
+    cast=Csv(),
+)
+PRICE_FETCH_BUDGET_MS = config('PRICE_FETCH_BUDGET_MS', default=2000, cast=float)
+PRICE_HEDGE_DELAY_MS = config('PRICE_HEDGE_DELAY_MS', default=250, cast=float)  # wait before asking the next host
+PRICE_BREAKER_FAILURES = config('PRICE_BREAKER_FAILURES', default=5, cast=int)
+PRICE_BREAKER_RESET_SECONDS = config('PRICE_BREAKER_RESET_SECONDS', default=15, cast=float)
+# Oldest last-known price served when every host fails (0 = fail instead of serving stale prices)
+PRICE_STALE_MAX_AGE_SECONDS = config('PRICE_STALE_MAX_AGE_SECONDS', default=10, cast=float)
+
+# Historical candle closes cached for equity curves (one .npy per symbol and interval)
+CANDLE_CACHE_DIR = config('CANDLE_CACHE_DIR', default=str(BASE_DIR / 'candles'))
+# Kline pages (1000 bars each) one equity-curve request may fetch; later bars are reported incomplete
+EQUITY_CURVE_FETCH_PAGES = config('EQUITY_CURVE_FETCH_PAGES', default=10, cast=int)
+
+# Worker processes for `manage.py optimize_strategy` and the strategy optimize action (0 = CPU count)
+OPTIMIZER_WORKERS = config('OPTIMIZER_WORKERS', default=0, cast=int)
+
+# Per-request bounds for the strategy optimize / stress-test actions, which run
+# inside the web worker; bigger jobs go through optimize_strategy / stress_test_strategy
+OPTIMIZE_REQUEST_WORKERS = config('OPTIMIZE_REQUEST_WORKERS', default=1, cast=int)
+OPTIMIZE_REQUEST_MAX_BARS = config('OPTIMIZE_REQUEST_MAX_BARS', default=2_000_000, cast=int)
+STRESS_TEST_REQUEST_MAX_STEPS = config('STRESS_TEST_REQUEST_MAX_STEPS', default=50_000, cast=int)
+STRESS_TEST_REQUEST_MAX_PATH_STEPS = config('STRESS_TEST_REQUEST_MAX_PATH_STEPS', default=20_000_000, cast=int)
+# Newest bars of history, and kline pages fetched for them, behind one stress-test request's estimates
+STRESS_TEST_REQUEST_HISTORY_BARS = config('STRESS_TEST_REQUEST_HISTORY_BARS', default=10_000, cast=int)
+STRESS_TEST_REQUEST_FETCH_PAGES = config('STRESS_TEST_REQUEST_FETCH_PAGES', default=10, cast=int)
@@ -1,49 +1,17 @@
-import React, { useState, useEffect } from 'react';
-import axios from 'axios';
+import React, { useState } from 'react';
 import { formatCurrency } from '../utils/currency';
-import { createOrder, getTradingPairs } from '../services/api';
+import { createOrder } from '../services/api';
 import './Holdings.css';
 
-const Holdings = ({ refreshTrigger, currency = 'USD' }) => {
-  const [portfolio, setPortfolio] = useState(null);
-  const [loading, setLoading] = useState(true);
+const Holdings = ({ portfolio, tradingPairs = [], currency = 'USD', onRefresh }) => {
   const [exitingPosition, setExitingPosition] = useState(null);
   const [message, setMessage] = useState('');
-  const [tradingPairs, setTradingPairs] = useState([]);
   const [showExitModal, setShowExitModal] = useState(false);
   const [selectedPosition, setSelectedPosition] = useState(null);
   const [exitOrderType, setExitOrderType] = useState('market');
   const [exitLimitPrice, setExitLimitPrice] = useState('');
   const [expandedPositions, setExpandedPositions] = useState(new Set());
 
-  useEffect(() => {
-    loadPortfolio();
-    loadTradingPairs();
-    // Refresh every 5 seconds
-    const interval = setInterval(loadPortfolio, 5000);
-    return () => clearInterval(interval);
-  }, [refreshTrigger]);
-
-  const loadPortfolio = async () => {
-    try {
-      const response = await axios.get('http://localhost:8001/api/trading/orders/portfolio/');
-      setPortfolio(response.data);
-      setLoading(false);
-    } catch (error) {
-      console.error('Error loading portfolio:', error);
-      setLoading(false);
-    }
-  };
-
-  const loadTradingPairs = async () => {
-    try {
-      const response = await getTradingPairs();
-      setTradingPairs(response.data);
-    } catch (error) {
-      console.error('Error loading trading pairs:', error);
-    }
-  };
-
   const togglePosition = (symbol) => {
     const newExpanded = new Set(expandedPositions);
     if (newExpanded.has(symbol)) {
@@ -102,9 +70,11 @@ const Holdings = ({ refreshTrigger, currency = 'USD' }) => {
       setMessage(`Successfully ${exitOrderType === 'market' ? 'sold' : 'placed sell order for'} ${selectedPosition.amount} ${selectedPosition.base_asset} ${orderTypeText}`);
       setTimeout(() => setMessage(''), 5000);
 
-      // Close modal and refresh portfolio
+      // Close modal and refresh the dashboard snapshot
       closeExitModal();
-      await loadPortfolio();
+      if (onRefresh) {
+        onRefresh();
+      }
 
     } catch (error) {
       const errorMsg = error.response?.data?.error || error.response?.data?.detail || error.message;
@@ -115,20 +85,11 @@ const Holdings = ({ refreshTrigger, currency = 'USD' }) => {
     }
   };
 
-  if (loading) {
-    return (
-      <div className="holdings">
-        <h3>Holdings</h3>
-        <div className="loading">Loading portfolio...</div>
-      </div>
-    );
-  }
-
   if (!portfolio) {
     return (
       <div className="holdings">
         <h3>Holdings</h3>
-        <div className="error">Failed to load portfolio</div>
+        <div className="loading">Loading portfolio...</div>
       </div>
     );
   }
@@ -142,7 +103,7 @@ const Holdings = ({ refreshTrigger, currency = 'USD' }) => {
     <div className="holdings">
       <div className="holdings-header">
         <h3>Holdings</h3>
-        <button onClick={loadPortfolio} className="refresh-btn">
+        <button onClick={onRefresh} className="refresh-btn">
           <svg width="16" height="16" viewBox="0 0 16 16" fill="none">
             <path d="M14 8a6 6 0 11-12 0 6 6 0 0112 0z" stroke="currentColor" strokeWidth="1.5"/>
             <path d="M8 4v4l2 2" stroke="currentColor" strokeWidth="1.5" strokeLinecap="round"/>
@@ -188,7 +149,7 @@ const Holdings = ({ refreshTrigger, currency = 'USD' }) => {
 
       <div className="positions-section">
         <h4>Your Positions</h4>
-        {portfolio.positions.length === 0 ? (
+        {portfolio.positions.length === 0 && !portfolio.unpriced_positions?.length ? (
           <div className="no-positions">
             <svg width="48" height="48" viewBox="0 0 24 24" fill="none">
               <path d="M12 2L2 7l10 5 10-5-10-5z" stroke="currentColor" strokeWidth="1.5" strokeLinecap="round" strokeLinejoin="round"/>
@@ -280,6 +241,19 @@ const Holdings = ({ refreshTrigger, currency = 'USD' }) => {
             })}
           </div>
         )}
+
+        {/* Positions without a current price are not counted in the values above */}
+        {portfolio.unpriced_positions?.length > 0 && (
+          <div className="unpriced-positions">
+            {portfolio.unpriced_positions.map((position) => (
+              <div key={position.symbol} className="unpriced-position">
+                <span className="compact-symbol">{position.symbol}</span>
+                <span className="compact-amount">{position.amount.toFixed(4)} {position.base_asset}</span>
+                <span className="unpriced-note">Price unavailable</span>
+              </div>
+            ))}
+          </div>
+        )}
       </div>
 
       {/* Exit Position Modal */}
@@ -1,32 +1,15 @@
-import React, { useState, useEffect } from 'react';
-import { getOrders, cancelOrder } from '../services/api';
+import React from 'react';
+import { cancelOrder } from '../services/api';
 import './OrderBook.css';
 
-const OrderBook = () => {
-  const [orders, setOrders] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    loadOrders();
-    const interval = setInterval(loadOrders, 10000); // Refresh every 10 seconds
-    return () => clearInterval(interval);
-  }, []);
-
-  const loadOrders = async () => {
-    try {
-      const response = await getOrders();
-      setOrders(response.data);
-    } catch (error) {
-      console.error('Error loading orders:', error);
-    } finally {
-      setLoading(false);
-    }
-  };
-
+// Orders come from the dashboard snapshot; onRefresh reloads it
+const OrderBook = ({ orders = [], loading = false, onRefresh }) => {
   const handleCancelOrder = async (orderId) => {
     try {
       await cancelOrder(orderId);
-      loadOrders();
+      if (onRefresh) {
+        onRefresh();
+      }
     } catch (error) {
       console.error('Error cancelling order:', error);
     }
@@ -1,11 +1,10 @@
-import React, { useState, useEffect } from 'react';
-import { createOrder, getTradingPairs } from '../services/api';
+import React, { useState } from 'react';
+import { createOrder } from '../services/api';
 import { formatCurrency, convertPrice } from '../utils/currency';
 import currencyUtils from '../utils/currency';
-import axios from 'axios';
 import './OrderForm.css';
 
-const OrderForm = ({ symbol, currency = 'USD', onOrderPlaced }) => {
+const OrderForm = ({ symbol, currency = 'USD', tradingPairs = [], prices, portfolio, onOrderPlaced }) => {
   const [orderSide, setOrderSide] = useState('buy');
   const [orderType, setOrderType] = useState('market');
   const [price, setPrice] = useState('');
@@ -13,56 +12,9 @@ const OrderForm = ({ symbol, currency = 'USD', onOrderPlaced }) => {
   const [amountType, setAmountType] = useState('crypto'); // 'crypto' or 'currency'
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState('');
-  const [tradingPairs, setTradingPairs] = useState([]);
-  const [currentPrice, setCurrentPrice] = useState(0);
-  const [portfolio, setPortfolio] = useState(null);
-  const [availableBalance, setAvailableBalance] = useState(0);
-
-  useEffect(() => {
-    loadTradingPairs();
-    fetchCurrentPrice();
-    fetchPortfolio();
-    // Refresh price and portfolio every 10 seconds
-    const interval = setInterval(() => {
-      fetchCurrentPrice();
-      fetchPortfolio();
-    }, 10000);
-    return () => clearInterval(interval);
-  }, [symbol]);
-
-  const loadTradingPairs = async () => {
-    try {
-      const response = await getTradingPairs();
-      setTradingPairs(response.data);
-    } catch (error) {
-      console.error('Error loading trading pairs:', error);
-    }
-  };
-
-  const fetchCurrentPrice = async () => {
-    try {
-      const pair = tradingPairs.find(p => p.symbol === symbol);
-      if (pair) {
-        const response = await axios.get(`http://localhost:8001/api/trading/pairs/${pair.id}/price/`);
-        setCurrentPrice(parseFloat(response.data.price));
-      }
-    } catch (error) {
-      console.error('Error fetching price:', error);
-    }
-  };
-
-  const fetchPortfolio = async () => {
-    try {
-      const token = localStorage.getItem('token');
-      const response = await axios.get('http://localhost:8001/api/trading/orders/portfolio/', {
-        headers: { Authorization: `Token ${token}` }
-      });
-      setPortfolio(response.data);
-      setAvailableBalance(response.data.cash_balance || 0);
-    } catch (error) {
-      console.error('Error fetching portfolio:', error);
-    }
-  };
+  // Price and balance come from the dashboard snapshot, refreshed by the parent
+  const currentPrice = parseFloat(prices?.[symbol]) || 0;
+  const availableBalance = portfolio?.cash_balance || 0;
 
   const getMaxBuyAmount = () => {
     if (currentPrice === 0 || availableBalance === 0) return 0;
@@ -166,11 +118,7 @@ const OrderForm = ({ symbol, currency = 'USD', onOrderPlaced }) => {
       setPrice('');
       setAmount('');
 
-      // Refresh current price and portfolio
-      await fetchCurrentPrice();
-      await fetchPortfolio();
-
-      // Notify parent component to refresh holdings
+      // Notify parent component to refresh the dashboard (price, balance, holdings)
       if (onOrderPlaced) {
         onOrderPlaced();
       }
@@ -1,13 +1,10 @@
 import React, { useState, useEffect } from 'react';
-import { getStrategies, createStrategy, activateStrategy, deactivateStrategy, deleteStrategy, getTradingPairs } from '../services/api';
+import { createStrategy, activateStrategy, deactivateStrategy, deleteStrategy } from '../services/api';
 import './StrategyManager.css';
 
-const StrategyManager = ({ symbol }) => {
-  const [strategies, setStrategies] = useState([]);
-  const [tradingPairs, setTradingPairs] = useState([]);
+const StrategyManager = ({ symbol, strategies = [], tradingPairs = [], loading = false, onRefresh }) => {
   const [showForm, setShowForm] = useState(false);
   const [message, setMessage] = useState('');
-  const [loading, setLoading] = useState(true);
   const [formData, setFormData] = useState({
     name: '',
     strategy_type: 'dca',
@@ -20,34 +17,18 @@ const StrategyManager = ({ symbol }) => {
     execution_interval: '1h',
   });
 
-  useEffect(() => {
-    loadStrategies();
-    loadTradingPairs();
-  }, []);
+  // Pairs and strategies come from the dashboard snapshot; onRefresh reloads it
+  const firstPairId = tradingPairs[0]?.id;
 
-  const loadTradingPairs = async () => {
-    try {
-      setLoading(true);
-      const response = await getTradingPairs();
-      console.log('Trading pairs loaded:', response.data);
-      setTradingPairs(response.data);
-      if (response.data.length > 0) {
-        setFormData(prev => ({ ...prev, trading_pair: response.data[0].id }));
-      }
-    } catch (error) {
-      console.error('Error loading trading pairs:', error);
-      setMessage('Error loading trading pairs. Please refresh the page.');
-    } finally {
-      setLoading(false);
+  useEffect(() => {
+    if (firstPairId !== undefined) {
+      setFormData(prev => (prev.trading_pair ? prev : { ...prev, trading_pair: firstPairId }));
     }
-  };
+  }, [firstPairId]);
 
-  const loadStrategies = async () => {
-    try {
-      const response = await getStrategies();
-      setStrategies(response.data);
-    } catch (error) {
-      console.error('Error loading strategies:', error);
+  const loadStrategies = () => {
+    if (onRefresh) {
+      onRefresh();
     }
   };
 
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
 import CryptoChart from './CryptoChart';
 import OrderForm from './OrderForm';
 import StrategyManager from './StrategyManager';
@@ -7,25 +7,27 @@ import TradeHistory from './TradeHistory';
 import Holdings from './Holdings';
 import MarketNews from './MarketNews';
 import PnLStatement from './PnLStatement';
-import { getTradingPairs } from '../services/api';
+import { getDashboard } from '../services/api';
 import './TradingDashboard.css';
 
 const TradingDashboard = ({ user, currency, onLogout, onCurrencyChange }) => {
   const [selectedPair, setSelectedPair] = useState('BTCUSDT');
-  const [tradingPairs, setTradingPairs] = useState([]);
+  const [dashboard, setDashboard] = useState(null);
   const [filteredPairs, setFilteredPairs] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [showDropdown, setShowDropdown] = useState(false);
   const [showUserMenu, setShowUserMenu] = useState(false);
   const [activeTab, setActiveTab] = useState('trade');
-  const [refreshTrigger, setRefreshTrigger] = useState(0);
   const [showChart, setShowChart] = useState(false); // Chart hidden by default
   const dropdownRef = useRef(null);
   const userMenuRef = useRef(null);
 
+  // Pairs, prices, portfolio, orders and strategies all come from this one snapshot
+  const tradingPairs = useMemo(() => dashboard?.pairs || [], [dashboard]);
+
   const handleOrderPlaced = () => {
-    // Trigger refresh of Holdings component
-    setRefreshTrigger(prev => prev + 1);
+    // Orders, strategies and exits change the snapshot every panel reads
+    loadDashboard();
   };
 
   const toggleCurrency = () => {
@@ -35,7 +37,10 @@ const TradingDashboard = ({ user, currency, onLogout, onCurrencyChange }) => {
   };
 
   useEffect(() => {
-    loadTradingPairs();
+    loadDashboard(true);
+    // Refresh every 5 seconds
+    const interval = setInterval(() => loadDashboard(), 5000);
+    return () => clearInterval(interval);
   }, []);
 
   useEffect(() => {
@@ -72,17 +77,15 @@ const TradingDashboard = ({ user, currency, onLogout, onCurrencyChange }) => {
     }
   }, [searchQuery, tradingPairs]);
 
-  const loadTradingPairs = async () => {
+  const loadDashboard = async (initial = false) => {
     try {
-      const response = await getTradingPairs();
-      console.log('Loaded trading pairs:', response.data.length);
-      setTradingPairs(response.data);
-      setFilteredPairs(response.data);
-      if (response.data.length > 0) {
-        setSelectedPair(response.data[0].symbol);
+      const response = await getDashboard();
+      setDashboard(response.data);
+      if (initial && response.data.pairs.length > 0) {
+        setSelectedPair(response.data.pairs[0].symbol);
       }
     } catch (error) {
-      console.error('Error loading trading pairs:', error);
+      console.error('Error loading dashboard:', error);
     }
   };
 
@@ -259,16 +262,34 @@ const TradingDashboard = ({ user, currency, onLogout, onCurrencyChange }) => {
           {activeTab === 'trade' && (
             <div className="trade-panel-grid">
               <div className="left-panel-column">
-                <OrderForm symbol={selectedPair} currency={currency} onOrderPlaced={handleOrderPlaced} />
+                <OrderForm
+                  symbol={selectedPair}
+                  currency={currency}
+                  tradingPairs={tradingPairs}
+                  prices={dashboard?.prices}
+                  portfolio={dashboard?.portfolio}
+                  onOrderPlaced={handleOrderPlaced}
+                />
                 <MarketNews />
               </div>
               <div className="right-panel-column">
-                <Holdings refreshTrigger={refreshTrigger} currency={currency} />
+                <Holdings
+                  portfolio={dashboard?.portfolio}
+                  tradingPairs={tradingPairs}
+                  currency={currency}
+                  onRefresh={handleOrderPlaced}
+                />
               </div>
             </div>
           )}
           {activeTab === 'strategies' && (
-            <StrategyManager symbol={selectedPair} />
+            <StrategyManager
+              symbol={selectedPair}
+              strategies={dashboard?.strategies}
+              tradingPairs={tradingPairs}
+              loading={!dashboard}
+              onRefresh={handleOrderPlaced}
+            />
           )}
           {activeTab === 'pnl' && (
             <PnLStatement currency={currency} />
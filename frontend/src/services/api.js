@@ -10,6 +10,9 @@ const api = axios.create({
   },
 });
 
+// Dashboard (pairs, prices, portfolio, orders, strategies, settings in one request)
+export const getDashboard = (params = {}) => api.get('/trading/dashboard/', { params });
+
 // Trading Pairs
 export const getTradingPairs = () => api.get('/trading/pairs/');
 export const getTradingPairPrice = (pairId) => api.get(`/trading/pairs/${pairId}/price/`);
@@ -21,11 +24,14 @@ export const updateStrategy = (id, data) => api.put(`/trading/strategies/${id}/`
 export const deleteStrategy = (id) => api.delete(`/trading/strategies/${id}/`);
 export const activateStrategy = (id) => api.post(`/trading/strategies/${id}/activate/`);
 export const deactivateStrategy = (id) => api.post(`/trading/strategies/${id}/deactivate/`);
+export const optimizeStrategy = (id, data = {}) => api.post(`/trading/strategies/${id}/optimize/`, data);
+export const stressTestStrategy = (id, data = {}) => api.post(`/trading/strategies/${id}/stress-test/`, data);
 
 // Orders
 export const getOrders = () => api.get('/trading/orders/');
 export const createOrder = (data) => api.post('/trading/orders/', data);
 export const cancelOrder = (id) => api.post(`/trading/orders/${id}/cancel/`);
+export const getEquityCurve = (params = {}) => api.get('/trading/orders/equity-curve/', { params });
 
 // Trade History
 export const getTradeHistory = () => api.get('/trading/history/');